@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+Benchmark the whole pipeline, stage by stage, on a synthetic thread.
+
+Downloads go to a local HTTP stand-in for the Algolia API and LLM calls to a
+fake Responses client with configurable latency, so no network or API key is
+needed. Every stage reports time (best of --repeat), peak memory (traced in a
+separate run) and throughput. Results can be saved as a baseline and compared
+against it later; stages that got slower or bigger than --tolerance are
+flagged as regressions.
+
+Run from the repository root (the tiktoken encoding is downloaded on first use):
+
+    python benchmarks/bench_pipeline.py --comments 5000 --latency 0.05 --concurrency 4
+    python benchmarks/bench_pipeline.py --comments 5000 --save-baseline
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hn_summarizer.utilities import Utilities  # noqa: E402
+from hn_summarizer.llm_interaction import LLMInteraction  # noqa: E402
+from hn_summarizer.rate_limiter import RateLimitedResponses  # noqa: E402
+from synthetic import make_thread  # noqa: E402
+from fake_services import AlgoliaStandIn, FakeResponses  # noqa: E402
+
+DEFAULT_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# Differences below these are noise, whatever the ratio
+TIME_NOISE_SECONDS = 0.01
+MEMORY_NOISE_BYTES = 1024 * 1024
+
+
+def quiet(func, *args):
+    """Run func with stdout/stderr discarded (the pipeline logs every chunk)."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return func(*args)
+
+
+def measure(func, repeat):
+    """
+    Time a stage and trace its peak memory.
+
+    Returns:
+        (best seconds, peak bytes, result of the last run)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = quiet(func)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    # Tracing slows everything down, so memory is measured in a run of its own
+    tracemalloc.start()
+    try:
+        quiet(func)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def build_stages(args, workdir):
+    """
+    Prepare the data and return the stages as (name, unit, count, func) tuples.
+    """
+    data = make_thread(
+        num_comments=args.comments, max_depth=args.depth, comment_words=args.words, item_id=args.item_id
+    )
+    comments = list(Utilities.extract_comments(data))
+    xml_file = os.path.join(workdir, "thread.xml")
+    markdown_file = os.path.join(workdir, "summary.md")
+    topic = f"# HN Topic: [benchmark](https://news.ycombinator.com/item?id={args.item_id}), and discussion"
+
+    config = {
+        'api_key': 'benchmark', 'model': args.model, 'concurrency': args.concurrency,
+        'categorize_token_budget': args.categorize_token_budget,
+    }
+    llm_interaction = LLMInteraction(config)
+    fake = FakeResponses(latency=args.latency)
+    llm_interaction.responses_api = RateLimitedResponses(fake, llm_interaction.rate_limiter, llm_interaction.count_tokens)
+
+    quiet(Utilities.write_thread_xml, args.item_id, comments, xml_file)
+    with open(xml_file, encoding='utf-8') as f:
+        xml_text = f.read()
+    chunks = quiet(llm_interaction.chunk_text, xml_text, args.limit)
+    entries = [
+        {'participant': comment['author'], 'argument': f"Point made by {comment['author']}", 'urls': ""}
+        for comment in comments
+    ]
+    instruction = "Summarize every comment of the thread as one table row."
+    quiet(llm_interaction.send_to_llm, topic, chunks, instruction, markdown_file, args.max_output_tokens)
+    with open(markdown_file, encoding='utf-8') as f:
+        summary_markdown = f.read()
+
+    def download():
+        Utilities.download_hn_thread(args.item_id, xml_file)
+
+    def sanitize():
+        for comment in comments:
+            Utilities.sanitize_for_xml(comment['text'])
+
+    def chunk():
+        return llm_interaction.chunk_text(xml_text, args.limit)
+
+    def render():
+        return llm_interaction.render_markdown(topic, entries)
+
+    def send():
+        return llm_interaction.send_to_llm(topic, chunks, instruction, markdown_file, args.max_output_tokens)
+
+    def categorize():
+        with open(markdown_file, 'w', encoding='utf-8') as f:
+            f.write(summary_markdown)
+        llm_interaction.categorize_arguments(markdown_file, args.max_output_tokens)
+
+    num_rows = len(llm_interaction.table_lines(summary_markdown.split('\n')))
+    stages = [
+        ('download_hn_thread', 'comments', len(comments), download),
+        ('sanitize_for_xml', 'comments', len(comments), sanitize),
+        ('chunk_text', 'lines', len(xml_text.splitlines()), chunk),
+        ('render_markdown', 'rows', len(entries), render),
+        ('send_to_llm', 'chunks', len(chunks), send),
+        ('categorize_arguments', 'rows', num_rows, categorize),
+    ]
+    return data, stages
+
+
+def scenario_key(args):
+    """Identify the benchmark parameters a baseline belongs to."""
+    return (
+        f"comments={args.comments},depth={args.depth},words={args.words},limit={args.limit},"
+        f"latency={args.latency},concurrency={args.concurrency},model={args.model}"
+    )
+
+
+def load_baselines(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=5000, help='Number of synthetic comments')
+    parser.add_argument('--depth', type=int, default=8, help='Maximum reply depth')
+    parser.add_argument('--words', type=int, default=40, help='Average words per comment')
+    parser.add_argument('--item-id', type=int, default=40000000, help='Item id of the synthetic story')
+    parser.add_argument('--model', default='gpt-4o-mini', help='Model whose tiktoken encoding is used')
+    parser.add_argument('--limit', type=int, default=12500, help='chunk_token_limit')
+    parser.add_argument('--max-output-tokens', type=int, default=5000, help='max_output_tokens of the LLM calls')
+    parser.add_argument('--categorize-token-budget', type=int, default=20000, help='Categorization token budget')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds every fake LLM call takes')
+    parser.add_argument('--concurrency', type=int, default=4, help='Chunks sent to the fake LLM in parallel')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage (best is reported)')
+    parser.add_argument('--baseline-file', default=DEFAULT_BASELINE_FILE, help='JSON file with saved baselines')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Relative slowdown or memory growth that counts as regression (default: 0.25)')
+    args = parser.parse_args()
+
+    key = scenario_key(args)
+    baselines = load_baselines(args.baseline_file)
+    baseline = baselines.get(key, {})
+    results = {}
+    regressions = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        data, stages = build_stages(args, workdir)
+        with AlgoliaStandIn({args.item_id: data}) as server:
+            original_url = Utilities.ALGOLIA_ITEMS_URL
+            Utilities.ALGOLIA_ITEMS_URL = server.items_url
+            try:
+                print(key)
+                print(f"{'stage':<22}{'seconds':>10}{'peak MB':>10}{'throughput':>24}  vs. baseline")
+                for name, unit, count, func in stages:
+                    seconds, peak, _ = measure(func, args.repeat)
+                    results[name] = {'seconds': round(seconds, 6), 'peak_bytes': peak, 'count': count}
+                    comparison = ""
+                    if name in baseline:
+                        time_ratio = seconds / max(baseline[name]['seconds'], 1e-9)
+                        memory_ratio = peak / max(baseline[name]['peak_bytes'], 1)
+                        comparison = f"time {time_ratio:.2f}x, memory {memory_ratio:.2f}x"
+                        slower = (time_ratio > 1 + args.tolerance
+                                  and seconds - baseline[name]['seconds'] > TIME_NOISE_SECONDS)
+                        bigger = (memory_ratio > 1 + args.tolerance
+                                  and peak - baseline[name]['peak_bytes'] > MEMORY_NOISE_BYTES)
+                        if slower or bigger:
+                            comparison += "  REGRESSION"
+                            regressions.append(name)
+                    throughput = f"{count / seconds:,.0f} {unit}/s" if seconds else "-"
+                    print(f"{name:<22}{seconds:>10.3f}{peak / 2**20:>10.1f}{throughput:>24}  {comparison}")
+            finally:
+                Utilities.ALGOLIA_ITEMS_URL = original_url
+
+    if args.save_baseline:
+        baselines[key] = results
+        with open(args.baseline_file, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline_file}")
+    elif not baseline:
+        print("No baseline for these parameters (use --save-baseline)")
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
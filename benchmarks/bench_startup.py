@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Startup benchmark: import time (``python -X importtime``) and ``--help`` wall time.
+
+Each target is imported in a fresh interpreter; the cumulative import time
+of the target and its heaviest imports are reported. Importing the CLI must
+not pull in openai, pydantic or tiktoken; the "full pipeline" row shows what
+a summarization run loads later on.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = [
+    ("cli", "import hn_summarizer.cli"),
+    ("package", "import hn_summarizer"),
+    ("full pipeline", "import hn_summarizer.cli, hn_summarizer.llm_interaction, openai"),
+]
+HEAVY_MODULES = ("openai", "pydantic", "tiktoken", "requests")
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(statement):
+    """
+    Run ``statement`` under -X importtime in a fresh interpreter.
+
+    Returns:
+        List of (module, cumulative microseconds, nesting level)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(2)), (len(match.group(3)) - 1) // 2))
+    return modules
+
+
+def best_import(statement, repeat):
+    """Return the run with the smallest total import time of ``statement``."""
+    best = None
+    for _ in range(repeat):
+        modules = import_times(statement)
+        total = sum(cumulative for _, cumulative, level in modules if level == 0)
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def help_wall_time(repeat):
+    """Best wall time of ``HN-ThreadSummarizer.py --help`` in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "HN-ThreadSummarizer.py"), "--help"],
+            cwd=REPO_ROOT, capture_output=True, check=True
+        )
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+    parser.add_argument('--top', type=int, default=8, help='Heaviest imports listed per target')
+    args = parser.parse_args()
+
+    heavy_in_cli = []
+    for name, statement in TARGETS:
+        total, modules = best_import(statement, args.repeat)
+        # The total includes what the interpreter imports at startup (site, encodings)
+        print(f"{name:<14} {total / 1000:>8.1f} ms   ({statement})")
+        top_level = sorted((m for m in modules if m[2] <= 1), key=lambda m: -m[1])[:args.top]
+        for module, cumulative, _ in top_level:
+            print(f"    {cumulative / 1000:>8.1f} ms  {module}")
+        if name == "cli":
+            heavy_in_cli = sorted({m[0].split('.')[0] for m in modules if m[0].split('.')[0] in HEAVY_MODULES})
+
+    print(f"--help wall time: {help_wall_time(args.repeat) * 1000:.0f} ms")
+    if heavy_in_cli:
+        print(f"Importing the CLI loads: {', '.join(heavy_in_cli)}")
+        return 1
+    print(f"Importing the CLI loads none of: {', '.join(HEAVY_MODULES)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
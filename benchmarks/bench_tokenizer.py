@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: per-line tokenization vs. batched tokenization in chunk_text.
+
+Run from the repository root (the tiktoken encoding is downloaded on first use):
+
+    python benchmarks/bench_tokenizer.py --comments 20000 --model gpt-4o-mini
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hn_summarizer.utilities import Utilities  # noqa: E402
+from hn_summarizer.llm_interaction import LLMInteraction  # noqa: E402
+from synthetic import make_thread  # noqa: E402
+
+
+def legacy_chunk_text(encoding, text, chunk_token_limit):
+    """The previous chunking loop: one encode() call per line."""
+    chunks = []
+    current_lines = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = len(encoding.encode(line))
+        if current_tokens and current_tokens + line_tokens > chunk_token_limit:
+            chunk = ''.join(current_lines)
+            chunks.append({'text': chunk, 'token_count': current_tokens, 'char_count': len(chunk)})
+            current_lines = []
+            current_tokens = 0
+        if line_tokens > chunk_token_limit:
+            chunks.append({'text': line, 'token_count': line_tokens, 'char_count': len(line)})
+            continue
+        current_lines.append(line)
+        current_tokens += line_tokens
+    if current_lines:
+        chunk = ''.join(current_lines)
+        chunks.append({'text': chunk, 'token_count': current_tokens, 'char_count': len(chunk)})
+    return chunks
+
+
+def best_of(repeat, func, *args):
+    """Return (best seconds, result) over several runs."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func(*args)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=20000, help='Number of synthetic comments')
+    parser.add_argument('--model', default='gpt-4o-mini', help='Model whose tiktoken encoding is used')
+    parser.add_argument('--limit', type=int, default=12500, help='chunk_token_limit')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (best is reported)')
+    args = parser.parse_args()
+
+    llm_interaction = LLMInteraction({'api_key': 'benchmark', 'model': args.model})
+    data = make_thread(num_comments=args.comments)
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_file = os.path.join(tmp, 'thread.xml')
+        Utilities.write_thread_xml(data['id'], Utilities.iter_comments(Utilities.iter_thread_nodes(data)), xml_file)
+        with open(xml_file, encoding='utf-8') as f:
+            text = f.read()
+    num_lines = len(text.splitlines())
+
+    legacy_seconds, legacy_chunks = best_of(args.repeat, legacy_chunk_text, llm_interaction.encoding, text, args.limit)
+    batched_seconds, batched_chunks = best_of(args.repeat, llm_interaction.chunk_text, text, args.limit)
+
+    print(f"{num_lines} lines, {len(batched_chunks)} chunks, encoding {llm_interaction.encoding.name}, "
+          f"{llm_interaction._tokenizer_threads} tokenizer thread(s)")
+    print(f"identical chunks: {legacy_chunks == batched_chunks}")
+    print(f"{'variant':<12}{'seconds':>10}{'lines/s':>12}")
+    print(f"{'per-line':<12}{legacy_seconds:>10.3f}{num_lines / legacy_seconds:>12.0f}")
+    print(f"{'batched':<12}{batched_seconds:>10.3f}{num_lines / batched_seconds:>12.0f}")
+    print(f"speedup: {legacy_seconds / batched_seconds:.2f}x")
+    return 0 if legacy_chunks == batched_chunks else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
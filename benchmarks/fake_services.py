@@ -0,0 +1,247 @@
+"""Local stand-ins for the Algolia items API and the OpenAI Responses API (including streaming)."""
+
+import re
+import json
+import time
+import zlib
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hn_summarizer.models import CommentSummary, ThreadSummaryResponse
+
+_ITEM_PATH = re.compile(r"^/api/v1/items/(\d+)$")
+_SEARCH_PATH = re.compile(r"^/api/v1/search(?:\?(.*))?$")
+_AUTHOR = re.compile(r"<author>(.*?)</author>")
+_COMPACT_AUTHOR = re.compile(r"^([^\s:<][^:]*): ", re.MULTILINE)
+
+
+class AlgoliaStandIn:
+    """
+    Serve synthetic ``/api/v1/items/<id>`` payloads and a ``/api/v1/search``
+    front page over HTTP on localhost.
+
+    Usage::
+
+        with AlgoliaStandIn({item_id: payload}) as server:
+            Utilities.ALGOLIA_ITEMS_URL = server.items_url
+            # or, for all Algolia requests (front page included):
+            Utilities.use_algolia_api(server.api_url)
+
+    ``front_page`` (search hits with objectID, title, num_comments, points and
+    created_at_i) and the payloads may be changed between requests. Item
+    responses carry an ETag; a request whose If-None-Match matches it is
+    answered with 304. ``requests`` records the path and If-None-Match header
+    of every request.
+    """
+
+    def __init__(self, payloads, front_page=None):
+        """
+        Initialize the server.
+
+        Args:
+            payloads: Dict mapping item id to the payload dict to serve
+            front_page: Optional list of search hits returned for tags=front_page
+        """
+        self.bodies = {}
+        for item_id, payload in payloads.items():
+            self.set_item(item_id, payload)
+        self.front_page = list(front_page or [])
+        self.requests = []
+        self.server = None
+        self.thread = None
+
+    def set_item(self, item_id, payload):
+        """Serve ``payload`` for ``item_id`` from now on."""
+        self.bodies[str(item_id)] = json.dumps(payload).encode('utf-8')
+
+    def _search_body(self, query):
+        params = dict(part.split('=', 1) for part in (query or "").split('&') if '=' in part)
+        if params.get('tags') != 'front_page':
+            return None
+        hits = self.front_page[:int(params.get('hitsPerPage', 20))]
+        return json.dumps({'hits': hits, 'nbHits': len(hits)}).encode('utf-8')
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if_none_match = self.headers.get("If-None-Match")
+                stand_in.requests.append((self.path, if_none_match))
+                match = _ITEM_PATH.match(self.path)
+                search = _SEARCH_PATH.match(self.path)
+                if match:
+                    body = stand_in.bodies.get(match.group(1))
+                else:
+                    body = stand_in._search_body(search.group(1)) if search else None
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{zlib.crc32(body):08x}"' if match else None
+                if etag is not None and if_none_match == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def items_url(self):
+        """URL template in the format of Utilities.ALGOLIA_ITEMS_URL."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/items/{{hn_item_id}}"
+
+    @property
+    def api_url(self):
+        """Base URL in the format of Utilities.use_algolia_api (and --algolia-url)."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+def fake_encoding():
+    """
+    Return an offline tiktoken encoding: one token per byte, split like cl100k_base.
+
+    Token counts are larger than those of the real encodings, but chunking,
+    packing and splitting behave the same, and nothing has to be downloaded.
+    Assign it to ``LLMInteraction.encoding``.
+    """
+    import tiktoken
+
+    return tiktoken.Encoding(
+        "fake_bytes",
+        pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={"<|endoftext|>": 256},
+    )
+
+
+class _Usage:
+    def __init__(self, input_tokens, output_tokens):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.total_tokens = input_tokens + output_tokens
+
+
+class _Response:
+    def __init__(self, parsed=None, text=None, usage=None, status="completed", incomplete_reason=None):
+        self.output_parsed = parsed
+        self.output_text = text
+        self.output = []
+        self.status = status
+        self.incomplete_details = SimpleNamespace(reason=incomplete_reason) if incomplete_reason else None
+        self.usage = usage
+
+
+class _FakeStream:
+    """Stand-in for the context manager returned by ``client.responses.stream``."""
+
+    def __init__(self, text, response, delta_chars):
+        self.text = text
+        self.response = response
+        self.delta_chars = delta_chars
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __iter__(self):
+        for start in range(0, len(self.text), self.delta_chars):
+            yield SimpleNamespace(type="response.output_text.delta", delta=self.text[start:start + self.delta_chars])
+        yield SimpleNamespace(type="response.completed", response=self.response)
+
+    def get_final_response(self):
+        return self.response
+
+
+class FakeResponses:
+    """
+    Offline replacement for ``client.responses`` with a configurable latency.
+
+    ``parse`` returns one CommentSummary per ``<author>`` (or ``author:`` line
+    of the compact format) of the input, so the table has realistic size; ``create`` returns a short categories text.
+    ``stream`` sends the same summaries as JSON text deltas of ``delta_chars``
+    characters. With ``cut_off_above``, the output for an input with more
+    entries than that stops after ``cut_off_at`` of its text and the response
+    is ``incomplete`` (reason max_output_tokens), as if it hit the output limit.
+    """
+
+    def __init__(self, latency=0.05, cut_off_above=None, cut_off_at=0.5, delta_chars=16):
+        """
+        Initialize the fake.
+
+        Args:
+            latency: Seconds every call sleeps, standing in for the API round trip
+            cut_off_above: Cut off the output for inputs with more entries than this (default: never)
+            cut_off_at: Share of the output text sent before the cut
+            delta_chars: Characters per streamed text delta
+        """
+        self.latency = latency
+        self.cut_off_above = cut_off_above
+        self.cut_off_at = cut_off_at
+        self.delta_chars = delta_chars
+        self.calls = 0
+        self.cut_offs = 0
+        self._lock = threading.Lock()
+
+    def _call(self, kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        text = kwargs['input'][-1]['content'][0]['text']
+        return text, _Usage(len(text) // 4, 200)
+
+    def _summary_response(self, kwargs):
+        """Return (output text, response) of a structured request, cut off if configured."""
+        text, usage = self._call(kwargs)
+        authors = _AUTHOR.findall(text) or _COMPACT_AUTHOR.findall(text)
+        parsed = ThreadSummaryResponse(summaries=[
+            CommentSummary(participant=author, argument=f"Point made by {author}", urls="") for author in authors
+        ])
+        output = parsed.model_dump_json()
+        if self.cut_off_above is not None and len(authors) > self.cut_off_above:
+            with self._lock:
+                self.cut_offs += 1
+            output = output[:int(len(output) * self.cut_off_at)]
+            return output, _Response(text=output, usage=usage, status="incomplete",
+                                     incomplete_reason="max_output_tokens")
+        return output, _Response(parsed=parsed, text=output, usage=usage)
+
+    def parse(self, **kwargs):
+        return self._summary_response(kwargs)[1]
+
+    def stream(self, **kwargs):
+        output, response = self._summary_response(kwargs)
+        return _FakeStream(output, response, self.delta_chars)
+
+    def create(self, **kwargs):
+        text, usage = self._call(kwargs)
+        return _Response(
+            text="Here are proposed categories for organizing the arguments:\n\n1. Performance\n- Latency\n",
+            usage=usage
+        )
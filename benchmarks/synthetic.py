@@ -0,0 +1,64 @@
+"""Synthetic Algolia `items` payloads for benchmarking the HN Thread Summarizer."""
+
+import random
+
+_WORDS = (
+    "rust python latency cache thread model token compiler memory kernel startup "
+    "database index query network browser security privacy license community "
+    "benchmark regression pipeline deploy cloud server client protocol format "
+    "the a of and to in is that it for on with as was but not are this be"
+).split()
+
+
+def make_comment_text(rng, words):
+    """Build an HTML comment body similar to what the Algolia API returns."""
+    paragraphs = []
+    remaining = words
+    while remaining > 0:
+        n = min(remaining, rng.randint(8, 40))
+        paragraphs.append(" ".join(rng.choice(_WORDS) for _ in range(n)))
+        remaining -= n
+    if rng.random() < 0.2:
+        paragraphs.insert(0, "&gt; " + " ".join(rng.choice(_WORDS) for _ in range(12)))
+    if rng.random() < 0.1:
+        paragraphs.append('<a href="https://example.com/some/path?id=42&amp;ref=hn">https://example.com/some/path</a>')
+    if rng.random() < 0.1:
+        paragraphs.append("I&#x27;d say &quot;it depends&quot; &amp; move on &lt;3")
+    return "<p>".join(paragraphs)
+
+
+def make_thread(num_comments=1000, max_depth=8, comment_words=40, seed=42, item_id=40000000):
+    """
+    Generate a synthetic Algolia item payload.
+
+    Args:
+        num_comments: Number of comments in the thread
+        max_depth: Maximum reply depth (top-level comments have depth 1)
+        comment_words: Average number of words per comment
+        seed: Random seed, so runs are reproducible
+        item_id: Item id of the story
+
+    Returns:
+        Nested dict shaped like https://hn.algolia.com/api/v1/items/<id>
+    """
+    rng = random.Random(seed)
+    story = {
+        "id": item_id, "type": "story", "author": "op", "title": f"Synthetic thread {item_id}",
+        "url": "https://example.com/", "text": None, "points": 100, "parent_id": None,
+        "story_id": item_id, "children": [], "options": [],
+    }
+    nodes = [(story, 0)]
+    for n in range(num_comments):
+        # Prefer recent nodes as parents, which produces realistic reply chains
+        parent, depth = nodes[0] if rng.random() < 0.3 else nodes[-rng.randint(1, min(len(nodes), 50))]
+        if depth >= max_depth:
+            parent, depth = story, 0
+        words = max(1, int(rng.gauss(comment_words, comment_words / 2)))
+        comment = {
+            "id": item_id + n + 1, "type": "comment", "author": f"user{rng.randint(1, max(2, num_comments // 5))}",
+            "title": None, "url": None, "text": make_comment_text(rng, words), "points": None,
+            "parent_id": parent["id"], "story_id": item_id, "children": [], "options": [],
+        }
+        parent["children"].append(comment)
+        nodes.append((comment, depth + 1))
+    return story
@@ -2,10 +2,17 @@
 HN Thread Summarizer - A modular package for summarizing Hacker News discussions using OpenAI.
 """
 
-from .models import CommentSummary, ThreadSummaryResponse
-from .utilities import Utilities
-from .llm_interaction import LLMInteraction
-from .version_check import ensure_structured_output_support
+from importlib import import_module
+
+# Exports are imported on first access: openai, pydantic and tiktoken take
+# several hundred milliseconds to import, which `--help` should not pay.
+_EXPORTS = {
+    "CommentSummary": ".models",
+    "ThreadSummaryResponse": ".models",
+    "Utilities": ".utilities",
+    "LLMInteraction": ".llm_interaction",
+    "ensure_structured_output_support": ".version_check",
+}
 
 __all__ = [
     "CommentSummary",
@@ -14,3 +21,15 @@ __all__ = [
     "LLMInteraction",
     "ensure_structured_output_support",
 ]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,480 @@
+"""Offline summarization of many chunks through the OpenAI Batch API."""
+
+import os
+import sys
+import json
+import time
+import uuid
+import tempfile
+
+from .models import ThreadSummaryResponse
+
+BATCH_ENDPOINT = "/v1/responses"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def strict_json_schema(schema):
+    """
+    Apply the strict structured output rules to a pydantic JSON schema.
+
+    Every object gets ``additionalProperties: false`` and lists all of its
+    properties as required, ``default: null`` is dropped and single-entry
+    ``allOf`` wrappers are unwrapped, as the OpenAI SDK does for
+    ``text_format`` (its helper for this is private, so it is redone here).
+
+    Args:
+        schema: Schema dict, e.g. from ``model_json_schema()``; changed in place
+
+    Returns:
+        The schema
+    """
+    if not isinstance(schema, dict):
+        return schema
+    for defs_key in ('$defs', 'definitions'):
+        for definition in (schema.get(defs_key) or {}).values():
+            strict_json_schema(definition)
+    if schema.get('type') == 'object':
+        schema['additionalProperties'] = False
+        properties = schema.get('properties') or {}
+        schema['required'] = list(properties)
+        for value in properties.values():
+            strict_json_schema(value)
+    if isinstance(schema.get('items'), dict):
+        strict_json_schema(schema['items'])
+    for variant in schema.get('anyOf') or []:
+        strict_json_schema(variant)
+    all_of = schema.get('allOf')
+    if all_of is not None:
+        if len(all_of) == 1:
+            schema.update(strict_json_schema(all_of[0]))
+            schema.pop('allOf')
+        else:
+            for variant in all_of:
+                strict_json_schema(variant)
+    if 'default' in schema and schema['default'] is None:
+        schema.pop('default')
+    return schema
+
+
+def summary_text_format():
+    """
+    Return the strict JSON schema response format for ThreadSummaryResponse.
+
+    This is what ``responses.parse(text_format=ThreadSummaryResponse)`` sends,
+    written out so that it can be put into a batch input file.
+    """
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": ThreadSummaryResponse.__name__,
+            "schema": strict_json_schema(ThreadSummaryResponse.model_json_schema()),
+            "strict": True,
+        }
+    }
+
+
+def response_output_text(body):
+    """
+    Return the output text of a Responses API response body (a plain dict).
+
+    Args:
+        body: Response object as found in a batch output line
+
+    Returns:
+        The concatenated output text, or None
+    """
+    texts = []
+    for item in body.get('output') or []:
+        for content in item.get('content') or []:
+            if content.get('type') == 'output_text' and content.get('text'):
+                texts.append(content['text'])
+    return ''.join(texts) or None
+
+
+class _Namespace:
+    """Attribute access to a dict, like the objects returned by the OpenAI client."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class LocalBatchClient:
+    """
+    Local stand-in for the Files and Batches endpoints of the OpenAI API.
+
+    Exposes the subset of ``client.files`` and ``client.batches`` used by
+    BatchRunner. Files and batches are kept under ``directory``; a batch is
+    executed request by request with ``responder`` when it is created, so it
+    is already completed at the first ``retrieve``. With a responder that does
+    not call the network, the whole batch flow runs offline.
+    """
+
+    def __init__(self, responder, directory=os.path.join("data", "batch_local")):
+        """
+        Initialize the stand-in.
+
+        Args:
+            responder: Callable taking a request body (dict) and returning a
+                Responses API response object as a dict
+            directory: Directory holding the uploaded files and batch records
+        """
+        self.responder = responder
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "files"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "batches"), exist_ok=True)
+        self.files = _Namespace(create=self._create_file, content=self._file_content)
+        self.batches = _Namespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _file_path(self, file_id):
+        return os.path.join(self.directory, "files", f"{file_id}.jsonl")
+
+    def _batch_path(self, batch_id):
+        return os.path.join(self.directory, "batches", f"{batch_id}.json")
+
+    def _write_file(self, data):
+        file_id = f"file-local-{uuid.uuid4().hex[:16]}"
+        with open(self._file_path(file_id), 'wb') as f:
+            f.write(data)
+        return file_id
+
+    def _create_file(self, file, purpose):
+        return _Namespace(id=self._write_file(file.read()), purpose=purpose)
+
+    def _file_content(self, file_id):
+        with open(self._file_path(file_id), 'rb') as f:
+            data = f.read()
+        return _Namespace(content=data, text=data.decode('utf-8'))
+
+    def _create_batch(self, input_file_id, endpoint, completion_window, metadata=None):
+        batch_id = f"batch-local-{uuid.uuid4().hex[:16]}"
+        output_lines = []
+        error_lines = []
+        with open(self._file_path(input_file_id), 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    body = self.responder(request['body'])
+                    output_lines.append({
+                        'id': f"batch_req_{uuid.uuid4().hex[:16]}",
+                        'custom_id': request['custom_id'],
+                        'response': {'status_code': 200, 'body': body},
+                        'error': None,
+                    })
+                except Exception as e:
+                    error_lines.append({
+                        'id': f"batch_req_{uuid.uuid4().hex[:16]}",
+                        'custom_id': request['custom_id'],
+                        'response': None,
+                        'error': {'code': type(e).__name__, 'message': str(e)},
+                    })
+
+        def to_file(lines):
+            if not lines:
+                return None
+            return self._write_file(''.join(json.dumps(line) + '\n' for line in lines).encode('utf-8'))
+
+        record = {
+            'id': batch_id,
+            'endpoint': endpoint,
+            'input_file_id': input_file_id,
+            'completion_window': completion_window,
+            'metadata': metadata,
+            'status': 'completed',
+            'output_file_id': to_file(output_lines),
+            'error_file_id': to_file(error_lines),
+            'request_counts': {
+                'total': len(output_lines) + len(error_lines),
+                'completed': len(output_lines),
+                'failed': len(error_lines),
+            },
+        }
+        with open(self._batch_path(batch_id), 'w') as f:
+            json.dump(record, f)
+        return self._retrieve_batch(batch_id)
+
+    def _retrieve_batch(self, batch_id):
+        with open(self._batch_path(batch_id), 'r') as f:
+            record = json.load(f)
+        record['request_counts'] = _Namespace(**record['request_counts'])
+        return _Namespace(**record)
+
+
+class BatchRunner:
+    """
+    Summarize the chunks of one or many threads as a single Batch API job.
+
+    ``submit`` writes every chunk as one line of a JSONL file (with the strict
+    ThreadSummaryResponse schema as response format), uploads it and creates
+    the batch. The job is saved as ``<directory>/<job name>.json``, so a later
+    run can ``load`` it, ``poll`` the batch and ``assemble`` the markdown files.
+    Chunks whose response is already in the response cache are not sent.
+    """
+
+    def __init__(self, llm_interaction, client, directory=os.path.join("data", "batch_jobs")):
+        """
+        Initialize the runner.
+
+        Args:
+            llm_interaction: LLMInteraction used for messages, the cache and rendering
+            client: OpenAI client, or a LocalBatchClient
+            directory: Directory holding the job files
+        """
+        self.llm_interaction = llm_interaction
+        self.client = client
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _job_path(self, name, suffix=".json"):
+        return os.path.join(self.directory, f"{name}{suffix}")
+
+    def save(self, job):
+        """Write the job file atomically."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(job, f, indent=2)
+            os.replace(tmp_path, self._job_path(job['name']))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self, name):
+        """
+        Load a job by name, job file path or batch id.
+
+        Raises:
+            FileNotFoundError: If no job file matches
+        """
+        if os.path.isfile(name):
+            path = name
+        else:
+            path = self._job_path(name)
+            if not os.path.isfile(path):
+                for file_name in sorted(os.listdir(self.directory)):
+                    if not file_name.endswith('.json'):
+                        continue
+                    with open(os.path.join(self.directory, file_name), 'r') as f:
+                        if json.load(f).get('batch_id') == name:
+                            path = os.path.join(self.directory, file_name)
+                            break
+                else:
+                    raise FileNotFoundError(f"No batch job named {name} in {self.directory}")
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _cache_key(self, instruction, chunk_text, max_output_tokens):
+        cache = self.llm_interaction.cache
+        return cache.make_key(
+            'summarize', self.llm_interaction.config['model'], instruction, chunk_text, max_output_tokens
+        )
+
+    def build_request(self, custom_id, instruction, chunk_text, max_output_tokens):
+        """Return one line of the batch input file as a dict."""
+        return {
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': {
+                'model': self.llm_interaction.config['model'],
+                'input': self.llm_interaction._build_messages(instruction, chunk_text),
+                'text': summary_text_format(),
+                'max_output_tokens': max_output_tokens,
+            },
+        }
+
+    def submit(self, items, instruction, max_output_tokens):
+        """
+        Write the batch input file, upload it and create the batch.
+
+        Args:
+            items: List of dicts with 'hnitem_id', 'topic_line', 'final_outfile'
+                and 'chunks' (an iterable of chunks)
+            instruction: System instruction for the LLM
+            max_output_tokens: Maximum tokens for each response
+
+        Returns:
+            The job dictionary (already saved)
+        """
+        name = f"batch-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        cache = self.llm_interaction.cache
+        job = {
+            'name': name,
+            'model': self.llm_interaction.config['model'],
+            'instruction': instruction,
+            'max_output_tokens': max_output_tokens,
+            'batch_id': None,
+            'status': None,
+            'items': [],
+            'requests': 0,
+            'cached': 0,
+            'created_at': time.time(),
+        }
+
+        # All chunk texts are kept locally, so missing results can be retried synchronously
+        with open(self._job_path(name, "-chunks.jsonl"), 'w', encoding='utf-8') as chunks_file, \
+                open(self._job_path(name, "-input.jsonl"), 'w', encoding='utf-8') as input_file:
+            for item in items:
+                num_chunks = 0
+                for chunk in item['chunks']:
+                    num_chunks += 1
+                    chunk_text = chunk['text'] if isinstance(chunk, dict) else chunk
+                    custom_id = f"{item['hnitem_id']}:{num_chunks}"
+                    chunks_file.write(json.dumps({'custom_id': custom_id, 'text': chunk_text}) + '\n')
+                    cached = None
+                    if cache is not None:
+                        cached = cache.get(self._cache_key(instruction, chunk_text, max_output_tokens))
+                    if cached is not None and cached.get('parsed') is not None:
+                        job['cached'] += 1
+                        continue
+                    request = self.build_request(custom_id, instruction, chunk_text, max_output_tokens)
+                    input_file.write(json.dumps(request) + '\n')
+                    job['requests'] += 1
+                job['items'].append({
+                    'hnitem_id': item['hnitem_id'],
+                    'topic_line': item['topic_line'],
+                    'final_outfile': item['final_outfile'],
+                    'num_chunks': num_chunks,
+                })
+
+        print(
+            f"Batch job {name}: {job['requests']} request(s), {job['cached']} chunk(s) answered from the cache",
+            file=sys.stderr
+        )
+        if job['requests']:
+            with open(self._job_path(name, "-input.jsonl"), 'rb') as f:
+                input_file_id = self.client.files.create(file=f, purpose="batch").id
+            batch = self.client.batches.create(
+                input_file_id=input_file_id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window="24h",
+                metadata={'job': name},
+            )
+            job['batch_id'] = batch.id
+            job['status'] = batch.status
+            print(f"Batch {batch.id} submitted ({batch.status})", file=sys.stderr)
+        else:
+            job['status'] = 'completed'
+        self.save(job)
+        return job
+
+    def poll(self, job, wait=False, interval=60):
+        """
+        Update the status of a job.
+
+        Args:
+            job: Job dictionary
+            wait: Keep polling until the batch reaches a terminal status
+            interval: Seconds between two polls
+
+        Returns:
+            The batch status
+        """
+        while job['batch_id']:
+            batch = self.client.batches.retrieve(job['batch_id'])
+            job['status'] = batch.status
+            job['output_file_id'] = getattr(batch, 'output_file_id', None)
+            job['error_file_id'] = getattr(batch, 'error_file_id', None)
+            counts = getattr(batch, 'request_counts', None)
+            progress = f" ({counts.completed}/{counts.total} done, {counts.failed} failed)" if counts else ""
+            print(f"Batch {job['batch_id']}: {batch.status}{progress}", file=sys.stderr)
+            self.save(job)
+            if not wait or batch.status in TERMINAL_STATUSES:
+                break
+            time.sleep(interval)
+        return job['status']
+
+    def _read_jsonl(self, file_id):
+        if not file_id:
+            return []
+        text = self.client.files.content(file_id).text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def results(self, job):
+        """
+        Download and parse the batch output.
+
+        Returns:
+            Dict mapping custom_id to a ThreadSummaryResponse; requests that
+            failed or returned invalid output are missing
+        """
+        results = {}
+        for line in self._read_jsonl(job.get('output_file_id')):
+            response = line.get('response') or {}
+            body = response.get('body') or {}
+            if response.get('status_code') != 200 or body.get('status', 'completed') != 'completed':
+                continue
+            text = response_output_text(body)
+            try:
+                results[line['custom_id']] = ThreadSummaryResponse.model_validate_json(text or '')
+            except ValueError as e:
+                print(f"Batch request {line['custom_id']}: invalid output ({str(e)[:200]})", file=sys.stderr)
+        for line in self._read_jsonl(job.get('error_file_id')):
+            error = line.get('error') or {}
+            print(f"Batch request {line.get('custom_id')} failed: {error.get('message')}", file=sys.stderr)
+        return results
+
+    def assemble(self, job, categorize=True, on_entries=None):
+        """
+        Write the markdown file of every item of a finished job, in chunk order.
+
+        Results are stored in the response cache. Chunks without a batch
+        result (cached, failed or expired) go through the synchronous path,
+        which answers them from the cache or sends them again.
+
+        Args:
+            job: Job dictionary of a batch in a terminal status
+            categorize: Run the categorization pass on each file
+            on_entries: Optional callback ``on_entries(item, entries)`` receiving the rows of each item
+
+        Returns:
+            List of written markdown files
+        """
+        llm_interaction = self.llm_interaction
+        instruction = job['instruction']
+        max_output_tokens = job['max_output_tokens']
+        results = self.results(job) if job['batch_id'] else {}
+
+        chunk_texts = {}
+        with open(self._job_path(job['name'], "-chunks.jsonl"), 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                chunk_texts[record['custom_id']] = record['text']
+
+        written = []
+        for item in job['items']:
+            entries = []
+            for chunk_index in range(1, item['num_chunks'] + 1):
+                custom_id = f"{item['hnitem_id']}:{chunk_index}"
+                chunk_text = chunk_texts[custom_id]
+                response_data = results.get(custom_id)
+                fallback_text = None
+                if response_data is not None:
+                    if llm_interaction.cache is not None:
+                        key = self._cache_key(instruction, chunk_text, max_output_tokens)
+                        llm_interaction.cache.put(key, {'parsed': response_data.model_dump()})
+                else:
+                    response_data, fallback_text = llm_interaction._summarize_chunk(
+                        chunk_index, item['num_chunks'], chunk_text, instruction, max_output_tokens
+                    )
+                if response_data:
+                    entries.extend(summary.model_dump() for summary in response_data.summaries)
+                elif fallback_text:
+                    entries.append({'text': fallback_text})
+
+            if on_entries:
+                on_entries(item, entries)
+            with open(item['final_outfile'], 'w') as f:
+                f.write(llm_interaction.render_markdown(item['topic_line'], entries))
+            print(f"Batch job {job['name']}: wrote {item['final_outfile']}", file=sys.stderr)
+            if categorize:
+                llm_interaction.categorize_arguments(item['final_outfile'], max_output_tokens)
+            written.append(item['final_outfile'])
+
+        job['assembled_at'] = time.time()
+        job['final_outfiles'] = written
+        self.save(job)
+        print(f"Batch job {job['name']}: assembled {len(written)} file(s)", file=sys.stderr)
+        return written
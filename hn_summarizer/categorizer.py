@@ -0,0 +1,194 @@
+"""Map-reduce categorization of summary tables of any size."""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+CATEGORIZATION_PROMPT = """Group the arguments from the table into meaningful categories. Invent your own categories. Output only those proposed new categories.
+
+Format your response as:
+
+Here are proposed categories for organizing the arguments:
+
+1. Category Name
+- Sub-point about what this category covers
+- Another sub-point
+
+2. Another Category Name
+- Sub-point
+- Another sub-point
+
+(continue for all categories)"""
+
+MERGE_PROMPT = """You will be given several lists of proposed categories. Each list was created from a different part of the same discussion. Merge them into a single list: combine categories that cover the same ground, remove duplicates, and keep the most informative sub-points. Output only the merged categories.
+
+Format your response as:
+
+Here are proposed categories for organizing the arguments:
+
+1. Category Name
+- Sub-point about what this category covers
+- Another sub-point
+
+2. Another Category Name
+- Sub-point
+- Another sub-point
+
+(continue for all categories)"""
+
+
+class MapReduceCategorizer:
+    """
+    Propose argument categories for a summary table of any size.
+
+    Map: rows are collected into batches that fit into ``token_budget`` and
+    each batch is categorized by its own LLM call. A batch is submitted as
+    soon as it is full, so the map phase runs while later chunks are still
+    being summarized.
+
+    Reduce: the category lists are merged with MERGE_PROMPT, again in groups
+    that fit into the budget, until a single list is left. A table that fits
+    into one batch needs exactly one call, as before.
+
+    The categorizer owns a thread pool; use it as a context manager (or call
+    close()) so that a failure before finish() does not leave map calls
+    running in the background.
+    """
+
+    def __init__(self, llm_interaction, header, max_output_tokens=4096, token_budget=20000):
+        """
+        Initialize the categorizer.
+
+        Args:
+            llm_interaction: LLMInteraction used for token counting and LLM calls
+            header: Text sent before the rows of every batch (topic line and table header)
+            max_output_tokens: Maximum tokens for each LLM response
+            token_budget: Maximum input tokens of a single call
+        """
+        self.llm_interaction = llm_interaction
+        self.header = header
+        self.max_output_tokens = max_output_tokens
+        self.token_budget = token_budget
+        self.header_tokens = self._count(header)
+        concurrency = max(1, int(llm_interaction.config.get('concurrency') or 1))
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.futures = []
+        self._lines = []
+        self._tokens = 0
+
+    def _count(self, text):
+        """Token count of a text, counted line by line."""
+        return sum(self.llm_interaction._line_token_counts(text.splitlines(keepends=True)))
+
+    def _call(self, content, prompt, label):
+        """Run one categorization call; errors are reported and yield None."""
+        print(f"Categorization: {label}", file=sys.stderr)
+        try:
+            return self.llm_interaction.generate_categories(content, self.max_output_tokens, prompt)
+        except Exception as e:
+            print(f"Error during categorization ({label}): {str(e)}", file=sys.stderr)
+            return None
+
+    def _submit_batch(self):
+        if not self._lines:
+            return
+        content = self.header + ''.join(self._lines)
+        label = f"map batch {len(self.futures) + 1} ({self.header_tokens + self._tokens} tokens)"
+        self.futures.append(self.executor.submit(self._call, content, CATEGORIZATION_PROMPT, label))
+        self._lines = []
+        self._tokens = 0
+
+    def add_rows(self, rows):
+        """
+        Add table rows (or fallback text lines); full batches are submitted right away.
+
+        Args:
+            rows: Iterable of markdown lines without trailing newline
+        """
+        lines = [f"{row}\n" for row in rows]
+        if not lines:
+            return
+        capacity = max(1, self.token_budget - self.header_tokens)
+        for line, tokens in zip(lines, self.llm_interaction._line_token_counts(lines)):
+            if self._lines and self._tokens + tokens > capacity:
+                self._submit_batch()
+            self._lines.append(line)
+            self._tokens += tokens
+
+    def _reduce(self, category_lists):
+        """Merge category lists in budget-sized groups until one is left."""
+        level = 1
+        while len(category_lists) > 1:
+            groups = []
+            group = []
+            group_tokens = 0
+            for text in category_lists:
+                tokens = self._count(text)
+                if group and group_tokens + tokens > self.token_budget:
+                    groups.append(group)
+                    group = []
+                    group_tokens = 0
+                group.append(text)
+                group_tokens += tokens
+            if group:
+                groups.append(group)
+            if len(groups) == len(category_lists):
+                # Every list fills the budget on its own: merge pairwise anyway
+                groups = [category_lists[i:i + 2] for i in range(0, len(category_lists), 2)]
+
+            futures = []
+            for number, group in enumerate(groups, start=1):
+                if len(group) == 1:
+                    futures.append(None)
+                    continue
+                content = "\n\n".join(
+                    f"List {index}:\n{text}" for index, text in enumerate(group, start=1)
+                )
+                label = f"reduce level {level}, group {number} of {len(groups)} ({len(group)} lists)"
+                futures.append(self.executor.submit(self._call, content, MERGE_PROMPT, label))
+
+            merged = []
+            for group, future in zip(groups, futures):
+                result = group[0] if future is None else future.result()
+                # If a merge fails, keep its inputs rather than losing categories
+                merged.extend([result] if result else group)
+            if len(merged) >= len(category_lists):
+                print("Categorization: reduce step made no progress, keeping partial results", file=sys.stderr)
+                return "\n\n".join(merged)
+            category_lists = merged
+            level += 1
+        return category_lists[0] if category_lists else None
+
+    def finish(self):
+        """
+        Submit the last batch, wait for the map phase and reduce the results.
+
+        Returns:
+            The categories text, or None if nothing was generated
+        """
+        self._submit_batch()
+        try:
+            category_lists = [future.result() for future in self.futures]
+            category_lists = [text for text in category_lists if text]
+            if len(self.futures) > 1:
+                print(f"Categorization: merging {len(category_lists)} category lists", file=sys.stderr)
+            return self._reduce(category_lists)
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def close(self):
+        """
+        Cancel the map calls that have not started yet and release the thread pool.
+
+        Calls already in flight are not waited for; their results are dropped.
+        Does nothing after finish().
+        """
+        for future in self.futures:
+            future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,138 @@
+"""Per-chunk checkpoint journal, so an interrupted summary can be resumed."""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+
+class ChunkJournal:
+    """
+    Journal of the finished chunks of one item/model pair.
+
+    Every summarized chunk is written to its own file as soon as its result
+    arrives (``data/checkpoints/<item_id>-<model>-<output>/chunk-<index>.json``,
+    where ``<output>`` is a hash of the markdown file the chunks belong to;
+    replaced atomically), holding the parsed ThreadSummaryResponse or the
+    unstructured fallback text. Each entry carries a key over the request
+    (instruction, chunk text, max_output_tokens), so a resumed run only
+    reuses a chunk if it would send exactly the same request again; a thread
+    that changed in the meantime is re-requested from the first differing
+    chunk on. Failed chunks are not journaled and are retried on resume.
+
+    Jobs that write the same output in one process (e.g. duplicate items of
+    a batch) share the journal; lock() serializes them.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, item_id, model, output_file=None, directory=os.path.join("data", "checkpoints")):
+        """
+        Open the journal of an item/model pair.
+
+        Args:
+            item_id: The HN item ID
+            model: The model name
+            output_file: The markdown file the chunks are written to; jobs for
+                other topics of the same item and model get journals of their own
+            directory: Directory holding all journals
+        """
+        self.item_id = str(item_id)
+        self.model = model
+        model_slug = "".join(c if c.isalnum() or c in '.-_' else '-' for c in model)
+        name = f"{self.item_id}-{model_slug}"
+        if output_file:
+            name += "-" + hashlib.sha256(os.path.abspath(output_file).encode('utf-8')).hexdigest()[:12]
+        self.directory = os.path.join(directory, name)
+        self.resumed = 0
+
+    def lock(self):
+        """Return the lock of this journal, to be held while its item is summarized."""
+        with ChunkJournal._locks_guard:
+            return ChunkJournal._locks.setdefault(os.path.abspath(self.directory), threading.Lock())
+
+    @staticmethod
+    def make_key(instruction, chunk_text, max_output_tokens):
+        """Hash the parts of a summarize request that determine its result."""
+        payload = json.dumps([instruction, chunk_text, max_output_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, chunk_index):
+        return os.path.join(self.directory, f"chunk-{chunk_index:05d}.json")
+
+    def __len__(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        return sum(1 for name in names if name.startswith('chunk-') and name.endswith('.json'))
+
+    def load(self, chunk_index, key):
+        """
+        Return the journaled result of a chunk.
+
+        Args:
+            chunk_index: 1-based chunk number
+            key: Key of the request as returned by make_key()
+
+        Returns:
+            Tuple (ThreadSummaryResponse or None, fallback text or None), or None
+            if the chunk is not journaled for this request
+        """
+        try:
+            with open(self._path(chunk_index), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        from .models import ThreadSummaryResponse  # pydantic is slow to import; see cli.run()
+
+        response_data = entry.get('response')
+        if response_data is not None:
+            response_data = ThreadSummaryResponse.model_validate(response_data)
+        self.resumed += 1
+        return response_data, entry.get('fallback_text')
+
+    def save(self, chunk_index, key, response_data, fallback_text):
+        """
+        Write the result of a chunk atomically.
+
+        Args:
+            chunk_index: 1-based chunk number
+            key: Key of the request as returned by make_key()
+            response_data: Parsed ThreadSummaryResponse, or None
+            fallback_text: Unstructured fallback text, or None
+        """
+        entry = {
+            'item_id': self.item_id,
+            'model': self.model,
+            'chunk_index': chunk_index,
+            'key': key,
+            'response': response_data.model_dump() if response_data is not None else None,
+            'fallback_text': fallback_text,
+            'saved_at': time.time(),
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError as e:
+            print(f"Warning: could not journal chunk {chunk_index} of {self.item_id}: {str(e)}", file=sys.stderr)
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(chunk_index))
+        except OSError as e:
+            print(f"Warning: could not journal chunk {chunk_index} of {self.item_id}: {str(e)}", file=sys.stderr)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        """Delete the journal (once the item is complete, or to start over)."""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,408 @@
+"""Comment-aware chunking: pack whole comments and reply subtrees into chunks."""
+
+import sys
+import html
+
+from .utilities import Utilities, THREAD_WRITERS
+
+
+# Top-level subthreads are packed in windows of about this many chunks, so
+# memory use does not grow with the thread (only with its largest subthread)
+PACK_WINDOW_CHUNKS = 8
+
+
+class CommentChunker:
+    """
+    Split a thread into chunks along comment boundaries.
+
+    An entry (author + comment) is never split. Every top-level subthread is
+    kept in one piece if it fits into a chunk; larger subthreads are cut
+    between reply subtrees, keeping replies next to their parents as far as
+    possible. The resulting pieces are bin-packed (first fit decreasing), so
+    a thread needs as few chunks as possible. Within a chunk, entries keep
+    their document order.
+
+    Comments are consumed as a stream: whole top-level subthreads are
+    collected until they fill about PACK_WINDOW_CHUNKS chunks, that window is
+    packed and its chunks are yielded, then the next window starts.
+    """
+
+    def __init__(self, count_tokens, hn_item_id, thread_format='xml'):
+        """
+        Initialize the chunker.
+
+        Args:
+            count_tokens: Callable returning token counts for a list of lines
+            hn_item_id: The HN item ID, used in the chunk header
+            thread_format: Serialization of the entries, a key of THREAD_WRITERS
+        """
+        self.count_tokens = count_tokens
+        self.writer = THREAD_WRITERS[thread_format](None, hn_item_id)
+
+    def _text_tokens(self, texts):
+        """Token counts of texts, counted line by line like iter_chunks() does."""
+        lines = []
+        owners = []
+        for index, text in enumerate(texts):
+            for line in text.splitlines(keepends=True):
+                lines.append(line)
+                owners.append(index)
+        totals = [0] * len(texts)
+        for owner, count in zip(owners, self.count_tokens(lines)):
+            totals[owner] += count
+        return totals
+
+    def _entry(self, comment):
+        """Render a comment as an entry of the thread format."""
+        return {
+            'id': comment['id'],
+            'parent_id': comment.get('parent_id'),
+            'text': self.writer.format_entry(
+                Utilities.sanitize_for_xml(comment['author']),
+                Utilities.comment_text(comment['text'])
+            ),
+            'children': [],
+        }
+
+    def _iter_groups(self, comments):
+        """
+        Group comments into top-level subthreads, in document order.
+
+        A comment whose parent is not in the current group (the story, or a
+        comment that was not kept) starts a new group.
+
+        Yields:
+            Tuple (entries with token counts, tokens of the group)
+        """
+        group = []
+        group_ids = set()
+        for comment in comments:
+            if group and comment.get('parent_id') not in group_ids:
+                yield self._counted(group)
+                group = []
+                group_ids = set()
+            group.append(self._entry(comment))
+            group_ids.add(comment['id'])
+        if group:
+            yield self._counted(group)
+
+    def _counted(self, group):
+        tokens = self._text_tokens([entry['text'] for entry in group])
+        for entry, count in zip(group, tokens):
+            entry['tokens'] = count
+        return group, sum(tokens)
+
+    @staticmethod
+    def _build_tree(entries):
+        """Link the entries of a window into reply trees; return the roots."""
+        index_by_id = {}
+        roots = []
+        for index, entry in enumerate(entries):
+            parent_index = index_by_id.get(entry['parent_id'])
+            index_by_id[entry['id']] = index
+            if parent_index is None:
+                roots.append(index)
+            else:
+                entries[parent_index]['children'].append(index)
+
+        # Subtree sizes, children before parents (children always come later)
+        for entry in reversed(entries):
+            entry['subtree_tokens'] = entry['tokens'] + sum(entries[c]['subtree_tokens'] for c in entry['children'])
+        return roots
+
+    def _pieces(self, entries, index, capacity):
+        """
+        Cut the subtree of an entry into pieces that fit into ``capacity``.
+
+        Subtrees that fit are kept whole. For larger ones, the entry is cut
+        off and its reply subtrees are handled the same way. Neighbouring parts
+        are then merged again while they fit, so parents stay next to as many
+        of their replies as possible.
+
+        Returns:
+            List of pieces; a piece is a list of entry indexes in document order
+        """
+        parts = []
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            if entries[current]['subtree_tokens'] <= capacity:
+                parts.append(self._subtree(entries, current))
+            else:
+                parts.append([current])
+                stack.extend(reversed(entries[current]['children']))
+
+        pieces = []
+        piece = []
+        piece_tokens = 0
+        for part in parts:
+            part_tokens = sum(entries[i]['tokens'] for i in part)
+            if piece and piece_tokens + part_tokens > capacity:
+                pieces.append(piece)
+                piece = []
+                piece_tokens = 0
+            piece.extend(part)
+            piece_tokens += part_tokens
+        if piece:
+            pieces.append(piece)
+        return pieces
+
+    @staticmethod
+    def _subtree(entries, index):
+        """Entry indexes of a subtree in document order, without recursion."""
+        result = []
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(reversed(entries[current]['children']))
+        return result
+
+    def _pack(self, entries, capacity):
+        """
+        Bin-pack the entries of a window (first fit decreasing).
+
+        Returns:
+            List of bins ('indexes' in document order, 'tokens'), in document order
+        """
+        pieces = []
+        for root in self._build_tree(entries):
+            pieces.extend(self._pieces(entries, root, capacity))
+
+        bins = []
+        for piece in sorted(pieces, key=lambda p: -sum(entries[i]['tokens'] for i in p)):
+            piece_tokens = sum(entries[i]['tokens'] for i in piece)
+            for chunk_bin in bins:
+                if chunk_bin['tokens'] + piece_tokens <= capacity:
+                    chunk_bin['indexes'].extend(piece)
+                    chunk_bin['tokens'] += piece_tokens
+                    break
+            else:
+                bins.append({'indexes': list(piece), 'tokens': piece_tokens})
+
+        for chunk_bin in bins:
+            chunk_bin['indexes'].sort()
+        bins.sort(key=lambda b: b['indexes'][0])
+        return bins
+
+    def _iter_bins(self, comments, capacity):
+        """
+        Yield (entries, bin) pairs of the packed windows, in document order.
+
+        The least filled bin of a window is not yielded; its entries are
+        packed again with the next window, so every window boundary does not
+        cost a half-empty chunk.
+        """
+        window = []
+        window_tokens = 0
+        for group, group_tokens in self._iter_groups(comments):
+            if window and window_tokens + group_tokens > PACK_WINDOW_CHUNKS * capacity:
+                bins = self._pack(window, capacity)
+                carried = min(bins, key=lambda b: b['tokens'])
+                for chunk_bin in bins:
+                    if chunk_bin is not carried:
+                        yield window, chunk_bin
+                window = [window[i] for i in carried['indexes']]
+                window_tokens = carried['tokens']
+                for entry in window:
+                    entry['children'] = []
+            window.extend(group)
+            window_tokens += group_tokens
+        if window:
+            for chunk_bin in self._pack(window, capacity):
+                yield window, chunk_bin
+
+    def iter_chunks(self, comments, chunk_token_limit):
+        """
+        Pack comments into chunks, consuming them as a stream.
+
+        Args:
+            comments: Iterable of comments as yielded by Utilities.iter_comments()
+            chunk_token_limit: Maximum tokens per chunk
+
+        Yields:
+            Chunk dictionaries with 'text', 'token_count', 'char_count' and
+            'comment_ids' keys
+
+        Raises:
+            ValueError: If chunk_token_limit is not positive
+        """
+        if chunk_token_limit <= 0:
+            raise ValueError("chunk_token_limit must be greater than zero")
+
+        header = self.writer.format_header()
+        footer = self.writer.format_footer()
+        header_tokens, footer_tokens = self._text_tokens([header, footer])
+        capacity = max(1, chunk_token_limit - header_tokens - footer_tokens)
+
+        # A chunk is held back until the next one exists: the last chunk gets the footer
+        pending = None
+        number = 0
+        for entries, chunk_bin in self._iter_bins(comments, capacity):
+            if pending is not None:
+                yield self._finish_chunk(pending, number, chunk_token_limit)
+            number += 1
+            pending = {
+                'text': ''.join(entries[i]['text'] for i in chunk_bin['indexes']),
+                'token_count': chunk_bin['tokens'],
+                'entries': len(chunk_bin['indexes']),
+                'comment_ids': [entries[i]['id'] for i in chunk_bin['indexes']],
+            }
+            if number == 1:
+                pending['text'] = header + pending['text']
+                pending['token_count'] += header_tokens
+        if pending is not None:
+            pending['text'] += footer
+            pending['token_count'] += footer_tokens
+            yield self._finish_chunk(pending, number, chunk_token_limit)
+
+    @staticmethod
+    def _finish_chunk(chunk, number, chunk_token_limit):
+        entries = chunk.pop('entries')
+        chunk['char_count'] = len(chunk['text'])
+        note = " (single-entry overflow)" if chunk['token_count'] > chunk_token_limit else ""
+        print(
+            f"[tokenizer] chunk {number}: {chunk['token_count']} tokens ({chunk['char_count']} chars, "
+            f"{entries} entries) / limit {chunk_token_limit}{note}",
+            file=sys.stdout
+        )
+        return {
+            'text': chunk['text'],
+            'token_count': chunk['token_count'],
+            'char_count': chunk['char_count'],
+            'comment_ids': chunk['comment_ids'],
+        }
+
+    def chunk(self, comments, chunk_token_limit):
+        """
+        Pack comments into chunks.
+
+        Returns:
+            List of the chunks yielded by iter_chunks()
+        """
+        return list(self.iter_chunks(comments, chunk_token_limit))
+
+
+def _is_entry_start(line):
+    """Check whether a line of a chunk starts an entry (``<entry>`` in XML, any ``author:`` line in compact)."""
+    stripped = line.lstrip()
+    return stripped.startswith('<entry>') or (bool(stripped) and not stripped.startswith('<'))
+
+
+def _preamble_length(lines, first_entry):
+    """
+    Number of thread header lines (``<?xml``, ``<thread>``, ``<tableheader/>``) a chunk starts with.
+
+    Only the header counts: a line-based chunk may start with the tail of
+    an entry of the previous chunk, which must not be repeated.
+    """
+    length = 0
+    while length < first_entry and lines[length].lstrip().startswith(('<?xml', '<thread', '<tableheader')):
+        length += 1
+    return length
+
+
+def split_chunk(chunk, count_tokens):
+    """
+    Split a chunk into two halves along an entry boundary.
+
+    Used when the response to a chunk was truncated: each half needs about
+    half of the output tokens. The boundary closest to the middle of the
+    text is used; entries are never split. The thread header of a first
+    chunk (XML declaration, ``<thread>``, ``<tableheader/>``) is repeated at
+    the start of the second half.
+
+    Args:
+        chunk: Chunk dictionary (or plain string)
+        count_tokens: Callable returning token counts for a list of lines
+
+    Returns:
+        Two chunk dictionaries with 'text', 'token_count', 'char_count' (and
+        'comment_ids' if the chunk had them), or None if the chunk holds
+        only one entry
+    """
+    text = chunk['text'] if isinstance(chunk, dict) else chunk
+    lines = text.splitlines(keepends=True)
+    starts = [index for index, line in enumerate(lines) if _is_entry_start(line)]
+    # The first entry start belongs to the first half
+    boundaries = starts[1:]
+    if not boundaries:
+        return None
+
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    middle = len(text) / 2
+    split_at = min(boundaries, key=lambda index: abs(offsets[index] - middle))
+
+    halves = []
+    line_tokens = count_tokens(lines)
+    preamble = range(_preamble_length(lines, starts[0]))
+    for part in (range(0, split_at), [*preamble, *range(split_at, len(lines))]):
+        part_text = ''.join(lines[index] for index in part)
+        halves.append({
+            'text': part_text, 'token_count': sum(line_tokens[index] for index in part), 'char_count': len(part_text)
+        })
+
+    comment_ids = chunk.get('comment_ids') if isinstance(chunk, dict) else None
+    if comment_ids is not None and len(comment_ids) == len(starts):
+        first_entries = sum(1 for index in starts if index < split_at)
+        halves[0]['comment_ids'] = comment_ids[:first_entries]
+        halves[1]['comment_ids'] = comment_ids[first_entries:]
+    return halves
+
+
+def _entry_authors(lines):
+    """Return [line index, author] of every entry that starts in ``lines``."""
+    entries = []
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith('<entry>'):
+            entries.append([index, None])
+        elif stripped.startswith('<author>') and entries and entries[-1][1] is None:
+            entries[-1][1] = html.unescape(stripped[len('<author>'):-len('</author>')])
+        elif _is_entry_start(line):
+            entries.append([index, stripped.split(': ', 1)[0]])
+    return entries
+
+
+def remainder_chunk(chunk, participants, count_tokens):
+    """
+    Cut off the part of a chunk that salvaged summaries already cover.
+
+    Summaries come in the order of the entries, and entries without an
+    argument are skipped by the model. The participants are matched to the
+    entry authors in order; everything up to the entry of the last match
+    counts as covered. The remainder starts with the thread header of the
+    chunk, if it has one, like split_chunk() halves.
+
+    Args:
+        chunk: Chunk dictionary (or plain string)
+        participants: Participant names of the salvaged summaries, in output order
+        count_tokens: Callable returning token counts for a list of lines
+
+    Returns:
+        Tuple (number of covered entries, remainder chunk dictionary or None if
+        nothing is left); 0 covered entries means no participant matched
+    """
+    text = chunk['text'] if isinstance(chunk, dict) else chunk
+    lines = text.splitlines(keepends=True)
+    entries = _entry_authors(lines)
+    authors = [(author or "").strip().casefold() for _, author in entries]
+    covered = 0
+    for participant in participants:
+        participant = participant.strip().casefold()
+        for index in range(covered, len(entries)):
+            if authors[index] == participant:
+                covered = index + 1
+                break
+    if covered == 0 or covered == len(entries):
+        return covered, None
+
+    rest = lines[:_preamble_length(lines, entries[0][0])] + lines[entries[covered][0]:]
+    rest_text = ''.join(rest)
+    remainder = {'text': rest_text, 'token_count': sum(count_tokens(rest)), 'char_count': len(rest_text)}
+    comment_ids = chunk.get('comment_ids') if isinstance(chunk, dict) else None
+    if comment_ids is not None and len(comment_ids) == len(entries):
+        remainder['comment_ids'] = comment_ids[covered:]
+    return covered, remainder
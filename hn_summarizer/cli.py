@@ -3,14 +3,29 @@
 import os
 import sys
 import re
+import json
+import time
+import uuid
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 from dotenv import load_dotenv
 
-from .utilities import Utilities
-from .llm_interaction import LLMInteraction
+from .utilities import Utilities, THREAD_WRITERS
+from .response_cache import ResponseCache
+from .thread_store import ThreadStore
+from .incremental import IncrementalState
+from .telemetry import RunTelemetry
+from .comment_filter import CommentFilter, DEFAULT_BOILERPLATE
 from .version_check import ensure_structured_output_support
 
+# Instruction matching each intermediate thread format
+INSTRUCTION_FILES = {'xml': "input/instruction.txt", 'compact': "input/instruction-compact.txt"}
+
+# Call and chunk records kept in the run report of --serve and --watch, which run until interrupted
+RESIDENT_MAX_RECORDS = 1000
+
 
 class HNSummarizerCLI:
     """Main CLI class for the HN Thread Summarizer."""
@@ -22,8 +37,14 @@ class HNSummarizerCLI:
         )
         parser.add_argument(
             '--hnitem',
-            help='Hacker News item URL, or id, e.g. 39577113',
-            required=True
+            help='Hacker News item URL(s), or id(s), e.g. 39577113',
+            nargs='+',
+            default=[]
+        )
+        parser.add_argument(
+            '--batch-file',
+            help='File with one HN item URL or id per line ("-" reads stdin)',
+            default=None
         )
         parser.add_argument(
             '--topic',
@@ -38,65 +59,1052 @@ class HNSummarizerCLI:
         )
         parser.add_argument(
             '--model',
-            help='Model to use for OpenAI, e.g. "gpt-4o", "gpt-4o-mini"',
-            default='gpt-4o-mini'
+            help='Model(s) to use for OpenAI, e.g. "gpt-4o", "gpt-4o-mini"; with several models '
+                 '(space or comma separated) each thread is downloaded and chunked once and summarized by all '
+                 'models concurrently, followed by a comparison report',
+            nargs='+',
+            default=['gpt-4o-mini']
+        )
+        parser.add_argument(
+            '--max-output-tokens',
+            help='Output token budget of a summarize request (default: per model, e.g. 5000 for gpt-4o-mini, '
+                 '16000 for gpt-5 models); chunks are sized from it and the output ratio observed for the model',
+            type=int
+        )
+        parser.add_argument(
+            '--concurrency',
+            help='Number of chunks sent to the LLM in parallel (default: 1)',
+            type=int,
+            default=1
+        )
+        parser.add_argument(
+            '--workers',
+            help='Number of HN items processed in parallel in batch mode, or jobs in --serve mode (default: 1)',
+            type=int,
+            default=1
+        )
+        parser.add_argument(
+            '--rpm',
+            help='Requests per minute allowed for the model; requests are paced to stay below it '
+                 '(default: taken from the API rate limit headers)',
+            type=int
+        )
+        parser.add_argument(
+            '--tpm',
+            help='Tokens per minute allowed for the model (default: taken from the API rate limit headers)',
+            type=int
+        )
+        parser.add_argument(
+            '--max-retries',
+            help='Retries of a request after rate limit (429), timeout or server errors, '
+                 'with exponential backoff (default: 6)',
+            type=int,
+            default=6
+        )
+        parser.add_argument(
+            '--stream',
+            help='Stream the LLM responses and write each table row as soon as it is complete',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--chunker',
+            help='How the thread is split into chunks: "comments" packs whole comments and reply subtrees '
+                 'into as few chunks as possible (streamed, a few chunks at a time), "lines" splits the '
+                 'intermediate XML file line by line (default: comments)',
+            choices=['comments', 'lines'],
+            default='comments'
+        )
+        parser.add_argument(
+            '--thread-format',
+            help='Serialization of the comments sent to the model: "xml" (<entry>/<author>/<comment> elements) '
+                 'or "compact" ("author: comment" lines, fewer tokens; uses input/instruction-compact.txt) '
+                 '(default: xml)',
+            choices=sorted(THREAD_WRITERS),
+            default='xml'
+        )
+        parser.add_argument(
+            '--compare-formats',
+            help='Count the tokens of every thread in both formats and report the difference',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--filter',
+            help='Drop short and boilerplate comments, strip quoted parent text ("> ...") and collapse '
+                 'near-duplicate comments before chunking',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--filter-min-chars',
+            help='With --filter, comments with less text (after quote stripping) are dropped (default: 20)',
+            type=int,
+            default=20
+        )
+        parser.add_argument(
+            '--filter-duplicates',
+            help='With --filter, word shingle similarity (Jaccard) from which a comment counts as a duplicate '
+                 'of an earlier one; 0 keeps duplicates (default: 0.7)',
+            type=float,
+            default=0.7
+        )
+        parser.add_argument(
+            '--filter-keep-quotes',
+            help='With --filter, keep quoted parent text',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--filter-patterns',
+            metavar='FILE',
+            help='With --filter, additional regular expressions (one per line) matching whole boilerplate comments'
+        )
+        parser.add_argument(
+            '--cache-dir',
+            help='Directory of the on-disk LLM response cache (default: data/llm_cache)',
+            default=os.path.join("data", "llm_cache")
+        )
+        parser.add_argument(
+            '--cache-max-mb',
+            help='Size cap of the LLM response cache in MB; least recently used entries are evicted (default: 200)',
+            type=float,
+            default=200
+        )
+        parser.add_argument(
+            '--no-cache',
+            help='Do not read or write the LLM response cache',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--thread-ttl',
+            help='Seconds a downloaded thread is reused before it is checked for updates (default: 86400)',
+            type=int,
+            default=86400
+        )
+        parser.add_argument(
+            '--refresh',
+            help='Download the thread again, even if the stored copy is still fresh',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--resume',
+            help='Continue an interrupted run: chunks summarized before (journaled in data/checkpoints/) are '
+                 'not requested again, and the stored thread is used without checking for updates',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--incremental',
+            help='Only summarize comments that are new since the last incremental run and merge them into the table',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--categorize-token-budget',
+            help='Maximum input tokens of one categorization call; larger tables are categorized '
+                 'in parallel batches whose results are merged (default: 20000)',
+            type=int,
+            default=20000
+        )
+        parser.add_argument(
+            '--recategorize-threshold',
+            help='In --incremental mode, regenerate categories only if the table grew by this fraction (default: 0.2)',
+            type=float,
+            default=0.2
+        )
+        parser.add_argument(
+            '--batch-api',
+            help='Submit the chunks of all items as one OpenAI Batch API job (cheaper, results within 24h) '
+                 'instead of calling the API chunk by chunk',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--batch-resume',
+            metavar='JOB',
+            help='Check a submitted batch job (job name or batch id) and write its markdown files when it is finished'
+        )
+        parser.add_argument(
+            '--batch-wait',
+            help='With --batch-api/--batch-resume, poll until the batch is finished',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--batch-poll-seconds',
+            help='Seconds between two status checks with --batch-wait (default: 60)',
+            type=int,
+            default=60
+        )
+        parser.add_argument(
+            '--batch-endpoint',
+            help='"openai" uses the Batch API, "local" runs the job through a local stand-in '
+                 'that sends the requests one by one (default: openai)',
+            choices=['openai', 'local'],
+            default='openai'
+        )
+        parser.add_argument(
+            '--db',
+            nargs='?',
+            const=os.path.join("data", "hn.sqlite3"),
+            metavar='PATH',
+            help='Also store threads, comments and summary rows in a SQLite database with a full-text index '
+                 '(default path: data/hn.sqlite3)'
+        )
+        parser.add_argument(
+            '--search',
+            metavar='QUERY',
+            help='Search the summarized arguments in the --db database (FTS5 syntax, e.g. "rust NOT go") and exit'
+        )
+        parser.add_argument(
+            '--search-comments',
+            metavar='QUERY',
+            help='Search the comment texts in the --db database and exit'
+        )
+        parser.add_argument(
+            '--search-author',
+            metavar='NAME',
+            help='List the threads a user commented in, from the --db database, and exit'
+        )
+        parser.add_argument(
+            '--report',
+            help='Path of the JSON run report with timing, token usage and cost '
+                 '(default: final_output/run-report-<timestamp>.json)'
+        )
+        parser.add_argument(
+            '--profile',
+            help='Run under cProfile; statistics are written to output/profile-<timestamp>.prof and the top '
+                 'functions are printed (worker threads are not profiled)',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--serve',
+            help='Run as a resident server that summarizes threads submitted over a local HTTP job API '
+                 '(POST /jobs); the client and tokenizer stay loaded between jobs',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--listen',
+            help='HOST:PORT the --serve job API listens on (default: 127.0.0.1:8765)',
+            default='127.0.0.1:8765'
+        )
+        parser.add_argument(
+            '--unix-socket',
+            metavar='PATH',
+            help='With --serve, listen on this Unix domain socket instead of --listen'
+        )
+        parser.add_argument(
+            '--watch',
+            help='Poll the HN front page and re-summarize threads whose comment count changed, '
+                 'fastest growing first (--workers summaries at a time)',
+            action='store_true'
+        )
+        parser.add_argument(
+            '--watch-interval',
+            help='Seconds between two front page polls with --watch (default: 300)',
+            type=int,
+            default=300
+        )
+        parser.add_argument(
+            '--watch-token-budget',
+            help='Maximum tokens (input plus output) --watch spends per hour (default: 500000)',
+            type=int,
+            default=500000
+        )
+        parser.add_argument(
+            '--watch-stories',
+            help='Number of front page stories watched (default: 30)',
+            type=int,
+            default=30
+        )
+        parser.add_argument(
+            '--watch-min-comments',
+            help='Stories with fewer comments are not summarized by --watch (default: 20)',
+            type=int,
+            default=20
+        )
+        parser.add_argument(
+            '--watch-polls',
+            help='Stop --watch after this many polls (default: 0 = run until interrupted)',
+            type=int,
+            default=0
+        )
+        parser.add_argument(
+            '--algolia-url',
+            help='Base URL of the Algolia HN API, e.g. a local stand-in (default: https://hn.algolia.com/api/v1)'
         )
         
         args = parser.parse_args()
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1")
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+
+        models = list(dict.fromkeys(model for value in args.model for model in value.split(',') if model))
+        if not models:
+            parser.error("--model needs at least one model name")
+        if len(models) > 1 and (args.batch_api or args.batch_resume or args.serve or args.watch):
+            parser.error("several models are not supported with --batch-api, --batch-resume, --serve or --watch")
+
+        hnitems = list(args.hnitem)
+        if args.batch_file:
+            hnitems.extend(self.read_batch_file(args.batch_file))
+        searching = args.search or args.search_comments or args.search_author
+        if searching and not args.db:
+            args.db = os.path.join("data", "hn.sqlite3")
+        if not hnitems and not args.batch_resume and not args.serve and not args.watch and not searching:
+            parser.error("at least one HN item is required (--hnitem or --batch-file)")
+
         self.config = {
             'api_key': args.key,
-            'model': args.model,
-            'hnitem': args.hnitem,
-            'topic': args.topic
+            'model': models[0],
+            'models': models,
+            'hnitems': hnitems,
+            'topic': args.topic,
+            'max_output_tokens': args.max_output_tokens,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'chunker': args.chunker,
+            'thread_format': args.thread_format,
+            'compare_formats': args.compare_formats,
+            'filter': args.filter,
+            'filter_min_chars': args.filter_min_chars,
+            'filter_duplicates': args.filter_duplicates,
+            'filter_keep_quotes': args.filter_keep_quotes,
+            'filter_patterns': args.filter_patterns,
+            'stream': args.stream,
+            'rpm': args.rpm,
+            'tpm': args.tpm,
+            'max_retries': args.max_retries,
+            'cache_dir': None if args.no_cache else args.cache_dir,
+            'cache_max_bytes': int(args.cache_max_mb * 1024 * 1024),
+            'thread_ttl': args.thread_ttl,
+            'refresh': args.refresh,
+            'resume': args.resume,
+            'incremental': args.incremental,
+            'recategorize_threshold': args.recategorize_threshold,
+            'categorize_token_budget': args.categorize_token_budget,
+            'batch_api': args.batch_api,
+            'batch_resume': args.batch_resume,
+            'batch_wait': args.batch_wait,
+            'batch_poll_seconds': args.batch_poll_seconds,
+            'batch_endpoint': args.batch_endpoint,
+            'db': args.db,
+            'search': args.search,
+            'search_comments': args.search_comments,
+            'search_author': args.search_author,
+            'report': args.report,
+            'profile': args.profile,
+            'serve': args.serve,
+            'listen': args.listen,
+            'unix_socket': args.unix_socket,
+            'watch': args.watch,
+            'watch_interval': args.watch_interval,
+            'watch_token_budget': args.watch_token_budget,
+            'watch_stories': args.watch_stories,
+            'watch_min_comments': args.watch_min_comments,
+            'watch_polls': args.watch_polls,
+            'algolia_url': args.algolia_url
         }
+        self.thread_store = None
+        self.telemetry = RunTelemetry(
+            max_records=RESIDENT_MAX_RECORDS if self.config['serve'] or self.config['watch'] else None
+        )
+        self.store = None
+        self.profiles = None
+        self.run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
 
-    def run(self):
-        """Execute the main summarization workflow."""
-        Utilities.create_subdirectories()
-        
-        hnitem_dict = Utilities.check_hnitem(self.config['hnitem'])
+    @staticmethod
+    def read_batch_file(path):
+        """
+        Read HN item ids/URLs from a file, one per line.
+
+        Blank lines and lines starting with '#' are ignored.
+
+        Args:
+            path: Path to the file, or "-" for stdin
+
+        Returns:
+            List of HN item ids/URLs
+        """
+        if path == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(path, 'r') as f:
+                lines = f.read().splitlines()
+        return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+    def describe_item(self, hnitem):
+        """
+        Work out the id, topic line, output file and token limits of an HN item.
+
+        Args:
+            hnitem: Hacker News item URL or id
+
+        Returns:
+            dict with 'hnitem', 'hnitem_id', 'topic_line', 'final_outfile',
+            'max_output_tokens' and 'chunk_token_limit' keys
+        """
+        hnitem_dict = Utilities.check_hnitem(hnitem)
         hnitem = hnitem_dict['hnitem']
         hnitem_id = hnitem_dict['hnitem_id']
 
         topic_line = f"# HN Topic: [{self.config['topic']}]({hnitem}), (hnitem id {hnitem_id}), and discussion"
         topic_cleaned = re.sub(r'\W+', '-', f"{self.config['topic']}-{hnitem}")
         
-        intermediate_file = os.path.join("output", f"{topic_cleaned}-{self.config['model']}.xml")
         final_outfile = os.path.join("final_output", f"{topic_cleaned}-{self.config['model']}.md")
-        max_output_tokens = 5000
-        chunk_token_limit = int(max_output_tokens * 2.5)
+        # Sized from the calls of this run so far, too
+        self.profiles.observe(self.telemetry)
+        max_output_tokens, chunk_token_limit = self.profiles.limits(
+            self.config['model'], self.config['max_output_tokens'], item_id=hnitem_id
+        )
+        return {
+            'hnitem': hnitem,
+            'hnitem_id': hnitem_id,
+            'topic_line': topic_line,
+            'final_outfile': final_outfile,
+            'max_output_tokens': max_output_tokens,
+            'chunk_token_limit': chunk_token_limit,
+        }
+
+    def summarize_item(self, hnitem, llm_interaction, instruction, chunks=None, fetched=False):
+        """
+        Download, chunk and summarize a single HN thread.
+
+        Args:
+            hnitem: Hacker News item URL or id
+            llm_interaction: Shared LLMInteraction instance
+            instruction: System instruction for the LLM
+            chunks: Optional chunks of the already downloaded thread (e.g. shared by
+                several models); not used with --incremental
+            fetched: The thread was already fetched for this run (e.g. by the model fan-out)
+
+        Returns:
+            Path of the final markdown file
+        """
+        item = self.describe_item(hnitem)
+        hnitem_id = item['hnitem_id']
+        topic_line = item['topic_line']
+        final_outfile = item['final_outfile']
+        max_output_tokens = item['max_output_tokens']
+        chunk_token_limit = item['chunk_token_limit']
+
+        if self.config['incremental']:
+            if not fetched:
+                self.fetch_item(hnitem_id)
+            return self.summarize_item_incremental(
+                hnitem_id, topic_line, final_outfile, llm_interaction, instruction,
+                chunk_token_limit, max_output_tokens
+            )
+
+        from .checkpoint import ChunkJournal
+
+        journal = ChunkJournal(hnitem_id, self.config['model'], final_outfile)
+        # Jobs writing the same file (duplicate items, server jobs) take turns with the journal
+        with journal.lock():
+            if self.config['resume']:
+                print(f"Resuming item {hnitem_id}: {len(journal)} chunks journaled", file=sys.stderr)
+            else:
+                journal.clear()
+            if chunks is None:
+                if not fetched:
+                    self.fetch_item(hnitem_id)
+                chunks = self.iter_item_chunks(hnitem_id, llm_interaction, chunk_token_limit)
+            # The rows in the --db database are replaced once the whole thread is summarized
+            summary = None
+            if self.store is not None:
+                summary = self.store.begin_summary(hnitem_id, self.config['model'], self.run_id)
+            # The categorizer's map phase starts while later chunks are still being summarized;
+            # if summarizing fails, leaving the block cancels the pending map calls
+            with llm_interaction.make_categorizer(topic_line, max_output_tokens) as categorizer:
+                with self.telemetry.stage('send_to_llm'):
+                    num_chunks = llm_interaction.send_to_llm(
+                        topic_line, chunks, instruction, final_outfile, max_output_tokens, on_rows=categorizer.add_rows,
+                        on_result=summary.add_chunk_result if summary is not None else None, journal=journal
+                    )
+                if summary is not None:
+                    summary.commit()
+
+                print(f"Number of data chunks: {num_chunks}", file=sys.stderr)
+                if journal.resumed:
+                    print(f"Resumed {journal.resumed} of {num_chunks} chunks from the journal", file=sys.stderr)
+                    self.telemetry.add_counts('checkpoint', {'resumed_chunks': journal.resumed, 'chunks': num_chunks})
+
+                # Second pass: categorize the arguments
+                with self.telemetry.stage('categorize'):
+                    llm_interaction.categorize_arguments(final_outfile, max_output_tokens, categorizer=categorizer)
+            if len(journal) >= num_chunks:
+                journal.clear()
+                # The pinned chunk size only has to match the journal
+                self.profiles.unpin(hnitem_id, self.config['model'])
+            else:
+                print(
+                    f"{num_chunks - len(journal)} chunks of item {hnitem_id} failed; "
+                    f"run again with --resume to retry them",
+                    file=sys.stderr
+                )
+        return final_outfile
+
+    def fetch_item(self, hnitem_id):
+        """
+        Make sure the thread is in the thread store.
+
+        A resumed run keeps the stored download; an incremental run always
+        checks for new comments with a conditional request, whatever the TTL.
+        """
+        with self.telemetry.stage('fetch'):
+            if self.config['incremental']:
+                self.thread_store.refresh(hnitem_id, force=self.config['refresh'], revalidate=True)
+            # Chunking the same download again keeps the journaled chunks valid
+            elif not (self.config['resume'] and self.thread_store.load_meta(hnitem_id)):
+                self.thread_store.refresh(hnitem_id, force=self.config['refresh'])
+
+    def iter_item_chunks(self, hnitem_id, llm_interaction, chunk_token_limit, comments=None):
+        """
+        Yield the chunks of a stored thread with the configured chunker and thread format.
+
+        With --filter, the comments pass the CommentFilter first; its stats
+        are printed and added to the run report once all chunks are produced,
+        as are the token counts of both thread formats with --compare-formats.
+
+        Args:
+            hnitem_id: The HN item ID (the thread must be in the thread store)
+            llm_interaction: LLMInteraction used for tokenization
+            chunk_token_limit: Maximum tokens per chunk
+            comments: Optional subset of the comments to chunk (default: all)
+
+        Yields:
+            Chunk dictionaries
+        """
+        self.record_thread(hnitem_id)
+        thread_format = self.config['thread_format']
+        delta = comments is not None
+        comment_filter = self.make_comment_filter(llm_interaction)
+        if comment_filter is not None:
+            comments = comment_filter.filter(comments if delta else self.thread_store.iter_comments(hnitem_id))
 
-        if not os.path.isfile(intermediate_file):
-            Utilities.download_hn_thread(hnitem_id, intermediate_file)
+        format_tokens = None
+        if self.config['compare_formats']:
+            format_tokens = dict.fromkeys(THREAD_WRITERS, 0)
+            if comments is None and self.config['chunker'] == 'lines':
+                # The stored intermediate file is used as is; count the formats in a pass of their own
+                for _ in self.iter_format_tokens(
+                    hnitem_id, self.thread_store.iter_comments(hnitem_id), llm_interaction, format_tokens
+                ):
+                    pass
+            else:
+                if comments is None:
+                    comments = self.thread_store.iter_comments(hnitem_id)
+                comments = self.iter_format_tokens(hnitem_id, comments, llm_interaction, format_tokens)
+
+        if self.config['chunker'] == 'comments':
+            if comments is None:
+                comments = self.thread_store.iter_comments(hnitem_id)
+            yield from self.telemetry.timed_iter(
+                'chunking', llm_interaction.chunk_comments(hnitem_id, comments, chunk_token_limit, thread_format)
+            )
         else:
-            print(f"File {intermediate_file} already exists, skipping download.", file=sys.stderr)
-        
-        with open(intermediate_file, 'r') as f:
-            text = f.read()
-        
-        print(f"Read {intermediate_file}...:  {len(text)}  chars read.", file=sys.stderr)
+            with self.telemetry.stage('xml_build'):
+                if comments is None:
+                    xml_file = self.thread_store.intermediate_file(hnitem_id, thread_format)
+                else:
+                    model_slug = re.sub(r'\W+', '-', self.config['model'])
+                    suffix = "delta" if delta else "filtered"
+                    extension = THREAD_WRITERS[thread_format].file_extension
+                    xml_file = os.path.join("output", f"hn-{hnitem_id}-{suffix}-{model_slug}{extension}")
+                    Utilities.write_thread_xml(hnitem_id, comments, xml_file, thread_format)
+            print(f"Streaming {xml_file} ({os.path.getsize(xml_file)} bytes)...", file=sys.stderr)
+            with open(xml_file, 'r') as f:
+                yield from self.telemetry.timed_iter('chunking', llm_interaction.iter_chunks(f, chunk_token_limit))
+
+        if comment_filter is not None:
+            comment_filter.report(hnitem_id)
+            self.telemetry.add_counts('comment_filter', comment_filter.stats)
+        if format_tokens is not None:
+            savings = 1 - format_tokens['compact'] / format_tokens['xml'] if format_tokens['xml'] else 0.0
+            print(
+                f"Thread {hnitem_id} tokens: xml {format_tokens['xml']}, compact {format_tokens['compact']} "
+                f"({savings:.0%} fewer)",
+                file=sys.stderr
+            )
+            self.telemetry.add_counts('thread_format_tokens', format_tokens)
+
+    @staticmethod
+    def iter_format_tokens(hnitem_id, comments, llm_interaction, totals):
+        """
+        Pass comments through while adding up their tokens in every thread format.
+
+        Args:
+            hnitem_id: The HN item ID
+            comments: Iterable of comments
+            llm_interaction: LLMInteraction used for tokenization
+            totals: Dict of format name to token count, updated in place
+
+        Yields:
+            The comments, unchanged
+        """
+        writers = {name: writer_class(None, hnitem_id) for name, writer_class in THREAD_WRITERS.items()}
+        for name, writer in writers.items():
+            totals[name] += llm_interaction.count_tokens(writer.format_header() + writer.format_footer())
+        for comment in comments:
+            author = Utilities.sanitize_for_xml(comment['author'])
+            text = Utilities.comment_text(comment['text'])
+            for name, writer in writers.items():
+                totals[name] += llm_interaction.count_tokens(writer.format_entry(author, text))
+            yield comment
+
+    def make_comment_filter(self, llm_interaction):
+        """
+        Create the configured comment pre-filter.
+
+        Args:
+            llm_interaction: LLMInteraction used to count the tokens saved
+
+        Returns:
+            A CommentFilter, or None if filtering is off
+        """
+        if not self.config['filter']:
+            return None
+        patterns = list(DEFAULT_BOILERPLATE)
+        if self.config['filter_patterns']:
+            patterns.extend(CommentFilter.read_patterns(self.config['filter_patterns']))
+        return CommentFilter(
+            count_tokens=llm_interaction.count_tokens,
+            min_chars=self.config['filter_min_chars'],
+            quotes=not self.config['filter_keep_quotes'],
+            duplicate_threshold=self.config['filter_duplicates'],
+            boilerplate=patterns,
+        )
+
+    def summarize_item_incremental(self, hnitem_id, topic_line, final_outfile, llm_interaction, instruction,
+                                   chunk_token_limit, max_output_tokens):
+        """
+        Summarize only the comments added since the last incremental run.
+
+        New rows are appended to the stored rows and the markdown file is
+        re-rendered from them. Categories are regenerated only when the table
+        grew by at least ``recategorize_threshold``.
+
+        Returns:
+            Path of the final markdown file
+        """
+        meta = self.thread_store.load_meta(hnitem_id)
+        state = IncrementalState(hnitem_id, self.config['model'])
+        new_comments = list(state.new_comments(self.thread_store.iter_comments(hnitem_id)))
+        print(
+            f"Incremental: {len(new_comments)} new of {meta['num_comments']} comments, "
+            f"{state.row_count} rows already summarized",
+            file=sys.stderr
+        )
+
+        if new_comments:
+            new_entries = []
+            failed_chunks = 0
+            chunks = self.iter_item_chunks(hnitem_id, llm_interaction, chunk_token_limit, comments=new_comments)
+            for response_data, fallback_text in llm_interaction.iter_chunk_results(chunks, instruction, max_output_tokens):
+                if response_data:
+                    new_entries.extend(summary.model_dump() for summary in response_data.summaries)
+                elif fallback_text:
+                    new_entries.append({'text': fallback_text})
+                else:
+                    failed_chunks += 1
+
+            if failed_chunks:
+                # Rows cannot be mapped back to comment ids, so a partial delta is not
+                # recorded; the next run retries it (successful chunks come from the cache).
+                print(f"Incremental: {failed_chunks} chunk(s) failed, new comments not recorded", file=sys.stderr)
+            else:
+                # The first incremental run replaces rows stored by earlier full runs
+                first_rows = not state.entries
+                state.entries.extend(new_entries)
+                if self.store is not None:
+                    self.store.save_entries(
+                        hnitem_id, self.config['model'], self.run_id, new_entries, replace=first_rows
+                    )
+                state.summarized_ids.update(comment['id'] for comment in new_comments)
+
+        if state.needs_categorization(self.config['recategorize_threshold']):
+            print(f"Categorizing {state.row_count} rows", file=sys.stderr)
+            try:
+                with self.telemetry.stage('categorize'):
+                    with llm_interaction.make_categorizer(topic_line, max_output_tokens) as categorizer:
+                        categorizer.add_rows(llm_interaction.table_lines(
+                            llm_interaction.render_markdown(topic_line, state.entries).split('\n')
+                        ))
+                        categories = categorizer.finish()
+                if categories:
+                    state.categories = categories
+                    state.categorized_rows = state.row_count
+            except Exception as e:
+                print(f"Error during categorization: {str(e)}", file=sys.stderr)
+        elif state.categories:
+            print("Incremental: keeping previous categories", file=sys.stderr)
+
+        state.save()
+        with open(final_outfile, 'w') as f:
+            f.write(llm_interaction.render_markdown(topic_line, state.entries, state.categories))
+        print(f"Incremental summary written to {final_outfile}", file=sys.stderr)
+        return final_outfile
+
+    def run_batch(self, llm_interaction, instruction):
+        """
+        Summarize all configured HN items through a shared worker pool.
+
+        Every item is handled independently: a failure is recorded in the
+        batch report and does not stop the other items.
+
+        Args:
+            llm_interaction: Shared LLMInteraction instance
+            instruction: System instruction for the LLM
+
+        Returns:
+            List of per-item report dictionaries
+        """
+        def process(hnitem):
+            started = time.monotonic()
+            entry = {'hnitem': hnitem, 'status': 'ok', 'final_outfile': None, 'error': None}
+            try:
+                entry['final_outfile'] = self.summarize_item(hnitem, llm_interaction, instruction)
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+                print(f"Error processing item {hnitem}: {str(e)}", file=sys.stderr)
+            entry['seconds'] = round(time.monotonic() - started, 3)
+            return entry
+
+        with ThreadPoolExecutor(max_workers=self.config['workers']) as executor:
+            return list(executor.map(process, self.config['hnitems']))
+
+    def write_batch_report(self, report, started):
+        """
+        Print a batch summary and write it as JSON to final_output/.
 
-        instruction_file_path = "input/instruction.txt"
+        Args:
+            report: List of per-item report dictionaries
+            started: Batch start time as returned by time.monotonic()
+
+        Returns:
+            Path of the JSON report
+        """
+        report_file = os.path.join(
+            "final_output", f"batch-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        payload = {
+            'model': self.config['model'],
+            'items': report,
+            'total_seconds': round(time.monotonic() - started, 3),
+        }
+        with open(report_file, 'w') as f:
+            json.dump(payload, f, indent=2)
+
+        failed = sum(1 for entry in report if entry['status'] != 'ok')
+        print(f"Batch finished: {len(report) - failed} ok, {failed} failed, {payload['total_seconds']}s", file=sys.stderr)
+        for entry in report:
+            print(f"  {entry['status']:<6} {entry['seconds']:>8.1f}s  {entry['hnitem']}", file=sys.stderr)
+        print(f"Batch report written to {report_file}", file=sys.stderr)
+        return report_file
+
+    def make_batch_runner(self, llm_interaction):
+        """Create a BatchRunner for the configured endpoint."""
+        from .batch_api import BatchRunner, LocalBatchClient
+
+        if self.config['batch_endpoint'] == 'local':
+            def responder(body):
+                return llm_interaction.responses_api.create(**body).model_dump()
+            client = LocalBatchClient(responder)
+        else:
+            client = llm_interaction.client
+        return BatchRunner(llm_interaction, client)
+
+    def run_batch_api(self, llm_interaction, instruction):
+        """
+        Submit all configured items as one Batch API job, or resume a job.
+
+        The markdown files are assembled once the batch is finished; without
+        --batch-wait, an unfinished job is left for a later --batch-resume run.
+
+        Args:
+            llm_interaction: Shared LLMInteraction instance
+            instruction: System instruction for the LLM
+
+        Returns:
+            List of written markdown files (empty if the job is not finished)
+        """
+        from .batch_api import TERMINAL_STATUSES
+
+        runner = self.make_batch_runner(llm_interaction)
+        if self.config['batch_resume']:
+            job = runner.load(self.config['batch_resume'])
+            if job['model'] != self.config['model']:
+                print(f"Batch job {job['name']} uses model {job['model']}", file=sys.stderr)
+                self.config['model'] = job['model']
+                self.config['models'] = [job['model']]
+        else:
+            items = []
+            seen = set()
+            for hnitem in self.config['hnitems']:
+                item = self.describe_item(hnitem)
+                if item['hnitem_id'] in seen:
+                    continue
+                seen.add(item['hnitem_id'])
+                with self.telemetry.stage('fetch'):
+                    self.thread_store.refresh(item['hnitem_id'], force=self.config['refresh'])
+                item['chunks'] = self.iter_item_chunks(item['hnitem_id'], llm_interaction, item['chunk_token_limit'])
+                items.append(item)
+            job = runner.submit(items, instruction, items[0]['max_output_tokens'])
+
+        status = runner.poll(job, wait=self.config['batch_wait'], interval=self.config['batch_poll_seconds'])
+        if status not in TERMINAL_STATUSES:
+            print(
+                f"Batch job {job['name']} is {status}; run again with --batch-resume {job['name']}",
+                file=sys.stderr
+            )
+            return []
+        on_entries = None
+        if self.store is not None:
+            def on_entries(item, entries):
+                self.store.save_entries(item['hnitem_id'], job['model'], self.run_id, entries, replace=True)
+        return runner.assemble(job, on_entries=on_entries)
+
+    def record_thread(self, hnitem_id):
+        """Store a downloaded thread and its comments in the --db database (once per download)."""
+        if self.store is None:
+            return
+        meta = self.thread_store.load_meta(hnitem_id)
+        if meta is not None and self.store.save_thread(hnitem_id, meta, self.thread_store.iter_comments(hnitem_id)):
+            print(f"Thread {hnitem_id} stored in {self.store.path}", file=sys.stderr)
+
+    def search(self):
+        """Print the results of --search, --search-comments and --search-author."""
+        if self.config['search']:
+            rows = self.store.search_arguments(self.config['search'])
+            print(f"## Arguments matching {self.config['search']!r}: {len(rows)}\n")
+            for row in rows:
+                print(f"- [{row['title'] or row['item_id']}](https://news.ycombinator.com/item?id={row['item_id']}) "
+                      f"{row['participant'] or '-'}: {row['argument']} ({row['model']})")
+        if self.config['search_comments']:
+            rows = self.store.search_comments(self.config['search_comments'])
+            print(f"## Comments matching {self.config['search_comments']!r}: {len(rows)}\n")
+            for row in rows:
+                print(f"- [{row['author']}](https://news.ycombinator.com/item?id={row['id']}) "
+                      f"in {row['title'] or row['item_id']}: {row['text'][:300]}")
+        if self.config['search_author']:
+            rows = self.store.author_threads(self.config['search_author'])
+            print(f"## Threads of {self.config['search_author']}: {len(rows)}\n")
+            for row in rows:
+                print(f"- [{row['title'] or row['item_id']}](https://news.ycombinator.com/item?id={row['item_id']}): "
+                      f"{row['comments']} comments, {row['arguments']} summarized arguments")
+
+    def prepare(self):
+        """
+        Create the working directories and the thread store, and load what every run needs.
+
+        Returns:
+            (instruction, ResponseCache or None)
+        """
+        # Imported here rather than at the top, so that --help and argument errors do not load them
+        from .sqlite_store import SQLiteStore
+        from .model_profiles import ModelProfiles
+
+        if self.config['algolia_url']:
+            Utilities.use_algolia_api(self.config['algolia_url'])
+        Utilities.create_subdirectories()
+        self.thread_store = ThreadStore(os.path.join("data", "threads"), self.config['thread_ttl'])
+
+        instruction_file_path = INSTRUCTION_FILES[self.config['thread_format']]
         with open(instruction_file_path, 'r') as f:
             instruction = f.read()
 
-        llm_interaction = LLMInteraction(self.config)
-        chunked_rawtext = llm_interaction.chunk_text(text, chunk_token_limit)
-        
-        print(f"Number of data chunks: {len(chunked_rawtext)}", file=sys.stderr)
-        
-        llm_interaction.send_to_llm(topic_line, chunked_rawtext, instruction, final_outfile, max_output_tokens)
-        
-        # Second pass: categorize the arguments
-        llm_interaction.categorize_arguments(final_outfile, max_output_tokens)
+        cache = None
+        if self.config['cache_dir']:
+            cache = ResponseCache(self.config['cache_dir'], self.config['cache_max_bytes'])
+        if self.config['db']:
+            self.store = SQLiteStore(self.config['db'])
+        self.profiles = ModelProfiles()
+        return instruction, cache
+
+    def serve(self, instruction, cache):
+        """
+        Run the resident summarizer server until it is interrupted.
+
+        Args:
+            instruction: System instruction for the LLM
+            cache: Optional shared ResponseCache
+        """
+        from .server import SummarizerServer
+
+        server = SummarizerServer(self, instruction, cache=cache, workers=self.config['workers'])
+        server.warm_up()
+        try:
+            server.serve_forever(self.config['listen'], self.config['unix_socket'])
+        finally:
+            if cache is not None:
+                cache.report()
+            self.write_run_report(*server.llms())
+
+    def watch(self, llm_interaction, instruction):
+        """
+        Keep the summaries of the front page threads fresh until interrupted.
+
+        Args:
+            llm_interaction: Shared LLMInteraction instance
+            instruction: System instruction for the LLM
+
+        Returns:
+            The LLMInteractions the summaries used, for the run report
+        """
+        from .watcher import FrontPageWatcher
+
+        watcher = FrontPageWatcher(
+            self, llm_interaction, instruction,
+            workers=self.config['workers'],
+            token_budget=self.config['watch_token_budget'],
+            num_stories=self.config['watch_stories'],
+            min_comments=self.config['watch_min_comments'],
+        )
+        return watcher.watch(self.config['watch_interval'], self.config['watch_polls'])
+
+    def fan_out(self, instruction, cache):
+        """
+        Summarize all items with every configured model and write the comparison report.
+
+        Args:
+            instruction: System instruction for the LLM
+            cache: Optional shared ResponseCache
+        """
+        from .fanout import ModelFanOut
+
+        fan_out = ModelFanOut(self, instruction, cache=cache)
+        try:
+            fan_out.write_report(fan_out.run())
+        finally:
+            if cache is not None:
+                cache.report()
+            for llm_interaction in fan_out.llms.values():
+                llm_interaction.rate_limiter.report()
+            self.write_run_report(*fan_out.llms.values())
+
+    def run(self):
+        """Execute the main summarization workflow."""
+        # Imported here, so that --help and argument errors do not load openai/tiktoken/pydantic
+        from .llm_interaction import LLMInteraction
+
+        instruction, cache = self.prepare()
+        if self.config['search'] or self.config['search_comments'] or self.config['search_author']:
+            return self.search()
+        if self.store is not None:
+            self.store.start_run(self.run_id, {
+                key: self.config[key]
+                for key in ('model', 'models', 'hnitems', 'topic', 'chunker', 'thread_format', 'filter')
+            })
+        if self.config['serve']:
+            return self.serve(instruction, cache)
+        if len(self.config['models']) > 1:
+            return self.fan_out(instruction, cache)
+        llm_interaction = LLMInteraction(self.config, cache=cache, telemetry=self.telemetry)
+        llms = [llm_interaction]
+
+        try:
+            if self.config['batch_api'] or self.config['batch_resume']:
+                self.run_batch_api(llm_interaction, instruction)
+            elif self.config['watch']:
+                llms = self.watch(llm_interaction, instruction)
+            elif len(self.config['hnitems']) == 1:
+                self.summarize_item(self.config['hnitems'][0], llm_interaction, instruction)
+            else:
+                started = time.monotonic()
+                report = self.run_batch(llm_interaction, instruction)
+                self.write_batch_report(report, started)
+        finally:
+            if cache is not None:
+                cache.report()
+            for llm in llms:
+                llm.rate_limiter.report()
+            self.write_run_report(*llms)
+
+    def write_run_report(self, llm_interaction, *others):
+        """
+        Write the telemetry of the run as JSON and print a short summary.
+
+        Args:
+            llm_interaction: The LLMInteraction used in the run
+            others: LLMInteractions of further models used in the run (their rate limits are added)
+
+        Returns:
+            Path of the JSON report
+        """
+        report_file = self.config['report'] or os.path.join(
+            "final_output", f"run-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        limiters = [llm.rate_limiter for llm in (llm_interaction, *others)]
+        self.profiles.observe(self.telemetry)
+        self.profiles.save()
+        profiles = {}
+        for llm in (llm_interaction, *others):
+            model = llm.config['model']
+            max_output_tokens, chunk_token_limit = self.profiles.limits(model, self.config['max_output_tokens'])
+            profiles[model] = {
+                'output_ratio': round(self.profiles.output_ratio(model), 4),
+                'max_output_tokens': max_output_tokens,
+                'chunk_token_limit': chunk_token_limit,
+            }
+        cache = llm_interaction.cache
+        self.telemetry.extra = {
+            'config': {
+                key: self.config[key]
+                for key in (
+                    'model', 'models', 'hnitems', 'concurrency', 'workers', 'chunker', 'thread_format', 'filter', 'stream',
+                    'incremental',
+                )
+            },
+            'rate_limit': {
+                'retries': sum(limiter.retries for limiter in limiters),
+                'waited_seconds': round(sum(limiter.waited_seconds for limiter in limiters), 3),
+            },
+            'response_cache': {'hits': cache.hits, 'misses': cache.misses} if cache is not None else None,
+            'model_profiles': profiles,
+        }
+        report = self.telemetry.write(report_file)
+
+        stages = ", ".join(f"{name} {stage['seconds']:.1f}s" for name, stage in report['stages'].items())
+        print(f"Run: {report['wall_seconds']:.1f}s ({stages})", file=sys.stderr)
+        for model, usage in report['models'].items():
+            kinds = usage['kinds'].values()
+            cost = f"${usage['cost_usd']:.4f}" if usage['cost_usd'] is not None else "unknown cost"
+            print(
+                f"  {model}: {sum(k['calls'] for k in kinds)} calls, "
+                f"{sum(k['input_tokens'] for k in kinds)} input ({sum(k['cached_tokens'] for k in kinds)} cached) / "
+                f"{sum(k['output_tokens'] for k in kinds)} output tokens, {cost}",
+                file=sys.stderr
+            )
+            chunks = usage.get('chunks')
+            if chunks and chunks['with_failures']:
+                print(
+                    f"    {chunks['with_failures']} of {chunks['chunks']} chunks needed recovery: "
+                    f"{chunks['failed_requests']} failed requests, {chunks['salvaged_rows']} rows salvaged, "
+                    f"{chunks['remainder_requests']} remainder requests, {chunks['bisections']} bisections, "
+                    f"{chunks['fallbacks']} unstructured fallbacks, {chunks['lost']} chunks lost",
+                    file=sys.stderr
+                )
+        print(f"Run report written to {report_file}", file=sys.stderr)
+        return report_file
 
 
 def main():
     """Entry point for the CLI."""
     load_dotenv()
-    ensure_structured_output_support()
     cli = HNSummarizerCLI()
-    cli.run()
+    ensure_structured_output_support()
+    if not cli.config['profile']:
+        cli.run()
+        return
+
+    import pstats
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(cli.run)
+    finally:
+        os.makedirs("output", exist_ok=True)
+        profile_file = os.path.join("output", f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(profile_file)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(25)
+        print(f"Profile written to {profile_file} (view with: python -m pstats {profile_file})", file=sys.stderr)
 
 
 if __name__ == "__main__":
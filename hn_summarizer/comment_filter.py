@@ -0,0 +1,212 @@
+"""Local pre-filter: drop low-value and duplicate comments before they are chunked."""
+
+import re
+import sys
+import zlib
+
+from .utilities import Utilities
+
+# Whole comments (lowercased, without trailing punctuation) that carry no argument
+DEFAULT_BOILERPLATE = (
+    r"(thanks?( you)?|thx|ty)( (so|very) much)?( for (sharing|posting|this|that|the \w+))?",
+    r"\+1|this|same|same here|me too|agreed?|exactly|seconded|so much this|this is the way",
+    r"(great|nice|awesome|cool|interesting|amazing|fascinating|excellent) (post|article|read|work|project|writeup|"
+    r"write-up|stuff|idea|job|find)",
+    r"(i'?m a )?big fan( of [\w .'-]{0,40})?",
+    r"(did|do) you (mean|intend to say)\b.{0,80}",
+    r"came here to (say|post) (this|that)",
+    r"\[(dead|flagged|deleted)\]",
+)
+
+# A paragraph of HN comment HTML that quotes the parent ("> ...", sometimes in italics)
+_QUOTE_PARAGRAPH = re.compile(r"^\s*(<i>\s*)?(&gt;|>)")
+_PARAGRAPH_BREAK = re.compile(r"<p>", re.IGNORECASE)
+_WORD = re.compile(r"\w+")
+
+
+def strip_quotes(raw_text):
+    """
+    Remove the paragraphs of a comment that quote another comment.
+
+    Args:
+        raw_text: Comment HTML as returned by the Algolia API
+
+    Returns:
+        The HTML without quoted paragraphs
+    """
+    paragraphs = _PARAGRAPH_BREAK.split(raw_text)
+    kept = [paragraph for paragraph in paragraphs if not _QUOTE_PARAGRAPH.match(paragraph)]
+    if len(kept) == len(paragraphs):
+        return raw_text
+    return "<p>".join(kept)
+
+
+class _MinHashIndex:
+    """
+    Find earlier texts whose word shingles overlap with a new text.
+
+    Signatures use one-permutation MinHash: every 3-word shingle is hashed
+    once, the hash picks one of ``num_perm`` bins and each bin keeps its
+    minimum. The bands of the signature are bucketed (LSH), so a lookup only
+    compares against texts that share at least one band; empty bands (short
+    texts) are not indexed. Candidates are confirmed with the exact Jaccard
+    similarity of the shingle hashes. The hash is fixed (crc32), so the same
+    thread is always filtered the same way and its chunks stay cacheable.
+    """
+
+    def __init__(self, threshold, num_perm=32, bands=8, shingle_words=3):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows = num_perm // bands
+        self.shingle_words = shingle_words
+        self.buckets = [{} for _ in range(bands)]
+        self.shingles = []
+
+    def _shingles(self, text):
+        words = _WORD.findall(text.lower())
+        size = min(self.shingle_words, len(words))
+        return frozenset(
+            zlib.crc32(" ".join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)
+        )
+
+    def _band_keys(self, shingles):
+        signature = [None] * self.num_perm
+        for value in shingles:
+            index = value % self.num_perm
+            value //= self.num_perm
+            if signature[index] is None or value < signature[index]:
+                signature[index] = value
+        keys = []
+        for band in range(len(self.buckets)):
+            key = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            keys.append(None if key.count(None) == len(key) else key)
+        return keys
+
+    def add_or_match(self, text):
+        """
+        Return True if ``text`` is a near-duplicate of an earlier text; otherwise index it.
+        """
+        shingles = self._shingles(text)
+        if not shingles:
+            return False
+        keys = self._band_keys(shingles)
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            if key is not None:
+                candidates.update(bucket.get(key, ()))
+        for candidate in candidates:
+            other = self.shingles[candidate]
+            if len(shingles & other) >= self.threshold * len(shingles | other):
+                return True
+        index = len(self.shingles)
+        self.shingles.append(shingles)
+        for bucket, key in zip(self.buckets, keys):
+            if key is not None:
+                bucket.setdefault(key, []).append(index)
+        return False
+
+
+class CommentFilter:
+    """
+    Drop comments the model would skip anyway, before they cost input tokens.
+
+    Quoted parent text ("> ..." paragraphs) is stripped first. Then comments
+    that are shorter than ``min_chars`` or consist of a boilerplate phrase
+    ("thank you", "+1", "Big fan of X", ...) are dropped, and comments that
+    are near-duplicates of an earlier comment (Jaccard similarity of word
+    shingles at or above ``duplicate_threshold``) are collapsed into the
+    earlier one. Replies to a dropped comment are attached to its parent, so
+    they stay in their subthread.
+    """
+
+    def __init__(self, count_tokens=None, min_chars=20, quotes=True, duplicate_threshold=0.7,
+                 boilerplate=DEFAULT_BOILERPLATE):
+        """
+        Initialize the filter.
+
+        Args:
+            count_tokens: Optional callable returning the token count of a text, for the tokens saved stat
+            min_chars: Comments with less plain text (after quote stripping) are dropped
+            quotes: Strip quoted parent text
+            duplicate_threshold: Jaccard similarity from which a comment counts as duplicate (0 disables)
+            boilerplate: Regular expressions matching whole boilerplate comments
+        """
+        self.count_tokens = count_tokens
+        self.min_chars = min_chars
+        self.quotes = quotes
+        self.duplicates = _MinHashIndex(duplicate_threshold) if duplicate_threshold else None
+        self.boilerplate = re.compile("|".join(f"(?:{pattern})" for pattern in boilerplate)) if boilerplate else None
+        self.stats = {
+            'comments': 0, 'kept': 0, 'short': 0, 'boilerplate': 0, 'duplicates': 0, 'quotes_stripped': 0,
+            'tokens_before': 0, 'tokens_after': 0,
+        }
+
+    @staticmethod
+    def read_patterns(path):
+        """Read one regular expression per line; blank lines and lines starting with '#' are ignored."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+    def _tokens(self, text):
+        return self.count_tokens(text) if self.count_tokens is not None else 0
+
+    def drop_reason(self, text):
+        """Return why a plain comment text is dropped ('short', 'boilerplate', 'duplicates'), or None."""
+        if len(text) < self.min_chars:
+            return 'short'
+        normalized = re.sub(r"[\s.!?:;,)(]+$", "", text.lower())
+        if self.boilerplate is not None and self.boilerplate.fullmatch(normalized):
+            return 'boilerplate'
+        if self.duplicates is not None and self.duplicates.add_or_match(text):
+            return 'duplicates'
+        return None
+
+    def filter(self, comments):
+        """
+        Yield the comments worth summarizing, in document order.
+
+        Args:
+            comments: Iterable of comments as yielded by Utilities.iter_comments()
+
+        Yields:
+            Comment dicts; copies with the filtered text or a new parent_id where something changed
+        """
+        stats = self.stats
+        reparent = {}
+        for comment in comments:
+            stats['comments'] += 1
+            original = Utilities.comment_text(comment['text'])
+            tokens = self._tokens(original)
+            stats['tokens_before'] += tokens
+
+            raw_text = strip_quotes(comment['text']) if self.quotes else comment['text']
+            text = original
+            if raw_text != comment['text']:
+                stats['quotes_stripped'] += 1
+                text = Utilities.comment_text(raw_text)
+                tokens = self._tokens(text)
+
+            reason = self.drop_reason(text)
+            if reason is not None:
+                stats[reason] += 1
+                reparent[comment['id']] = reparent.get(comment.get('parent_id'), comment.get('parent_id'))
+                continue
+
+            stats['kept'] += 1
+            stats['tokens_after'] += tokens
+            parent_id = reparent.get(comment.get('parent_id'), comment.get('parent_id'))
+            if raw_text != comment['text'] or parent_id != comment.get('parent_id'):
+                comment = dict(comment, text=raw_text, parent_id=parent_id)
+            yield comment
+
+    def report(self, hnitem_id):
+        """Print what the filter dropped and the tokens it saved."""
+        stats = self.stats
+        saved = stats['tokens_before'] - stats['tokens_after']
+        print(
+            f"Comment filter {hnitem_id}: kept {stats['kept']} of {stats['comments']} comments "
+            f"(dropped {stats['short']} short, {stats['boilerplate']} boilerplate, {stats['duplicates']} duplicates; "
+            f"quotes stripped from {stats['quotes_stripped']}), "
+            f"{saved} of {stats['tokens_before']} tokens saved",
+            file=sys.stderr
+        )
@@ -0,0 +1,81 @@
+"""Streaming writer for the compact intermediate thread format."""
+
+
+class ThreadCompactWriter:
+    """
+    Write a thread as one ``author: comment`` line per entry.
+
+    A drop-in alternative to ThreadXMLWriter with the same interface. The
+    ``<tableheader/>`` marker is kept as first line, so the instruction can
+    tell the first chunk from later ones as with the XML format. Author names
+    and comment texts are sanitized single lines (see Utilities.comment_text),
+    so no escaping is needed; the author ends at the first ": ".
+
+    Usage::
+
+        with ThreadCompactWriter(f, hn_item_id) as writer:
+            for author, comment in entries:
+                writer.write_entry(author, comment)
+    """
+
+    file_extension = ".txt"
+
+    def __init__(self, file, hn_item_id):
+        """
+        Initialize the writer.
+
+        Args:
+            file: Text file object to write to
+            hn_item_id: The HN item ID (not written; kept for interface compatibility)
+        """
+        self.file = file
+        self.hn_item_id = hn_item_id
+        self.entries = 0
+
+    def __enter__(self):
+        self.write_header()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.write_footer()
+        return False
+
+    @staticmethod
+    def format_header():
+        """Return the <tableheader/> marker line."""
+        return "<tableheader/>\n"
+
+    @staticmethod
+    def format_entry(author, comment):
+        """
+        Return one entry as an ``author: comment`` line, ending with a newline.
+
+        Args:
+            author: Sanitized author name
+            comment: Sanitized comment text
+        """
+        return f"{author}: {comment}\n"
+
+    @staticmethod
+    def format_footer():
+        """The compact format has no footer."""
+        return ""
+
+    def write_header(self):
+        """Write the <tableheader/> marker line."""
+        self.file.write(self.format_header())
+
+    def write_entry(self, author, comment):
+        """
+        Write one ``author: comment`` line.
+
+        Args:
+            author: Sanitized author name
+            comment: Sanitized comment text
+        """
+        self.file.write(self.format_entry(author, comment))
+        self.entries += 1
+
+    def write_footer(self):
+        """Nothing to write; present for interface compatibility."""
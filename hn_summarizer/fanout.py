@@ -0,0 +1,203 @@
+"""Summarize the same threads with several models: one download and one chunking pass per encoding."""
+
+import os
+import sys
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .utilities import Utilities
+
+
+class ModelFanOut:
+    """
+    Run every configured model on every item and compare the results.
+
+    Each thread is fetched once. Its chunks are built once per tokenizer
+    encoding and shared by all models with that encoding (gpt-4o-mini and
+    gpt-5-mini both use o200k_base, so they share one pass); only models with
+    a different encoding chunk the thread again. All models of an item then
+    run concurrently, each with its own LLMInteraction (and so its own rate
+    limiter), writing the usual markdown file per model. The comparison
+    report lists latency, rows and failures per item and model, and tokens
+    and cost per model.
+    """
+
+    def __init__(self, cli, instruction, cache=None):
+        """
+        Initialize the fan-out.
+
+        Args:
+            cli: The HNSummarizerCLI (its config, thread store and telemetry are shared)
+            instruction: System instruction for the LLM
+            cache: Optional shared ResponseCache
+        """
+        from .llm_interaction import LLMInteraction
+
+        self.cli = cli
+        self.instruction = instruction
+        self.models = cli.config['models']
+        self.llms = {
+            model: LLMInteraction({**cli.config, 'model': model}, cache=cache, telemetry=cli.telemetry)
+            for model in self.models
+        }
+        # Per-model views of the CLI: output file names and stored rows use the model;
+        # the thread is already downloaded when they run
+        self.clis = {}
+        for model in self.models:
+            model_cli = copy.copy(cli)
+            model_cli.config = {**cli.config, 'model': model, 'refresh': False}
+            self.clis[model] = model_cli
+
+    def encoding_groups(self):
+        """Return the models grouped by tokenizer encoding, in configured order."""
+        groups = {}
+        for model in self.models:
+            groups.setdefault(self.llms[model].encoding.name, []).append(model)
+        return list(groups.values())
+
+    def item_chunks(self, hnitem):
+        """
+        Return the chunks of an item for every model.
+
+        A model that is the only one with its encoding gets the lazy chunk
+        generator; models sharing an encoding share one chunk list, sized for
+        the model with the smallest chunk limit (which is then pinned for
+        all of them, see ModelProfiles).
+        """
+        if self.cli.config['incremental']:
+            # Incremental runs chunk the new comments of each model's own state
+            return dict.fromkeys(self.models)
+        items = {model: self.clis[model].describe_item(hnitem) for model in self.models}
+        chunks = {}
+        for group in self.encoding_groups():
+            first = group[0]
+            hnitem_id = items[first]['hnitem_id']
+            chunk_token_limit = min(items[model]['chunk_token_limit'] for model in group)
+            group_chunks = self.clis[first].iter_item_chunks(hnitem_id, self.llms[first], chunk_token_limit)
+            if len(group) > 1:
+                for model in group:
+                    self.cli.profiles.pin(hnitem_id, model, items[model]['max_output_tokens'], chunk_token_limit)
+                group_chunks = list(group_chunks)
+                print(
+                    f"Item {hnitem_id}: {len(group_chunks)} chunks of up to {chunk_token_limit} tokens "
+                    f"shared by {', '.join(group)}",
+                    file=sys.stderr
+                )
+            chunks.update(dict.fromkeys(group, group_chunks))
+        return chunks
+
+    @staticmethod
+    def count_rows(final_outfile):
+        """Count the table rows of a summary file."""
+        from .llm_interaction import TABLE_HEADER
+
+        header_lines = set(TABLE_HEADER.split('\n'))
+        with open(final_outfile, 'r') as f:
+            return sum(1 for line in f if line.startswith('|') and line.rstrip('\n') not in header_lines)
+
+    def summarize_item(self, hnitem):
+        """
+        Download and chunk one item, then summarize it with all models concurrently.
+
+        Args:
+            hnitem: Hacker News item URL or id
+
+        Returns:
+            List of per-model result dicts ('hnitem', 'model', 'status', 'final_outfile',
+            'rows', 'seconds', 'error'), in configured model order
+        """
+        hnitem_id = Utilities.check_hnitem(hnitem)['hnitem_id']
+        self.cli.fetch_item(hnitem_id)
+        chunks = self.item_chunks(hnitem)
+
+        def run_model(model):
+            started = time.monotonic()
+            entry = {'hnitem': hnitem, 'model': model, 'status': 'ok', 'final_outfile': None, 'rows': 0, 'error': None}
+            try:
+                entry['final_outfile'] = self.clis[model].summarize_item(
+                    hnitem, self.llms[model], self.instruction, chunks=chunks[model], fetched=True
+                )
+                entry['rows'] = self.count_rows(entry['final_outfile'])
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+                print(f"Error processing item {hnitem} with {model}: {str(e)}", file=sys.stderr)
+            entry['seconds'] = round(time.monotonic() - started, 3)
+            return entry
+
+        with ThreadPoolExecutor(max_workers=len(self.models), thread_name_prefix="model") as executor:
+            return list(executor.map(run_model, self.models))
+
+    def run(self):
+        """
+        Summarize all configured items (``config['workers']`` at a time) with all models.
+
+        Returns:
+            List of per-item, per-model result dicts
+        """
+        with ThreadPoolExecutor(max_workers=self.cli.config['workers']) as executor:
+            results = executor.map(self.summarize_item, self.cli.config['hnitems'])
+            return [entry for item_results in results for entry in item_results]
+
+    def write_report(self, results):
+        """
+        Write the comparison report as markdown to final_output/ and print a summary.
+
+        Args:
+            results: Result dicts as returned by run()
+
+        Returns:
+            Path of the report
+        """
+        usage = self.cli.telemetry.report(records=False)['models']
+        lines = [
+            f"# Model comparison: {', '.join(self.models)}",
+            "",
+            f"## Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            "",
+            "| Model | Calls | Input tokens | Cached | Output tokens | Cost (USD) | Fallbacks | Failed calls "
+            "| Items ok | Rows | Seconds |",
+            "| --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- |",
+        ]
+        for model in self.models:
+            kinds = usage.get(model, {}).get('kinds', {}).values()
+            cost = usage.get(model, {}).get('cost_usd')
+            entries = [entry for entry in results if entry['model'] == model]
+            lines.append(
+                f"| {model} | {sum(k['calls'] for k in kinds)} | {sum(k['input_tokens'] for k in kinds)} "
+                f"| {sum(k['cached_tokens'] for k in kinds)} | {sum(k['output_tokens'] for k in kinds)} "
+                f"| {f'{cost:.4f}' if cost is not None else 'unknown'} | {sum(k['fallbacks'] for k in kinds)} "
+                f"| {sum(k['failures'] for k in kinds)} "
+                f"| {sum(entry['status'] == 'ok' for entry in entries)}/{len(entries)} "
+                f"| {sum(entry['rows'] for entry in entries)} | {sum(entry['seconds'] for entry in entries):.1f} |"
+            )
+        lines += [
+            "",
+            "## Items",
+            "",
+            "| Item | Model | Status | Rows | Seconds | Output |",
+            "| --- | --- | --- | --- | --- | --- |",
+        ]
+        for entry in results:
+            output = entry['final_outfile'] or (entry['error'] or "").replace('|', '\\|')
+            lines.append(
+                f"| {entry['hnitem']} | {entry['model']} | {entry['status']} | {entry['rows']} "
+                f"| {entry['seconds']:.1f} | {output} |"
+            )
+
+        report_file = os.path.join(
+            "final_output", f"model-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.md"
+        )
+        with open(report_file, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+        for entry in results:
+            print(
+                f"  {entry['status']:<6} {entry['seconds']:>8.1f}s {entry['rows']:>5} rows  {entry['model']}  "
+                f"{entry['hnitem']}",
+                file=sys.stderr
+            )
+        print(f"Model comparison written to {report_file}", file=sys.stderr)
+        return report_file
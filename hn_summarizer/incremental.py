@@ -0,0 +1,98 @@
+"""State for incremental re-summarization of growing threads."""
+
+import os
+import json
+import time
+import tempfile
+
+
+class IncrementalState:
+    """
+    Remember which comments of a thread have been summarized by a model.
+
+    The state holds the ids of all summarized comments, the generated rows
+    (CommentSummary fields, or {'text': ...} for unstructured fallback output),
+    the last categories text and the number of rows it was generated from.
+    It is stored as ``data/incremental/<item_id>-<model>.json``.
+    """
+
+    def __init__(self, item_id, model, directory=os.path.join("data", "incremental")):
+        """
+        Load the state of an item/model pair, or start an empty one.
+
+        Args:
+            item_id: The HN item ID
+            model: The model name
+            directory: Directory holding the state files
+        """
+        self.item_id = str(item_id)
+        self.model = model
+        model_slug = "".join(c if c.isalnum() or c in '.-_' else '-' for c in model)
+        self.path = os.path.join(directory, f"{self.item_id}-{model_slug}.json")
+        self.summarized_ids = set()
+        self.entries = []
+        self.categories = None
+        self.categorized_rows = 0
+        self.updated_at = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.summarized_ids = set(state.get('summarized_ids', []))
+        self.entries = state.get('entries', [])
+        self.categories = state.get('categories')
+        self.categorized_rows = state.get('categorized_rows', 0)
+        self.updated_at = state.get('updated_at')
+
+    def save(self):
+        """Write the state atomically."""
+        state = {
+            'item_id': self.item_id,
+            'model': self.model,
+            'summarized_ids': sorted(self.summarized_ids, key=str),
+            'entries': self.entries,
+            'categories': self.categories,
+            'categorized_rows': self.categorized_rows,
+            'updated_at': time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def new_comments(self, comments):
+        """Yield the comments whose ids have not been summarized yet."""
+        for comment in comments:
+            if comment['id'] not in self.summarized_ids:
+                yield comment
+
+    @property
+    def row_count(self):
+        """Number of table rows (without fallback text blocks)."""
+        return sum(1 for entry in self.entries if 'text' not in entry)
+
+    def needs_categorization(self, threshold):
+        """
+        Decide whether the categories should be regenerated.
+
+        Args:
+            threshold: Minimum growth of the row count since the last
+                categorization, as a fraction (e.g. 0.2 for 20 %)
+
+        Returns:
+            True if there are no categories yet or the table grew enough
+        """
+        if not self.categories:
+            return self.row_count > 0
+        grown = self.row_count - self.categorized_rows
+        return grown > 0 and grown >= threshold * max(self.categorized_rows, 1)
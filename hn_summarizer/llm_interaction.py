@@ -1,37 +1,295 @@
 """LLM interaction module for OpenAI API calls."""
 
+import os
+import re
 import sys
+import time
+import threading
+from collections import deque
+from functools import partial
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 
-import tiktoken
-from openai import OpenAI
+from .models import CommentSummary, ThreadSummaryResponse
+from .chunker import CommentChunker, split_chunk, remainder_chunk
+from .utilities import Utilities
+from .categorizer import CATEGORIZATION_PROMPT, MapReduceCategorizer
+from .stream_parser import SummaryStreamParser
+from .rate_limiter import RateLimiter, RateLimitedResponses
+from .telemetry import RunTelemetry
+from .checkpoint import ChunkJournal
 
-from .models import ThreadSummaryResponse
+TABLE_HEADER = (
+    "| Participant/User name | Argument | Argument objections(keyword-style)/URLs |\n"
+    "| --- | --- | --- |"
+)
+
+# Lines are tokenized in batches of this size (see _line_token_counts)
+TOKENIZER_BATCH_LINES = 4096
+# Token counts of lines up to this length are memoized (XML tags, indentation)
+TOKENIZER_MEMO_MAX_CHARS = 64
+TOKENIZER_MEMO_MAX_ENTRIES = 10000
+
+
+class _IncompleteOutput(Exception):
+    """A structured request produced output that is not a complete ThreadSummaryResponse."""
+
+    def __init__(self, message, text=None, response=None, truncated=False):
+        super().__init__(message)
+        self.text = text
+        self.response = response
+        self.truncated = truncated
+
+
+class _OrderedTableWriter:
+    """
+    Write the table rows of concurrently processed chunks in chunk order.
+
+    Streamed summaries of the earliest unfinished chunk are written at once;
+    those of later chunks are buffered until all earlier chunks are complete.
+    """
+
+    def __init__(self, f, format_row):
+        self.f = f
+        self.format_row = format_row
+        self.lock = threading.Lock()
+        self.head = 1
+        self.buffered = {}
+        self.streamed = {}
+        self.header_written = False
+        # File position (and header state) before the first row of the head chunk
+        self.rewind = None
+
+    def _write_rows(self, rows):
+        if rows and not self.header_written:
+            # Write table header before the first data row
+            print(TABLE_HEADER, file=self.f)
+            self.header_written = True
+        for row in rows:
+            print(row, file=self.f)
+        self.f.flush()
+
+    def _mark_head(self):
+        if not self.streamed.get(self.head):
+            self.rewind = (self.f.tell(), self.header_written)
+
+    def add_summary(self, chunk_index, summary):
+        """Take one streamed summary (called from worker threads)."""
+        with self.lock:
+            if chunk_index == self.head:
+                self._mark_head()
+                self._write_rows([self.format_row(summary)])
+                self.streamed[chunk_index] = self.streamed.get(chunk_index, 0) + 1
+            else:
+                self.buffered.setdefault(chunk_index, []).append(summary)
+
+    def complete(self, chunk_index, response_data, fallback_text):
+        """
+        Finish a chunk; must be called in chunk order.
+
+        Writes whatever was not streamed yet, then the buffered rows of the
+        next chunk.
+
+        Returns:
+            All markdown lines of the chunk (streamed or not)
+        """
+        with self.lock:
+            streamed = self.streamed.pop(chunk_index, 0)
+            if response_data:
+                rows = [self.format_row(summary) for summary in response_data.summaries]
+                self._write_rows(rows[streamed:])
+            else:
+                rows = [fallback_text] if fallback_text else []
+                for row in rows:
+                    print(row, file=self.f)
+                self.f.flush()
+
+            self.head = chunk_index + 1
+            buffered = self.buffered.pop(self.head, [])
+            if buffered:
+                self._mark_head()
+                self._write_rows([self.format_row(summary) for summary in buffered])
+                self.streamed[self.head] = len(buffered)
+            return rows
+
+    def discard(self, chunk_index):
+        """Drop the rows streamed so far for a chunk, e.g. because it is requested again in parts."""
+        with self.lock:
+            self.buffered.pop(chunk_index, None)
+            if self.streamed.pop(chunk_index, 0) and chunk_index == self.head:
+                position, self.header_written = self.rewind
+                self.f.seek(position)
+                self.f.truncate()
 
 
 class LLMInteraction:
     """Handle interactions with the OpenAI API for thread summarization."""
 
-    def __init__(self, config):
+    def __init__(self, config, cache=None, telemetry=None):
         """
         Initialize the LLM interaction handler.
         
         Args:
             config: Dictionary containing 'api_key' and 'model' keys
+            cache: Optional ResponseCache for LLM responses
+            telemetry: Optional RunTelemetry collecting timing and token usage
         """
         self.config = config
-        self.client = OpenAI(api_key=config['api_key'])
-        self.encoding = self._resolve_encoding(config['model'])
-        self.responses_api = self._resolve_responses_api(self.client)
+        self.cache = cache
+        self.telemetry = telemetry if telemetry is not None else RunTelemetry()
+        self._token_count_memo = {}
+        self._tokenizer_threads = min(4, os.cpu_count() or 1)
+        self._prompt_token_counts = {}
+        self.rate_limiter = RateLimiter(
+            config.get('rpm'), config.get('tpm'), max_retries=config.get('max_retries', 6)
+        )
+        # The client and the tokenizer are created on first use: importing openai
+        # and loading an encoding are slow, and runs served from the caches may
+        # not need them at all.
+        self._client = None
+        self._responses_api = None
+        self._encoding = None
+        self._special_tokens = None
+        self._lazy_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The OpenAI client."""
+        with self._lazy_lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                # Retries are done by the rate limiter, which also paces the requests
+                self._client = OpenAI(api_key=self.config['api_key'], max_retries=0)
+            return self._client
+
+    @property
+    def responses_api(self):
+        """The client's responses API, behind the rate limiter."""
+        if self._responses_api is None:
+            responses_api = self._resolve_responses_api(self.client)
+            with self._lazy_lock:
+                if self._responses_api is None:
+                    self._responses_api = RateLimitedResponses(responses_api, self.rate_limiter, self.count_tokens)
+        return self._responses_api
+
+    @responses_api.setter
+    def responses_api(self, value):
+        self._responses_api = value
+
+    def _load_encoding(self):
+        if self._encoding is None:
+            with self._lazy_lock:
+                if self._encoding is None:
+                    encoding = self._resolve_encoding(self.config['model'])
+                    self._special_tokens = self._build_special_tokens_pattern(encoding)
+                    self._encoding = encoding
+        return self._encoding
+
+    @property
+    def encoding(self):
+        """The tiktoken encoding of the model."""
+        return self._load_encoding()
+
+    @encoding.setter
+    def encoding(self, value):
+        with self._lazy_lock:
+            self._special_tokens = self._build_special_tokens_pattern(value)
+            self._encoding = value
+
+    @property
+    def _special_tokens_pattern(self):
+        """Regex matching the special tokens of the encoding, or None."""
+        self._load_encoding()
+        return self._special_tokens
 
     @staticmethod
     def _resolve_encoding(model_name):
-        """Get the tiktoken encoding for the specified model."""
+        """
+        Get the tiktoken encoding for the specified model.
+
+        Encoding files are kept in the user cache (unless TIKTOKEN_CACHE_DIR
+        is set), so they are downloaded once and then loaded without network
+        access, instead of from a temporary directory that may be wiped.
+        """
+        if "TIKTOKEN_CACHE_DIR" not in os.environ and "DATA_GYM_CACHE_DIR" not in os.environ:
+            os.environ["TIKTOKEN_CACHE_DIR"] = Utilities.user_cache_dir("tiktoken")
+        import tiktoken
+
         try:
             return tiktoken.encoding_for_model(model_name)
         except Exception:
             return tiktoken.get_encoding("cl100k_base")
 
+    @staticmethod
+    def _build_special_tokens_pattern(encoding):
+        """Compile a regex matching any special token text of the encoding, or None."""
+        special_tokens = getattr(encoding, "special_tokens_set", None)
+        if not special_tokens:
+            return None
+        return re.compile("|".join(re.escape(token) for token in sorted(special_tokens)))
+
+    def _count_line_tokens(self, lines):
+        """Token counts of lines that are known to contain no special tokens."""
+        memo = self._token_count_memo
+        encode = self.encoding.encode_ordinary
+        counts = []
+        for line in lines:
+            count = memo.get(line)
+            if count is None:
+                count = len(encode(line))
+                if len(line) <= TOKENIZER_MEMO_MAX_CHARS and len(memo) < TOKENIZER_MEMO_MAX_ENTRIES:
+                    memo[line] = count
+            counts.append(count)
+        return counts
+
+    def _line_token_counts(self, lines):
+        """
+        Count the tokens of a batch of lines.
+
+        Gives the same result as ``len(self.encoding.encode(line))`` for every
+        line, but checks the whole batch for special tokens in one regex pass
+        instead of once per line, memoizes short repeated lines (XML tags), and
+        spreads long batches over a few threads (tiktoken releases the GIL).
+
+        Args:
+            lines: List of lines
+
+        Returns:
+            List of token counts, one per line
+        """
+        if self._special_tokens_pattern is not None and self._special_tokens_pattern.search(''.join(lines)):
+            # Rare: let encode() apply its special token handling (and errors) line by line
+            return [len(self.encoding.encode(line)) for line in lines]
+
+        group_size = TOKENIZER_BATCH_LINES // 4
+        if self._tokenizer_threads < 2 or len(lines) < 2 * group_size:
+            return self._count_line_tokens(lines)
+
+        groups = [lines[i:i + group_size] for i in range(0, len(lines), group_size)]
+        with ThreadPoolExecutor(max_workers=self._tokenizer_threads) as executor:
+            return [count for counts in executor.map(self._count_line_tokens, groups) for count in counts]
+
+    def count_tokens(self, text):
+        """Token count of a text, counted line by line like iter_chunks() does."""
+        return sum(self._line_token_counts(text.splitlines(keepends=True)))
+
+    def _request_tokens(self, instruction, chunk):
+        """
+        Input tokens of a chunk request, for the rate limiter.
+
+        Uses the token count computed while chunking; the count of the
+        instruction is remembered.
+        """
+        if instruction not in self._prompt_token_counts:
+            self._prompt_token_counts[instruction] = self.count_tokens(instruction)
+        if isinstance(chunk, dict) and chunk.get('token_count') is not None:
+            chunk_tokens = chunk['token_count']
+        else:
+            chunk_tokens = self.count_tokens(chunk['text'] if isinstance(chunk, dict) else chunk)
+        return self._prompt_token_counts[instruction] + chunk_tokens
+
     @staticmethod
     def _resolve_responses_api(client):
         """
@@ -146,6 +404,86 @@ class LLMInteraction:
                         texts.append(text_value)
         return "\n".join(texts).strip()
 
+    def iter_chunks(self, lines, chunk_token_limit=10000):
+        """
+        Group lines into chunks that fit within the token limit, lazily.
+
+        Lines are read and tokenized in batches of TOKENIZER_BATCH_LINES; only
+        the current batch and the chunk being filled are held in memory, so
+        ``lines`` can be an open file of any size.
+
+        Args:
+            lines: Iterable of lines (with line endings), e.g. an open file
+            chunk_token_limit: Maximum tokens per chunk
+
+        Yields:
+            Chunk dictionaries with 'text', 'token_count', and 'char_count' keys
+
+        Raises:
+            ValueError: If chunk_token_limit is not positive
+        """
+        if chunk_token_limit <= 0:
+            raise ValueError("chunk_token_limit must be greater than zero")
+
+        chunk_index = 0
+        current_lines = []
+        current_tokens = 0
+
+        def make_chunk(chunk_text, token_count, note=""):
+            nonlocal chunk_index
+            chunk_index += 1
+            print(
+                f"[tokenizer] chunk {chunk_index}: {token_count} tokens ({len(chunk_text)} chars) / limit {chunk_token_limit}{note}",
+                file=sys.stdout
+            )
+            return {
+                'text': chunk_text,
+                'token_count': token_count,
+                'char_count': len(chunk_text)
+            }
+
+        lines = iter(lines)
+        while True:
+            batch = list(islice(lines, TOKENIZER_BATCH_LINES))
+            if not batch:
+                break
+            for line, line_tokens in zip(batch, self._line_token_counts(batch)):
+                if current_tokens and current_tokens + line_tokens > chunk_token_limit:
+                    yield make_chunk(''.join(current_lines), current_tokens)
+                    current_lines = []
+                    current_tokens = 0
+
+                if line_tokens > chunk_token_limit:
+                    yield make_chunk(line, line_tokens, " (single-line overflow)")
+                    continue
+
+                current_lines.append(line)
+                current_tokens += line_tokens
+
+        if current_lines:
+            yield make_chunk(''.join(current_lines), current_tokens)
+
+    def chunk_comments(self, hn_item_id, comments, chunk_token_limit=10000, thread_format='xml'):
+        """
+        Pack whole comments and reply subtrees into as few chunks as possible.
+
+        See CommentChunker. Token counts use the same line-based counting as
+        chunk_text(). The comments are consumed as the chunks are requested.
+
+        Args:
+            hn_item_id: The HN item ID
+            comments: Iterable of comments as yielded by Utilities.iter_comments()
+            chunk_token_limit: Maximum tokens per chunk
+            thread_format: "xml" or "compact" (see utilities.THREAD_WRITERS)
+
+        Yields:
+            Chunk dictionaries with 'text', 'token_count', 'char_count' and
+            'comment_ids' keys
+        """
+        return CommentChunker(self._line_token_counts, hn_item_id, thread_format).iter_chunks(
+            comments, chunk_token_limit
+        )
+
     def chunk_text(self, text, chunk_token_limit=10000):
         """
         Split text into chunks that fit within the token limit.
@@ -160,180 +498,503 @@ class LLMInteraction:
         Raises:
             ValueError: If chunk_token_limit is not positive
         """
-        if chunk_token_limit <= 0:
-            raise ValueError("chunk_token_limit must be greater than zero")
-
-        lines = text.splitlines(keepends=True)
-        chunks = []
-        current_lines = []
-        current_tokens = 0
+        return list(self.iter_chunks(text.splitlines(keepends=True), chunk_token_limit))
 
-        def flush_chunk():
-            nonlocal current_lines, current_tokens
-            if not current_lines:
-                return
-            chunk_text = ''.join(current_lines)
-            chunk_index = len(chunks) + 1
-            chunk_info = {
-                'text': chunk_text,
-                'token_count': current_tokens,
-                'char_count': len(chunk_text)
+    def _build_messages(self, instruction, chunk_text):
+        """Build the system/user message pair for one chunk."""
+        return [
+            {
+                "role": "system",
+                "content": [
+                    {"type": "input_text", "text": instruction}
+                ]
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": chunk_text}
+                ]
             }
-            chunks.append(chunk_info)
-            print(
-                f"[tokenizer] chunk {chunk_index}: {current_tokens} tokens ({len(chunk_text)} chars) / limit {chunk_token_limit}",
-                file=sys.stdout
+        ]
+
+    def _stream_parse(self, messages, max_output_tokens, on_summary, estimated_tokens=None):
+        """
+        Run a structured request as a stream, reporting each summary as it completes.
+
+        Args:
+            messages: Input messages
+            max_output_tokens: Maximum tokens for LLM response
+            on_summary: Callback receiving each completed CommentSummary
+            estimated_tokens: Input tokens of the request, for the rate limiter
+
+        Returns:
+            Tuple (final ThreadSummaryResponse or None, final API response)
+
+        Raises:
+            _IncompleteOutput: The stream broke off, or its output was truncated
+                or did not parse; carries the text received so far and the
+                last response snapshot the stream sent (for its usage)
+        """
+        parser = SummaryStreamParser()
+        snapshot = None
+        try:
+            with self.responses_api.stream(
+                model=self.config['model'],
+                input=messages,
+                text_format=ThreadSummaryResponse,
+                max_output_tokens=max_output_tokens,
+                estimated_tokens=estimated_tokens,
+            ) as stream:
+                for event in stream:
+                    if getattr(event, "type", None) == "response.output_text.delta":
+                        for summary in parser.feed(event.delta):
+                            on_summary(summary)
+                    elif getattr(event, "response", None) is not None:
+                        # response.created / .completed / .incomplete carry the response so far
+                        snapshot = event.response
+                final_response = stream.get_final_response()
+        except Exception as e:
+            if not parser.buffer:
+                raise
+            raise _IncompleteOutput(
+                str(e), text=parser.buffer, response=snapshot, truncated=self._is_truncation_error(e)
+            ) from e
+        if self._is_truncated(final_response):
+            raise _IncompleteOutput(
+                "response truncated at max_output_tokens", text=parser.buffer, response=final_response, truncated=True
             )
-            current_lines = []
-            current_tokens = 0
+        response_data = self._extract_parsed_response(final_response)
+        if response_data is None and parser.items:
+            response_data = ThreadSummaryResponse(summaries=parser.items)
+        return response_data, final_response
 
-        for line in lines:
-            line_tokens = len(self.encoding.encode(line))
-            if current_tokens and current_tokens + line_tokens > chunk_token_limit:
-                flush_chunk()
-
-            if line_tokens > chunk_token_limit:
-                chunk_index = len(chunks) + 1
-                chunk_info = {
-                    'text': line,
-                    'token_count': line_tokens,
-                    'char_count': len(line)
-                }
-                chunks.append(chunk_info)
+    @staticmethod
+    def _is_truncated(response):
+        """Check whether a response stopped at max_output_tokens."""
+        if getattr(response, "status", None) != "incomplete":
+            return False
+        reason = getattr(getattr(response, "incomplete_details", None), "reason", None)
+        return reason in (None, "max_output_tokens")
+
+    @staticmethod
+    def _is_truncation_error(error):
+        """Check whether a request failed because its output was cut off (incomplete JSON)."""
+        if isinstance(error, _IncompleteOutput):
+            return error.truncated
+        if type(error).__name__ == "LengthFinishReasonError":
+            return True
+        errors = getattr(error, "errors", None)
+        if type(error).__name__ != "ValidationError" or not callable(errors):
+            return False
+        return any(item.get('type') == 'json_invalid' and 'EOF' in str(item.get('msg')) for item in errors())
+
+    @staticmethod
+    def _output_text(error):
+        """
+        Return the model output a failed structured request left behind, or None.
+
+        The text comes with an _IncompleteOutput, or as the input of the
+        pydantic error raised when the output JSON did not parse.
+        """
+        if isinstance(error, _IncompleteOutput):
+            return error.text
+        errors = getattr(error, "errors", None)
+        if type(error).__name__ == "ValidationError" and callable(errors):
+            for item in errors():
+                if item.get('type') == 'json_invalid' and isinstance(item.get('input'), str):
+                    return item['input']
+        return None
+
+    def _failed_usage(self, error, estimated_tokens, output_text):
+        """
+        Return the usage of a failed structured request whose response is gone, or None.
+
+        The output was generated and billed all the same. A pydantic error
+        of a malformed output, or a stream that broke off before its final
+        event, leave no usage behind; the request's input and the output
+        text received are counted locally instead.
+        """
+        response = getattr(error, 'response', None)
+        if output_text is None or getattr(response, 'usage', None) is not None:
+            return None
+        return {
+            'input_tokens': estimated_tokens,
+            'cached_tokens': 0,
+            'output_tokens': self.count_tokens(output_text),
+        }
+
+    def _merge_results(self, results):
+        """
+        Merge the results of the parts of a chunk, in order.
+
+        Returns:
+            Tuple (ThreadSummaryResponse or None, fallback text or None) for the whole chunk
+        """
+        if all(response_data for response_data, _ in results):
+            return ThreadSummaryResponse(
+                summaries=[summary for response_data, _ in results for summary in response_data.summaries]
+            ), None
+        # Some part fell back to plain text: keep the structured rows as table rows in the text
+        texts = []
+        for response_data, fallback_text in results:
+            if response_data:
+                texts.extend(self._format_row(summary) for summary in response_data.summaries)
+            elif fallback_text:
+                texts.append(fallback_text)
+        return None, "\n".join(texts) or None
+
+    def _summarize_chunk(self, chunk_index, total_chunks, chunk, instruction, max_output_tokens, on_summary=None,
+                         on_discard=None):
+        """
+        Summarize a single chunk, recovering from failed structured requests.
+
+        Never raises, so one failing chunk cannot stall the others when chunks
+        are dispatched concurrently. If the structured request fails (see
+        _request_chunk), valid summaries are salvaged from its output and only
+        the rest of the chunk is requested again; the failures of the chunk
+        are recorded in the telemetry.
+
+        Args:
+            chunk_index: 1-based position of the chunk
+            total_chunks: Number of chunks in the run, or None if not known yet
+            chunk: Chunk dictionary (or plain string)
+            instruction: System instruction for the LLM
+            max_output_tokens: Maximum tokens for LLM response
+            on_summary: Optional callback; if given, the response is streamed
+                and each CommentSummary is passed to it as soon as it is complete
+            on_discard: Optional callback, called when the summaries passed to
+                on_summary are void because the chunk is requested again
+
+        Returns:
+            Tuple (ThreadSummaryResponse or None, fallback text or None)
+        """
+        outcome = {'failed_requests': 0, 'salvaged_rows': 0, 'remainder_requests': 0, 'bisections': 0, 'fallbacks': 0}
+        response_data, fallback_text = self._request_chunk(
+            chunk_index, total_chunks, chunk, instruction, max_output_tokens, outcome, on_summary, on_discard
+        )
+        self.telemetry.record_chunk(
+            self.config['model'], chunk_index, outcome, structured=response_data is not None,
+            lost=response_data is None and not fallback_text
+        )
+        return response_data, fallback_text
+
+    def _request_chunk(self, chunk_index, total_chunks, chunk, instruction, max_output_tokens, outcome,
+                       on_summary=None, on_discard=None):
+        """
+        Request the summary of a chunk (or of a part of it).
+
+        If the structured request fails but left output behind (truncated at
+        max_output_tokens, malformed JSON, a stream that broke off), the
+        complete summaries are salvaged from it and only the entries after the
+        last salvaged one are requested again. Without salvageable output the
+        chunk is bisected along an entry boundary; only a single entry, or a
+        request that failed without any output, goes to the unstructured
+        ``create`` fallback.
+
+        Args:
+            outcome: Counters of the top-level chunk, updated in place
+            (other arguments as for _summarize_chunk)
+
+        Returns:
+            Tuple (ThreadSummaryResponse or None, fallback text or None)
+        """
+        chunk_num = f"chunk_num {chunk_index} of {total_chunks}" if total_chunks else f"chunk_num {chunk_index}"
+        print(f"{chunk_num} processing with model {self.config['model']}", file=sys.stderr)
+        chunk_text = chunk['text'] if isinstance(chunk, dict) else chunk
+        messages = self._build_messages(instruction, chunk_text)
+        estimated_tokens = self._request_tokens(instruction, chunk)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key('summarize', self.config['model'], instruction, chunk_text, max_output_tokens)
+            cached = self.cache.get(cache_key)
+            # Only structured results are cached; a fallback text (older entries) is requested again
+            if cached is not None and cached.get('parsed') is not None:
+                print(f"chunk_num {chunk_index}: cache hit", file=sys.stderr)
+                self.telemetry.record_call('summarize', self.config['model'], 0.0, cache_hit=True,
+                                           chunk_index=chunk_index)
+                return ThreadSummaryResponse(**cached['parsed']), None
+
+        started = time.monotonic()
+        try:
+            if on_summary is not None:
+                response_data, structured_response = self._stream_parse(
+                    messages, max_output_tokens, on_summary, estimated_tokens
+                )
+            else:
+                structured_response = self.responses_api.parse(
+                    model=self.config['model'],
+                    input=messages,
+                    text_format=ThreadSummaryResponse,
+                    #temperature=0.1,
+                    max_output_tokens=max_output_tokens,
+                    estimated_tokens=estimated_tokens,
+                )
+                if self._is_truncated(structured_response):
+                    # Rows parsed from a cut-off response would silently miss the rest of the chunk
+                    raise _IncompleteOutput(
+                        "response truncated at max_output_tokens", text=self._extract_text_output(structured_response),
+                        response=structured_response, truncated=True
+                    )
+                response_data = self._extract_parsed_response(structured_response)
+            self.telemetry.record_call('summarize', self.config['model'], time.monotonic() - started,
+                                       response=structured_response, failed=response_data is None,
+                                       chunk_index=chunk_index, prompt_tokens=self._prompt_token_counts[instruction])
+            if response_data and cache_key:
+                self.cache.put(cache_key, {'parsed': response_data.model_dump()})
+            return response_data, None
+        except Exception as e:
+            outcome['failed_requests'] += 1
+            truncated = self._is_truncation_error(e)
+            output_text = self._output_text(e)
+            salvaged = SummaryStreamParser.parse_partial(output_text) if output_text else []
+            covered, remainder = 0, None
+            if salvaged:
+                covered, remainder = remainder_chunk(chunk, [summary.participant for summary in salvaged],
+                                                     self._line_token_counts)
+            self.telemetry.record_call('summarize', self.config['model'], time.monotonic() - started,
+                                       response=getattr(e, 'response', None), failed=True, truncated=truncated,
+                                       salvaged_rows=len(salvaged) if covered else 0, chunk_index=chunk_index,
+                                       usage=self._failed_usage(e, estimated_tokens, output_text))
+            problem = "response truncated" if truncated else f"structured request failed ({str(e)[:200]})"
+
+            if covered:
+                outcome['salvaged_rows'] += len(salvaged)
+                result = ThreadSummaryResponse(summaries=salvaged), None
+                if remainder is not None:
+                    outcome['remainder_requests'] += 1
+                    print(
+                        f"{chunk_num}: {problem}; salvaged {len(salvaged)} summaries covering {covered} entries, "
+                        f"requesting the remaining {remainder['token_count']} tokens",
+                        file=sys.stderr
+                    )
+                    result = self._merge_results([result, self._request_chunk(
+                        chunk_index, total_chunks, remainder, instruction, max_output_tokens, outcome
+                    )])
+                else:
+                    print(f"{chunk_num}: {problem}; salvaged {len(salvaged)} summaries covering all entries",
+                          file=sys.stderr)
+                if result[0] is None and on_discard is not None:
+                    # Streamed rows are rewritten as part of the fallback text
+                    on_discard()
+                if result[0] is not None and cache_key:
+                    self.cache.put(cache_key, {'parsed': result[0].model_dump()})
+                return result
+
+            parts = split_chunk(chunk, self._line_token_counts) if truncated or output_text is not None else None
+            if parts is not None:
+                outcome['bisections'] += 1
                 print(
-                    f"[tokenizer] chunk {chunk_index}: {line_tokens} tokens ({len(line)} chars) / limit {chunk_token_limit} (single-line overflow)",
-                    file=sys.stdout
+                    f"{chunk_num}: {problem}, nothing to salvage; requesting it again as two parts "
+                    f"({parts[0]['token_count']} + {parts[1]['token_count']} tokens)",
+                    file=sys.stderr
                 )
-                continue
+                if on_discard is not None:
+                    on_discard()
+                result = self._merge_results([
+                    self._request_chunk(chunk_index, total_chunks, part, instruction, max_output_tokens, outcome)
+                    for part in parts
+                ])
+                if result[0] is not None and cache_key:
+                    self.cache.put(cache_key, {'parsed': result[0].model_dump()})
+                return result
+
+            print(f"Error processing chunk {chunk_index}: {str(e)}", file=sys.stderr)
+            if on_discard is not None:
+                on_discard()
+            outcome['fallbacks'] += 1
+            started = time.monotonic()
+            fallback_response = None
+            try:
+                fallback_response = self.responses_api.create(
+                    model=self.config['model'],
+                    input=messages,
+                    #temperature=0.1,
+                    max_output_tokens=max_output_tokens,
+                    estimated_tokens=estimated_tokens,
+                )
+                fallback_text = self._extract_text_output(fallback_response)
+                self.telemetry.record_call('summarize', self.config['model'], time.monotonic() - started,
+                                           response=fallback_response, fallback=True, failed=not fallback_text,
+                                           chunk_index=chunk_index)
+                # Not cached: the next run should get another chance at a structured result
+                return None, fallback_text
+            except Exception as fallback_error:
+                print(f"Fallback also failed for chunk {chunk_index}: {str(fallback_error)}", file=sys.stderr)
+                self.telemetry.record_call('summarize', self.config['model'], time.monotonic() - started,
+                                           response=fallback_response, fallback=True, failed=True,
+                                           chunk_index=chunk_index)
+        return None, None
+
+    @staticmethod
+    def _format_row(summary):
+        """Render one CommentSummary as a markdown table row."""
+        participant = summary.participant.replace('|', '\\|')
+        argument = summary.argument.replace('|', '\\|')
+        urls = summary.urls.replace('|', '\\|') if summary.urls else ""
+        return f"| {participant} | {argument} | {urls} |"
+
+    def _summarize_journaled_chunk(self, journal, key, chunk_index, *args, **kwargs):
+        """Summarize a chunk and journal its result (unless it failed)."""
+        response_data, fallback_text = self._summarize_chunk(chunk_index, *args, **kwargs)
+        if response_data is not None or fallback_text:
+            journal.save(chunk_index, key, response_data, fallback_text)
+        return response_data, fallback_text
+
+    def iter_chunk_results(self, chunks, instruction, max_output_tokens=4096, on_summary=None, journal=None,
+                           on_discard=None):
+        """
+        Summarize chunks and yield the results in chunk order.
+
+        Up to ``config['concurrency']`` chunks are in flight at once. ``chunks``
+        may be a generator: it is consumed lazily, and only a small window of
+        chunks is held in memory at any time.
+
+        Args:
+            chunks: Iterable of text chunks to process
+            instruction: System instruction for the LLM
+            max_output_tokens: Maximum tokens for LLM response
+            on_summary: Optional callback ``on_summary(chunk_index, summary)``;
+                if given, responses are streamed (called from worker threads)
+            journal: Optional ChunkJournal; journaled chunks are not requested
+                again, new results are journaled as they arrive
+            on_discard: Optional callback ``on_discard(chunk_index)``, called when
+                the streamed summaries of a chunk are void (truncated response)
 
-            current_lines.append(line)
-            current_tokens += line_tokens
+        Yields:
+            Tuples (ThreadSummaryResponse or None, fallback text or None)
+        """
+        concurrency = max(1, int(self.config.get('concurrency') or 1))
+        total_chunks = len(chunks) if hasattr(chunks, '__len__') else None
 
-        flush_chunk()
-        return chunks
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Futures are consumed in submission order so results keep chunk order
+            pending = deque()
+            for chunk_index, chunk in enumerate(chunks, start=1):
+                chunk_callback = partial(on_summary, chunk_index) if on_summary else None
+                discard_callback = partial(on_discard, chunk_index) if on_discard else None
+                if journal is None:
+                    future = executor.submit(
+                        self._summarize_chunk, chunk_index, total_chunks, chunk, instruction, max_output_tokens,
+                        chunk_callback, discard_callback
+                    )
+                else:
+                    key = ChunkJournal.make_key(
+                        instruction, chunk['text'] if isinstance(chunk, dict) else chunk, max_output_tokens
+                    )
+                    journaled = journal.load(chunk_index, key)
+                    if journaled is not None:
+                        future = Future()
+                        future.set_result(journaled)
+                    else:
+                        future = executor.submit(
+                            self._summarize_journaled_chunk, journal, key, chunk_index, total_chunks, chunk,
+                            instruction, max_output_tokens, chunk_callback, discard_callback
+                        )
+                pending.append(future)
+                if len(pending) >= 2 * concurrency:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
 
-    def send_to_llm(self, topic, chunks, instruction, final_outfile, max_output_tokens=4096):
+    def send_to_llm(self, topic, chunks, instruction, final_outfile, max_output_tokens=4096, on_rows=None,
+                    on_result=None, journal=None):
         """
         Send chunks to OpenAI Responses API using structured outputs with Pydantic models.
+
+        Rows are written in chunk order as results come in (see iter_chunk_results).
+        With ``config['stream']``, responses are streamed and the rows of the
+        earliest unfinished chunk are written as soon as each one is complete.
         
         Args:
             topic: The topic header line for the output file
-            chunks: List of text chunks to process
+            chunks: Iterable of text chunks to process
             instruction: System instruction for the LLM
             final_outfile: Path to write the final markdown output
             max_output_tokens: Maximum tokens for LLM response
+            on_rows: Optional callback receiving the markdown lines written
+                for each chunk, e.g. MapReduceCategorizer.add_rows
+            on_result: Optional callback ``on_result(chunk_index, response_data, fallback_text)``
+                called for each chunk in order, e.g. PendingSummary.add_chunk_result
+            journal: Optional ChunkJournal of the item; with a journal of an
+                interrupted run, the file is assembled from the journaled chunks
+                and only the missing ones are requested
+
+        Returns:
+            Number of chunks processed
         """
-        i = 1
-        current_date = datetime.now().strftime("%Y-%m-%d")
+        num_chunks = 0
         
         with open(final_outfile, 'w') as f:
             # Write header
-            print(f"{topic}\n", file=f)
-            print(f"## Date: {current_date}. LLM: {self.config['model']}\n", file=f)
-            
-            # Write markdown table header only once
-            is_first_chunk = True
-            
-            for chunk in chunks:
-                chunk_num = f'chunk_num {i} of {len(chunks)}'
-                print(f"{chunk_num} processing with model {self.config['model']}", file=sys.stderr)
-                chunk_text = chunk['text'] if isinstance(chunk, dict) else chunk
-                
-                messages = [
-                    {
-                        "role": "system",
-                        "content": [
-                            {"type": "input_text", "text": instruction}
-                        ]
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "input_text", "text": chunk_text}
-                        ]
-                    }
-                ]
+            f.write(self._markdown_header(topic))
+            writer = _OrderedTableWriter(f, self._format_row)
+            on_summary = writer.add_summary if self.config.get('stream') else None
+            on_discard = writer.discard if self.config.get('stream') else None
 
-                try:
-                    structured_response = self.responses_api.parse(
-                        model=self.config['model'],
-                        input=messages,
-                        text_format=ThreadSummaryResponse,
-                        #temperature=0.1,
-                        max_output_tokens=max_output_tokens,
-                    )
+            results = self.iter_chunk_results(
+                chunks, instruction, max_output_tokens, on_summary=on_summary, journal=journal, on_discard=on_discard
+            )
+            for response_data, fallback_text in results:
+                num_chunks += 1
+                rows = writer.complete(num_chunks, response_data, fallback_text)
+                if on_rows and rows:
+                    on_rows(rows)
+                if on_result:
+                    on_result(num_chunks, response_data, fallback_text)
 
-                    response_data = self._extract_parsed_response(structured_response)
-                    
-                    if response_data:
-                        # Write table header before the first data row
-                        if is_first_chunk:
-                            print("| Participant/User name | Argument | Argument objections(keyword-style)/URLs |", file=f)
-                            print("| --- | --- | --- |", file=f)
-                            is_first_chunk = False
-                        
-                        # Write each comment summary as a table row
-                        for summary in response_data.summaries:
-                            participant = summary.participant.replace('|', '\\|')
-                            argument = summary.argument.replace('|', '\\|')
-                            urls = summary.urls.replace('|', '\\|') if summary.urls else ""
-                            print(f"| {participant} | {argument} | {urls} |", file=f)
-                    
-                except Exception as e:
-                    print(f"Error processing chunk {i}: {str(e)}", file=sys.stderr)
-                    try:
-                        fallback_response = self.responses_api.create(
-                            model=self.config['model'],
-                            input=messages,
-                            #temperature=0.1,
-                            max_output_tokens=max_output_tokens,
-                        )
-                        fallback_text = self._extract_text_output(fallback_response)
-                        if fallback_text:
-                            print(fallback_text, file=f)
-                    except Exception as fallback_error:
-                        print(f"Fallback also failed for chunk {i}: {str(fallback_error)}", file=sys.stderr)
-                
-                i += 1
+        return num_chunks
 
-    def categorize_arguments(self, markdown_file, max_output_tokens=4096):
+    def _markdown_header(self, topic):
+        """Return the topic and date/model lines that start every output file."""
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        return f"{topic}\n\n## Date: {current_date}. LLM: {self.config['model']}\n\n"
+
+    def render_markdown(self, topic, entries, categories=None):
         """
-        Second pass: Read the markdown file and categorize the arguments.
-        
+        Render the complete markdown output from stored entries.
+
         Args:
-            markdown_file: Path to the markdown file to process
-            max_output_tokens: Maximum tokens for LLM response
-            
+            topic: The topic header line for the output file
+            entries: List of dicts, either CommentSummary fields
+                ('participant', 'argument', 'urls') or {'text': fallback text}
+            categories: Optional categories text, inserted after the date line
+
         Returns:
-            The path to the updated file with categories inserted
+            The markdown document as a string
         """
-        print(f"Starting second pass: categorizing arguments in {markdown_file}", file=sys.stderr)
-        
-        with open(markdown_file, 'r') as f:
-            content = f.read()
-        
-        # Extract the table content for categorization
-        categorization_prompt = """Group the arguments from the table into meaningful categories. Invent your own categories. Output only those proposed new categories.
-
-Format your response as:
-
-Here are proposed categories for organizing the arguments:
+        lines = [self._markdown_header(topic).rstrip('\n')]
+        if categories:
+            lines.extend(['', categories, ''])
+        lines.append('')
+        is_first_row = True
+        for entry in entries:
+            if 'text' in entry:
+                lines.append(entry['text'])
+                continue
+            if is_first_row:
+                lines.append(TABLE_HEADER)
+                is_first_row = False
+            lines.append(self._format_row(CommentSummary(**entry)))
+        return '\n'.join(lines) + '\n'
 
-1. Category Name
-- Sub-point about what this category covers
-- Another sub-point
+    def generate_categories(self, content, max_output_tokens=4096, prompt=CATEGORIZATION_PROMPT):
+        """
+        Ask the LLM to group the arguments of a summary table into categories.
 
-2. Another Category Name
-- Sub-point
-- Another sub-point
+        Args:
+            content: Markdown text with the summary table
+            max_output_tokens: Maximum tokens for LLM response
+            prompt: System prompt (e.g. the merge prompt of the reduce step)
 
-(continue for all categories)"""
-        
+        Returns:
+            The categories text, or None if nothing was generated
+        """
         messages = [
             {
                 "role": "system",
                 "content": [
-                    {"type": "input_text", "text": categorization_prompt}
+                    {"type": "input_text", "text": prompt}
                 ]
             },
             {
@@ -343,35 +1004,80 @@ Here are proposed categories for organizing the arguments:
                 ]
             }
         ]
-        
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key('categorize', self.config['model'], prompt, content, max_output_tokens)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("Categorization: cache hit", file=sys.stderr)
+                self.telemetry.record_call('categorize', self.config['model'], 0.0, cache_hit=True)
+                return cached.get('text')
+
+        started = time.monotonic()
         try:
             response = self.responses_api.create(
                 model=self.config['model'],
                 input=messages,
                 max_output_tokens=max_output_tokens,
             )
+        except Exception:
+            self.telemetry.record_call('categorize', self.config['model'], time.monotonic() - started, failed=True)
+            raise
+        categories_text = self._extract_text_output(response)
+        self.telemetry.record_call('categorize', self.config['model'], time.monotonic() - started,
+                                   response=response, failed=not categories_text)
+        if categories_text and cache_key:
+            self.cache.put(cache_key, {'text': categories_text})
+        return categories_text or None
+
+    def make_categorizer(self, topic, max_output_tokens=4096):
+        """
+        Create a MapReduceCategorizer for the summary table of one thread.
+
+        Args:
+            topic: The topic header line, sent along with every batch of rows
+            max_output_tokens: Maximum tokens for each LLM response
+
+        Returns:
+            MapReduceCategorizer instance
+        """
+        return MapReduceCategorizer(
+            self, f"{topic}\n\n{TABLE_HEADER}\n", max_output_tokens,
+            token_budget=self.config.get('categorize_token_budget') or 20000
+        )
+
+    def categorize_arguments(self, markdown_file, max_output_tokens=4096, categorizer=None):
+        """
+        Second pass: Read the markdown file and categorize the arguments.
+
+        The table is categorized with a MapReduceCategorizer, so tables larger
+        than the categorization token budget are handled in parallel batches.
+        
+        Args:
+            markdown_file: Path to the markdown file to process
+            max_output_tokens: Maximum tokens for LLM response
+            categorizer: Optional MapReduceCategorizer that was already fed
+                the rows while they were generated
             
-            categories_text = self._extract_text_output(response)
+        Returns:
+            The path to the updated file with categories inserted
+        """
+        print(f"Starting second pass: categorizing arguments in {markdown_file}", file=sys.stderr)
+        
+        try:
+            if categorizer is None:
+                with open(markdown_file, 'r') as f:
+                    lines = f.read().split('\n')
+                topic = lines[0] if lines else ""
+                with self.make_categorizer(topic, max_output_tokens) as categorizer:
+                    categorizer.add_rows(self.table_lines(lines))
+                    categories_text = categorizer.finish()
+            else:
+                categories_text = categorizer.finish()
             
             if categories_text:
-                # Find the Date/LLM line and insert categories after it
-                lines = content.split('\n')
-                new_lines = []
-                inserted = False
-                
-                for i, line in enumerate(lines):
-                    new_lines.append(line)
-                    # Insert after the "## Date:" line
-                    if not inserted and line.startswith('## Date:'):
-                        new_lines.append('')  # blank line
-                        new_lines.append(categories_text)
-                        new_lines.append('')  # blank line
-                        inserted = True
-                
-                # Write back to the same file
-                with open(markdown_file, 'w') as f:
-                    f.write('\n'.join(new_lines))
-                
+                self.insert_categories(markdown_file, categories_text)
                 print(f"Categories inserted into {markdown_file}", file=sys.stderr)
             else:
                 print("No categories generated from LLM response", file=sys.stderr)
@@ -380,3 +1086,38 @@ Here are proposed categories for organizing the arguments:
             print(f"Error during categorization: {str(e)}", file=sys.stderr)
         
         return markdown_file
+
+    @staticmethod
+    def table_lines(lines):
+        """Return the content lines of a summary file: rows and fallback text, without headers."""
+        header_lines = set(TABLE_HEADER.split('\n'))
+        content = []
+        for line in lines:
+            if not line.strip() or line.startswith('#') or line in header_lines:
+                continue
+            content.append(line)
+        return content
+
+    @staticmethod
+    def insert_categories(markdown_file, categories_text):
+        """Insert the categories text after the '## Date:' line of a markdown file."""
+        with open(markdown_file, 'r') as f:
+            content = f.read()
+
+        # Find the Date/LLM line and insert categories after it
+        lines = content.split('\n')
+        new_lines = []
+        inserted = False
+        
+        for line in lines:
+            new_lines.append(line)
+            # Insert after the "## Date:" line
+            if not inserted and line.startswith('## Date:'):
+                new_lines.append('')  # blank line
+                new_lines.append(categories_text)
+                new_lines.append('')  # blank line
+                inserted = True
+        
+        # Write back to the same file
+        with open(markdown_file, 'w') as f:
+            f.write('\n'.join(new_lines))
@@ -0,0 +1,195 @@
+"""Per-model limits and observed output ratios, used to size chunks and output budgets."""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+# (context window, maximum output tokens, default output budget, initial output ratio)
+# The output ratio is the output tokens of a summarize request per input token;
+# reasoning models spend part of the output on reasoning tokens, so they start
+# with a higher ratio and a larger budget. Models are matched by longest prefix.
+MODEL_PROFILES = {
+    "gpt-4o-mini": (128_000, 16_384, 5_000, 0.32),
+    "gpt-4o": (128_000, 16_384, 5_000, 0.32),
+    "gpt-4.1-nano": (1_047_576, 32_768, 5_000, 0.32),
+    "gpt-4.1-mini": (1_047_576, 32_768, 5_000, 0.32),
+    "gpt-4.1": (1_047_576, 32_768, 5_000, 0.32),
+    "gpt-5-nano": (400_000, 128_000, 16_000, 0.6),
+    "gpt-5-mini": (400_000, 128_000, 16_000, 0.6),
+    "gpt-5": (400_000, 128_000, 16_000, 0.6),
+    "o4-mini": (200_000, 100_000, 16_000, 0.6),
+}
+# Unknown models: the former fixed limits (5000 output tokens, 12500-token chunks)
+DEFAULT_PROFILE = (128_000, 16_384, 5_000, 0.32)
+
+# Share of the output budget a chunk is sized to fill, leaving room for dense chunks
+OUTPUT_FILL = 0.8
+# Weight of a new observation in the moving average of the output ratio
+RATIO_SMOOTHING = 0.2
+# Input tokens kept free in the context window for the instruction
+CONTEXT_RESERVE_TOKENS = 4_000
+MIN_CHUNK_TOKENS = 1_000
+# Pins not used for this long are dropped (their journals are stale by then)
+PIN_RETENTION_SECONDS = 14 * 24 * 3600
+
+
+def model_profile(model):
+    """Return the (context window, max output, default budget, initial ratio) profile of a model."""
+    matches = [name for name in MODEL_PROFILES if model == name or model.startswith(name + "-")]
+    if not matches:
+        return DEFAULT_PROFILE
+    return MODEL_PROFILES[max(matches, key=len)]
+
+
+class ModelProfiles:
+    """
+    Size chunks per model from its limits and its observed output ratio.
+
+    The output budget of a request is ``--max-output-tokens`` (or the
+    model's default budget), capped at the model's maximum output. A chunk
+    is sized so that its expected output fills OUTPUT_FILL of the budget,
+    using the output ratio observed for the model in earlier runs (a moving
+    average over completed, untruncated summarize calls, stored in
+    ``data/model_profiles.json``), and so that it fits the context window.
+
+    The chunk size of an item is pinned the first time the item is sized
+    for a model (``data/chunk_limits.json``): resumed runs chunk the thread
+    the same way, so journaled chunks stay valid while the observed ratio
+    moves on. Only a different output budget sizes the item again. A pin
+    lives as long as the item's journal: it is dropped once the item is
+    complete (unpin()), and pins unused for PIN_RETENTION_SECONDS are pruned
+    when the file is saved.
+    """
+
+    def __init__(self, path=os.path.join("data", "model_profiles.json"),
+                 pins_path=os.path.join("data", "chunk_limits.json")):
+        """
+        Load the observed ratios and the pinned chunk sizes.
+
+        Args:
+            path: JSON file holding the observed ratios
+            pins_path: JSON file holding the chunk sizes pinned per item and model
+        """
+        self.path = path
+        self.pins_path = pins_path
+        self._lock = threading.Lock()
+        self._observed_calls = 0
+        self.observed = self._load(path)
+        self.pins = self._load(pins_path)
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def output_ratio(self, model):
+        """Observed output ratio of a model, or the initial ratio of its profile."""
+        with self._lock:
+            observed = self.observed.get(model)
+        return observed['output_ratio'] if observed else model_profile(model)[3]
+
+    def limits(self, model, max_output_tokens=None, item_id=None):
+        """
+        Return the output budget and chunk size for a model.
+
+        Args:
+            model: Model name
+            max_output_tokens: Requested output budget (default: the model's default budget)
+            item_id: Item to size; its pinned chunk size is used, or the new
+                size is pinned (default: size from the current ratio, unpinned)
+
+        Returns:
+            Tuple (max_output_tokens, chunk_token_limit)
+        """
+        context_window, max_output, default_budget, _ = model_profile(model)
+        budget = min(max_output_tokens or default_budget, max_output)
+        chunk_token_limit = int(OUTPUT_FILL * budget / self.output_ratio(model))
+        chunk_token_limit = min(chunk_token_limit, context_window - budget - CONTEXT_RESERVE_TOKENS)
+        chunk_token_limit = max(MIN_CHUNK_TOKENS, chunk_token_limit)
+        if item_id is None:
+            return budget, chunk_token_limit
+        with self._lock:
+            pinned = self.pins.get(str(item_id), {}).get(model)
+            if pinned is not None and pinned['max_output_tokens'] == budget:
+                pinned['used_at'] = time.time()
+                return budget, pinned['chunk_token_limit']
+        self.pin(item_id, model, budget, chunk_token_limit)
+        return budget, chunk_token_limit
+
+    def pin(self, item_id, model, max_output_tokens, chunk_token_limit):
+        """Pin the chunk size of an item for a model (e.g. to the size of chunks shared with other models)."""
+        with self._lock:
+            self.pins.setdefault(str(item_id), {})[model] = {
+                'max_output_tokens': max_output_tokens,
+                'chunk_token_limit': chunk_token_limit,
+                'used_at': time.time(),
+            }
+
+    def unpin(self, item_id, model):
+        """Drop the pinned chunk size of an item for a model (its journal is complete)."""
+        with self._lock:
+            models = self.pins.get(str(item_id))
+            if models is not None:
+                models.pop(model, None)
+                if not models:
+                    del self.pins[str(item_id)]
+
+    def _prune_pins(self):
+        """Drop the pins unused for PIN_RETENTION_SECONDS (call with the lock held)."""
+        cutoff = time.time() - PIN_RETENTION_SECONDS
+        for item_id in list(self.pins):
+            models = self.pins[item_id]
+            for model in [model for model, pinned in models.items() if pinned.get('used_at', 0) < cutoff]:
+                del models[model]
+            if not models:
+                del self.pins[item_id]
+
+    def observe(self, telemetry):
+        """
+        Update the output ratios from the summarize calls recorded since the last update.
+
+        The ratio is taken over the chunk tokens of a request: the
+        instruction sent along with every chunk is not part of the input
+        that chunk sizes are computed from.
+
+        Args:
+            telemetry: RunTelemetry of the run
+        """
+        with self._lock:
+            calls, self._observed_calls = telemetry.calls_since(self._observed_calls)
+            for call in calls:
+                if (call['kind'] != 'summarize' or call['cache_hit'] or call['fallback'] or call['failed']
+                        or call.get('truncated') or not call['output_tokens']):
+                    continue
+                chunk_tokens = call['input_tokens'] - call.get('prompt_tokens', 0)
+                if chunk_tokens <= 0:
+                    continue
+                ratio = call['output_tokens'] / chunk_tokens
+                observed = self.observed.get(call['model'])
+                if observed is None:
+                    self.observed[call['model']] = {'output_ratio': ratio, 'samples': 1}
+                else:
+                    observed['output_ratio'] += RATIO_SMOOTHING * (ratio - observed['output_ratio'])
+                    observed['samples'] += 1
+
+    def save(self):
+        """Write the observed ratios and the pinned chunk sizes atomically."""
+        with self._lock:
+            self._prune_pins()
+            files = ((self.path, json.dumps(self.observed, indent=2)), (self.pins_path, json.dumps(self.pins)))
+        for path, data in files:
+            directory = os.path.dirname(path) or '.'
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Warning: could not write {path}: {str(e)}", file=sys.stderr)
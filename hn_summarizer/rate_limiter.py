@@ -0,0 +1,337 @@
+"""Request pacing and retries in front of the Responses API."""
+
+import re
+import sys
+import time
+import random
+import threading
+from contextlib import ExitStack, contextmanager
+
+# "6m0s", "1.5s", "120ms" as used by the x-ratelimit-reset-* headers
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+
+def parse_duration(value):
+    """
+    Parse a rate limit duration header value into seconds.
+
+    Args:
+        value: Header value like "1s", "6m0s", "120ms" or a plain number of seconds
+
+    Returns:
+        Seconds as float, or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+class _TokenBucket:
+    """A bucket holding up to ``per_minute`` units, refilled continuously."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` units are available (after refill)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Budget requests per minute (RPM) and tokens per minute (TPM).
+
+    Both budgets are token buckets shared by all threads. Limits that are not
+    configured are learned from the ``x-ratelimit-limit-*`` response headers,
+    and the ``x-ratelimit-remaining-*`` headers keep the buckets in line with
+    what the server has counted. After a 429 response all callers pause until
+    the retry delay has passed, not just the one that got the error.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=6,
+                 base_delay=1.0, max_delay=60.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: RPM budget, or None to learn it from the headers
+            tokens_per_minute: TPM budget, or None to learn it from the headers
+            max_retries: Retries of a request after rate limit, timeout or server errors
+            base_delay: First backoff delay in seconds (doubled for every retry)
+            max_delay: Upper bound of a single backoff delay in seconds
+        """
+        self.requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        self.retries = 0
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        """
+        Block until a request of ``tokens`` tokens fits into both budgets, then take it.
+
+        Args:
+            tokens: Estimated tokens of the request (input plus maximum output)
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                    if bucket is not None:
+                        bucket.refill(now)
+                        wait = max(wait, bucket.wait_time(amount))
+                if wait <= 0:
+                    if self.requests is not None:
+                        self.requests.take(1)
+                    if self.tokens is not None:
+                        self.tokens.take(tokens)
+                    return
+                self.waited_seconds += min(wait, 1.0)
+            time.sleep(min(wait, 1.0))
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the TPM bucket by the difference between estimate and actual usage."""
+        if self.tokens is None or actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens - actual_tokens)
+
+    def observe_headers(self, headers):
+        """
+        Update the budgets from the rate limit headers of a response.
+
+        Args:
+            headers: Mapping of response headers (case-insensitive, as from httpx)
+        """
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for kind in ('requests', 'tokens'):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                bucket = getattr(self, kind)
+                if bucket is None:
+                    try:
+                        bucket = _TokenBucket(float(limit))
+                    except (TypeError, ValueError):
+                        continue
+                    setattr(self, kind, bucket)
+                    print(f"Rate limit: using {kind} limit of {int(bucket.capacity)}/min from the API", file=sys.stderr)
+                bucket.refill(now)
+                try:
+                    bucket.level = min(bucket.level, float(remaining))
+                except (TypeError, ValueError):
+                    pass
+
+    @staticmethod
+    def is_retryable(error):
+        """Return True for errors that are worth retrying after a delay."""
+        import openai
+
+        if isinstance(error, openai.RateLimitError):
+            # An exhausted quota does not recover by waiting
+            return getattr(error, "code", None) != "insufficient_quota"
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409)
+
+    def retry_delay(self, error, attempt):
+        """
+        Return the delay before the next attempt, or None if the error is not retried.
+
+        The ``retry-after-ms``/``retry-after`` headers are honored; otherwise
+        the delay is an exponential backoff with full jitter.
+
+        Args:
+            error: The exception raised by the request
+            attempt: Number of the failed attempt, starting at 0
+        """
+        import openai
+
+        if attempt >= self.max_retries or not self.is_retryable(error):
+            return None
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        delay = None
+        if headers.get("retry-after-ms") is not None:
+            delay = parse_duration(headers.get("retry-after-ms"))
+            delay = delay / 1000.0 if delay is not None else None
+        if delay is None:
+            delay = parse_duration(headers.get("retry-after"))
+        if delay is None and isinstance(error, openai.RateLimitError):
+            delay = max(
+                parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0,
+            ) or None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        else:
+            # A little jitter, so concurrent callers do not all retry at the same instant
+            delay = min(self.max_delay, delay) + random.uniform(0, self.base_delay)
+
+        with self._lock:
+            self.retries += 1
+            if isinstance(error, openai.RateLimitError):
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def report(self):
+        """Print the number of retries and the time spent waiting for the budget."""
+        if self.retries or self.waited_seconds:
+            print(
+                f"Rate limit: {self.retries} retries, {self.waited_seconds:.1f}s waited for the budget",
+                file=sys.stderr
+            )
+
+
+class _UsageTrackingStream:
+    """Pass-through of a response stream that remembers the usage of the last response event."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.usage = None
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def __iter__(self):
+        for event in self.stream:
+            # response.completed / response.incomplete carry the final usage
+            usage = getattr(getattr(event, "response", None), "usage", None)
+            if usage is not None:
+                self.usage = usage
+            yield event
+
+
+class RateLimitedResponses:
+    """
+    Drop-in wrapper around ``client.responses`` that paces and retries requests.
+
+    ``parse``, ``create`` and ``stream`` accept an extra ``estimated_tokens``
+    argument (input tokens plus maximum output tokens); if it is missing, the
+    input is counted with ``count_tokens``. All other attributes are passed
+    through to the wrapped object.
+    """
+
+    def __init__(self, responses_api, limiter, count_tokens):
+        """
+        Initialize the wrapper.
+
+        Args:
+            responses_api: The client's responses resource
+            limiter: Shared RateLimiter
+            count_tokens: Callable returning the token count of a text
+        """
+        self.responses_api = responses_api
+        self.limiter = limiter
+        self.count_tokens = count_tokens
+
+    def __getattr__(self, name):
+        return getattr(self.responses_api, name)
+
+    def _estimate(self, kwargs, estimated_tokens):
+        if estimated_tokens is None:
+            texts = []
+            for message in kwargs.get('input') or []:
+                content = message.get('content') if isinstance(message, dict) else None
+                if isinstance(content, str):
+                    texts.append(content)
+                for part in content if isinstance(content, list) else []:
+                    texts.append(part.get('text') or '')
+            estimated_tokens = self.count_tokens('\n'.join(texts))
+        return estimated_tokens + (kwargs.get('max_output_tokens') or 0)
+
+    def _with_retries(self, tokens, send):
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens)
+            try:
+                return send()
+            except Exception as e:
+                response = getattr(e, "response", None)
+                self.limiter.observe_headers(getattr(response, "headers", None))
+                delay = self.limiter.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                print(f"{type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt + 1})", file=sys.stderr)
+                time.sleep(delay)
+                attempt += 1
+
+    def _request(self, method, kwargs, estimated_tokens):
+        tokens = self._estimate(kwargs, estimated_tokens)
+        raw_api = getattr(self.responses_api, "with_raw_response", None)
+
+        def send():
+            if raw_api is None:
+                return getattr(self.responses_api, method)(**kwargs)
+            raw_response = getattr(raw_api, method)(**kwargs)
+            self.limiter.observe_headers(raw_response.headers)
+            return raw_response.parse()
+
+        response = self._with_retries(tokens, send)
+        usage = getattr(response, "usage", None)
+        self.limiter.record_usage(tokens, getattr(usage, "total_tokens", None))
+        return response
+
+    def parse(self, estimated_tokens=None, **kwargs):
+        """Paced and retried ``responses.parse``."""
+        return self._request('parse', kwargs, estimated_tokens)
+
+    def create(self, estimated_tokens=None, **kwargs):
+        """Paced and retried ``responses.create``."""
+        return self._request('create', kwargs, estimated_tokens)
+
+    @staticmethod
+    def _stream_headers(stream):
+        """Return the HTTP headers of an open response stream, or None."""
+        # openai's ResponseStream keeps the httpx response of the request in _response
+        return getattr(getattr(stream, "_response", None), "headers", None)
+
+    @contextmanager
+    def stream(self, estimated_tokens=None, **kwargs):
+        """
+        Paced ``responses.stream``; opening the stream is retried, a broken stream is not.
+
+        The rate limit headers are read when the stream opens, and the TPM
+        budget is corrected by the usage of the final response event once
+        the stream is closed.
+        """
+        tokens = self._estimate(kwargs, estimated_tokens)
+        with ExitStack() as stack:
+            def open_stream():
+                stream = stack.enter_context(self.responses_api.stream(**kwargs))
+                self.limiter.observe_headers(self._stream_headers(stream))
+                return stream
+
+            stream = _UsageTrackingStream(self._with_retries(tokens, open_stream))
+            try:
+                yield stream
+            finally:
+                self.limiter.record_usage(tokens, getattr(stream.usage, "total_tokens", None))
@@ -0,0 +1,132 @@
+"""Content-addressed on-disk cache for LLM responses."""
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses, keyed by a hash of the request.
+
+    Each entry is one JSON file named after the SHA-256 of the request parts
+    (model, instruction, input text, max_output_tokens, ...). Reading an entry
+    refreshes its modification time, and the least recently used entries are
+    deleted once the directory grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, directory="data/llm_cache", max_bytes=200 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory holding the cache entries
+            max_bytes: Size cap for all entries together
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the request parts into a cache key."""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Look up a cache entry.
+
+        Args:
+            key: Key as returned by make_key()
+
+        Returns:
+            The stored payload dictionary, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return payload
+
+    def put(self, key, payload):
+        """
+        Store a cache entry atomically and evict old entries if needed.
+
+        Args:
+            key: Key as returned by make_key()
+            payload: JSON-serializable dictionary
+        """
+        path = self._path(key)
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            try:
+                replaced_bytes = os.path.getsize(path)
+            except OSError:
+                replaced_bytes = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write cache entry {path}: {str(e)}", file=sys.stderr)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data) - replaced_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self):
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                total += entry.stat().st_size
+        return total
+
+    def _evict(self):
+        """Delete least recently used entries until the size cap is met."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def report(self):
+        """Print hit/miss counters to stderr."""
+        lookups = self.hits + self.misses
+        rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        print(f"Response cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)", file=sys.stderr)
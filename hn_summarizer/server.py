@@ -0,0 +1,329 @@
+"""Resident summarizer: a local HTTP job API in front of a warm worker pool."""
+
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import threading
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FINISHED_STATUSES = ("done", "failed")
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ThreadingHTTPServer counterpart listening on a Unix domain socket."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON job API:
+
+        POST /jobs                {"hnitem": ..., "topic": ..., "model": ...}
+        GET  /jobs                all known jobs
+        GET  /jobs/<id>[?wait=S]  job status, optionally waiting up to S seconds for the job to finish
+        GET  /jobs/<id>/result    the markdown written so far (complete once the job is done)
+        GET  /stats               telemetry of all jobs since the server started
+    """
+
+    server_version = "hn-summarizer"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body, indent=2) + "\n").encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, {'error': message})
+
+    def _path(self):
+        path, _, query = self.path.partition('?')
+        params = dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+        return [part for part in path.split('/') if part], params
+
+    def do_POST(self):
+        parts, _ = self._path()
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+        except ValueError:
+            return self._error(400, "invalid Content-Length")
+        if parts != ['jobs']:
+            return self._error(404, f"unknown path {self.path}")
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            return self._error(400, "request body must be JSON")
+        if not isinstance(request, dict) or not request.get('hnitem'):
+            return self._error(400, '"hnitem" is required')
+        try:
+            job = self.server.summarizer.submit(
+                str(request['hnitem']), topic=request.get('topic'), model=request.get('model')
+            )
+        except (ValueError, KeyError) as e:
+            return self._error(400, f"invalid hnitem {request['hnitem']!r}: {e}")
+        self._send(202, self.server.summarizer.job_status(job), headers={'Location': f"/jobs/{job['id']}"})
+
+    def do_GET(self):
+        parts, params = self._path()
+        summarizer = self.server.summarizer
+        if parts == ['stats']:
+            return self._send(200, summarizer.stats())
+        if parts == ['jobs']:
+            return self._send(200, {'jobs': summarizer.list_jobs()})
+        if len(parts) not in (2, 3) or parts[0] != 'jobs' or (len(parts) == 3 and parts[2] != 'result'):
+            return self._error(404, f"unknown path {self.path}")
+
+        job = summarizer.get_job(parts[1])
+        if job is None:
+            return self._error(404, f"unknown job {parts[1]}")
+        if len(parts) == 2:
+            try:
+                wait = float(params.get('wait', 0))
+            except ValueError:
+                return self._error(400, "wait must be a number of seconds")
+            job['finished'].wait(min(max(wait, 0.0), 300.0))
+            return self._send(200, summarizer.job_status(job))
+
+        text = summarizer.read_result(job)
+        self._send(200, text.encode('utf-8'), content_type="text/markdown; charset=utf-8",
+                   headers={'X-Job-Status': job['status']})
+
+
+class SummarizerServer:
+    """
+    Keep LLM clients, tokenizers and caches loaded and summarize threads on request.
+
+    Jobs are queued on a fixed worker pool and run through
+    HNSummarizerCLI.summarize_item, so a job produces the same markdown file
+    as a CLI run with the same item, topic and model. One LLMInteraction is
+    kept per model: its OpenAI client reuses the open HTTP connections and
+    its tiktoken encoding is loaded only once, so after the first job the
+    latency of a thread is the download plus the model time.
+    """
+
+    def __init__(self, cli, instruction, cache=None, workers=4, max_jobs=1000):
+        """
+        Initialize the server.
+
+        Args:
+            cli: Configured HNSummarizerCLI; its config provides the defaults of every job
+            instruction: System instruction for the LLM
+            cache: Optional shared ResponseCache
+            workers: Number of jobs summarized at the same time
+            max_jobs: Finished jobs kept for status queries (oldest are forgotten first)
+        """
+        self.cli = cli
+        self.instruction = instruction
+        self.cache = cache
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._llms = {}
+        self._llms_lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def llm_for(self, model):
+        """Return the LLMInteraction of a model, creating it on first use."""
+        from .llm_interaction import LLMInteraction
+
+        with self._llms_lock:
+            if model not in self._llms:
+                self._llms[model] = LLMInteraction(
+                    {**self.cli.config, 'model': model}, cache=self.cache, telemetry=self.cli.telemetry
+                )
+            return self._llms[model]
+
+    def llms(self):
+        """Return the LLMInteractions of all models used so far."""
+        with self._llms_lock:
+            return list(self._llms.values())
+
+    def warm_up(self, model=None):
+        """Create the client and load the encoding of a model before the first job arrives."""
+        llm_interaction = self.llm_for(model or self.cli.config['model'])
+        llm_interaction.client
+        llm_interaction.encoding
+
+    def submit(self, hnitem, topic=None, model=None):
+        """
+        Queue a summarization job.
+
+        A job for the same output file that is still queued or running is
+        returned instead of starting a second one.
+
+        Args:
+            hnitem: Hacker News item URL or id
+            topic: Topic of the thread (default: the server's --topic)
+            model: Model name (default: the server's --model)
+
+        Returns:
+            The job dict
+
+        Raises:
+            ValueError, KeyError: If hnitem is not an HN item URL or id
+        """
+        job_cli = copy.copy(self.cli)
+        job_cli.config = {
+            **self.cli.config,
+            'topic': topic or self.cli.config['topic'],
+            'model': model or self.cli.config['model'],
+        }
+        item = job_cli.describe_item(hnitem)
+
+        with self._jobs_lock:
+            for job in self._jobs.values():
+                if job['final_outfile'] == item['final_outfile'] and job['status'] not in FINISHED_STATUSES:
+                    return job
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'hnitem': item['hnitem'],
+                'hnitem_id': item['hnitem_id'],
+                'topic': job_cli.config['topic'],
+                'model': job_cli.config['model'],
+                'final_outfile': item['final_outfile'],
+                'status': 'queued',
+                'error': None,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'finished': threading.Event(),
+            }
+            self._jobs[job['id']] = job
+            self._forget_old_jobs()
+        self._executor.submit(self._run_job, job, job_cli)
+        print(f"Job {job['id']}: queued {job['hnitem']} ({job['model']})", file=sys.stderr)
+        return job
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def _run_job(self, job, job_cli):
+        job['started_at'] = time.time()
+        job['status'] = 'running'
+        try:
+            job_cli.summarize_item(job['hnitem'], self.llm_for(job['model']), self.instruction)
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = f"{type(e).__name__}: {e}"
+            job['status'] = 'failed'
+            print(f"Job {job['id']} failed: {job['error']}", file=sys.stderr)
+        finally:
+            job['finished_at'] = time.time()
+            job['finished'].set()
+        print(f"Job {job['id']}: {job['status']} in {job['finished_at'] - job['started_at']:.1f}s", file=sys.stderr)
+
+    def get_job(self, job_id):
+        """Return the job dict, or None if the id is unknown."""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        """Return the status of all known jobs, oldest first."""
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        return [self.job_status(job) for job in jobs]
+
+    def read_result(self, job):
+        """
+        Return the markdown of a job as far as it has been written.
+
+        Rows appear chunk by chunk while the job runs; the categories are
+        added when it is done. A file left over from an earlier run is not
+        returned.
+        """
+        if job['started_at'] is None:
+            return ""
+        try:
+            if os.path.getmtime(job['final_outfile']) < job['started_at']:
+                return ""
+            with open(job['final_outfile'], 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    def job_status(self, job):
+        """Return the JSON-serializable status of a job, including the rows written so far."""
+        from .llm_interaction import LLMInteraction
+
+        status = {key: value for key, value in job.items() if key != 'finished'}
+        status['rows'] = len(LLMInteraction.table_lines(self.read_result(job).split('\n')))
+        ended = job['finished_at'] or time.time()
+        status['queued_seconds'] = round((job['started_at'] or ended) - job['submitted_at'], 3)
+        status['run_seconds'] = round(ended - job['started_at'], 3) if job['started_at'] else None
+        return status
+
+    def stats(self):
+        """Telemetry of all jobs so far, without the per-call records."""
+        report = self.cli.telemetry.report(records=False)
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        report['jobs'] = {
+            status: sum(job['status'] == status for job in jobs) for status in ('queued', 'running', 'done', 'failed')
+        }
+        return report
+
+    def make_http_server(self, listen="127.0.0.1:8765", unix_socket=None):
+        """
+        Create the HTTP server of the job API.
+
+        Args:
+            listen: "HOST:PORT" to listen on (ignored if unix_socket is given)
+            unix_socket: Path of a Unix domain socket to listen on instead
+
+        Returns:
+            A socketserver instance with ``summarizer`` set to this object
+        """
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.unlink(unix_socket)
+            httpd = _UnixHTTPServer(unix_socket, _JobRequestHandler)
+        else:
+            host, _, port = listen.rpartition(':')
+            httpd = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _JobRequestHandler)
+        httpd.summarizer = self
+        return httpd
+
+    def serve_forever(self, listen="127.0.0.1:8765", unix_socket=None):
+        """Serve the job API until interrupted, then finish the running jobs."""
+        httpd = self.make_http_server(listen, unix_socket)
+        address = unix_socket or "http://{}:{}".format(*httpd.server_address[:2])
+        print(f"Summarizer server listening on {address}", file=sys.stderr)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("Shutting down, waiting for running jobs...", file=sys.stderr)
+        finally:
+            httpd.server_close()
+            if unix_socket and os.path.exists(unix_socket):
+                os.unlink(unix_socket)
+            self.close()
+
+    def close(self):
+        """Wait for the running jobs; queued jobs that have not started are dropped."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for llm_interaction in self.llms():
+            llm_interaction.rate_limiter.report()
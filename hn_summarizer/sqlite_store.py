@@ -0,0 +1,337 @@
+"""Optional SQLite store of threads, comments and summary rows, with a full-text index."""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+from .utilities import Utilities
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    item_id INTEGER PRIMARY KEY,
+    title TEXT,
+    num_comments INTEGER,
+    downloaded_at REAL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    item_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    author TEXT,
+    text TEXT,
+    depth INTEGER
+);
+CREATE INDEX IF NOT EXISTS comments_item ON comments (item_id);
+CREATE INDEX IF NOT EXISTS comments_author ON comments (author);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    item_id INTEGER NOT NULL,
+    run_id TEXT,
+    model TEXT,
+    chunk_index INTEGER,
+    participant TEXT,
+    argument TEXT,
+    urls TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS summaries_item ON summaries (item_id, model);
+CREATE INDEX IF NOT EXISTS summaries_participant ON summaries (participant);
+"""
+
+# External-content FTS5 tables, kept in sync by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(author, text, content='comments', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS comments_ai AFTER INSERT ON comments BEGIN
+    INSERT INTO comments_fts (rowid, author, text) VALUES (new.id, new.author, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS comments_ad AFTER DELETE ON comments BEGIN
+    INSERT INTO comments_fts (comments_fts, rowid, author, text) VALUES ('delete', old.id, old.author, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS comments_au AFTER UPDATE ON comments BEGIN
+    INSERT INTO comments_fts (comments_fts, rowid, author, text) VALUES ('delete', old.id, old.author, old.text);
+    INSERT INTO comments_fts (rowid, author, text) VALUES (new.id, new.author, new.text);
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+    participant, argument, urls, content='summaries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS summaries_ai AFTER INSERT ON summaries BEGIN
+    INSERT INTO summaries_fts (rowid, participant, argument, urls)
+    VALUES (new.id, new.participant, new.argument, new.urls);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_ad AFTER DELETE ON summaries BEGIN
+    INSERT INTO summaries_fts (summaries_fts, rowid, participant, argument, urls)
+    VALUES ('delete', old.id, old.participant, old.argument, old.urls);
+END;
+"""
+
+
+class SQLiteStore:
+    """
+    Keep threads, comments and summary rows in one SQLite database.
+
+    Comments are stored with their ids, parent ids and authors (as plain
+    text); every summarized table row is stored with the model and the run
+    that produced it. FTS5 indexes over the comment texts and the arguments
+    answer searches like "all arguments mentioning Rust" or "threads user X
+    argued in" without reading any files. The markdown files are still
+    written; they are a rendered view of the same rows.
+
+    The connection is shared by all threads of a run and guarded by a lock.
+    If the SQLite library lacks FTS5, searches fall back to LIKE.
+    """
+
+    def __init__(self, path=os.path.join("data", "hn.sqlite3")):
+        """
+        Open (and create) the database.
+
+        Args:
+            path: Database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+            try:
+                self.conn.executescript(_FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                print(f"SQLite store: no full-text index ({e}), searches use LIKE", file=sys.stderr)
+                self.fts = False
+
+    def close(self):
+        """Close the connection."""
+        with self._lock:
+            self.conn.close()
+
+    def start_run(self, run_id, config):
+        """Record a run and the settings it used."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, started_at, config) VALUES (?, ?, ?)",
+                (run_id, time.time(), json.dumps(config, default=str))
+            )
+
+    def save_thread(self, item_id, meta, comments):
+        """
+        Store a thread and its comments, unless this download is stored already.
+
+        Args:
+            item_id: The HN item ID
+            meta: Thread store metadata ('title', 'num_comments', 'downloaded_at')
+            comments: Iterable of comments as yielded by Utilities.iter_comments()
+
+        Returns:
+            True if the thread was (re)written
+        """
+        item_id = int(item_id)
+        with self._lock:
+            row = self.conn.execute("SELECT downloaded_at FROM threads WHERE item_id = ?", (item_id,)).fetchone()
+        if row is not None and row['downloaded_at'] == meta.get('downloaded_at'):
+            return False
+
+        records = [
+            (
+                int(comment['id']), item_id,
+                int(comment['parent_id']) if comment.get('parent_id') is not None else None,
+                comment['author'], Utilities.comment_text(comment['text']), comment.get('depth'),
+            )
+            for comment in comments
+        ]
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM comments WHERE item_id = ?", (item_id,))
+            # An upsert, not INSERT OR REPLACE: the rows REPLACE deletes would not reach the FTS triggers
+            self.conn.executemany(
+                "INSERT INTO comments (id, item_id, parent_id, author, text, depth) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET item_id = excluded.item_id, parent_id = excluded.parent_id, "
+                "author = excluded.author, text = excluded.text, depth = excluded.depth",
+                records
+            )
+            self.conn.execute(
+                "INSERT INTO threads (item_id, title, num_comments, downloaded_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (item_id) DO UPDATE SET title = excluded.title, num_comments = excluded.num_comments, "
+                "downloaded_at = excluded.downloaded_at",
+                (item_id, meta.get('title'), meta.get('num_comments'), meta.get('downloaded_at'))
+            )
+        return True
+
+    @staticmethod
+    def _records(item_id, model, run_id, entries, chunk_index, now):
+        return [
+            (
+                int(item_id), run_id, model, chunk_index, entry.get('participant'),
+                entry['argument'] if 'argument' in entry else entry.get('text'), entry.get('urls'), now,
+            )
+            for entry in entries
+        ]
+
+    def _write(self, item_id, model, records, replace):
+        with self._lock, self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM summaries WHERE item_id = ? AND model = ?", (int(item_id), model))
+            self.conn.executemany(
+                "INSERT INTO summaries (item_id, run_id, model, chunk_index, participant, argument, urls, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                records
+            )
+
+    def save_entries(self, item_id, model, run_id, entries, chunk_index=None, replace=False):
+        """
+        Store summary rows.
+
+        Args:
+            item_id: The HN item ID
+            model: Model that produced the rows
+            run_id: Id of the run
+            entries: CommentSummary dicts, or {'text': ...} for unstructured fallback output
+            chunk_index: Chunk the rows came from, if known
+            replace: Delete the stored rows of the item and model first, in
+                the same transaction (the rows are a new summary of the whole thread)
+        """
+        self._write(item_id, model, self._records(item_id, model, run_id, entries, chunk_index, time.time()), replace)
+
+    def begin_summary(self, item_id, model, run_id):
+        """
+        Start collecting the rows of a new summary of a thread.
+
+        Returns:
+            PendingSummary; its add_chunk_result() is a send_to_llm() on_result
+            callback, and commit() replaces the stored rows of the item and model
+        """
+        return PendingSummary(self, item_id, model, run_id)
+
+    @staticmethod
+    def _quoted(query):
+        """Turn free text into an FTS5 query of quoted terms (for queries that are not valid FTS syntax)."""
+        return " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+    def _search(self, fts_sql, like_sql, query, limit):
+        with self._lock:
+            if not self.fts:
+                return self.conn.execute(like_sql, (f"%{query}%", limit)).fetchall()
+            try:
+                return self.conn.execute(fts_sql, (query, limit)).fetchall()
+            except sqlite3.OperationalError:
+                return self.conn.execute(fts_sql, (self._quoted(query), limit)).fetchall()
+
+    def search_arguments(self, query, limit=50):
+        """
+        Full-text search over the summarized arguments (and participants, URLs).
+
+        Args:
+            query: FTS5 query, e.g. "rust", "borrow* NOT checker" or "participant:simonw"
+            limit: Maximum number of rows
+
+        Returns:
+            Rows with item_id, title, model, run_id, participant, argument and urls, best match first
+        """
+        select = (
+            "SELECT s.item_id, t.title, s.model, s.run_id, s.participant, s.argument, s.urls "
+            "FROM {source} LEFT JOIN threads t ON t.item_id = s.item_id WHERE {condition} LIMIT ?"
+        )
+        return self._search(
+            select.format(
+                source="summaries_fts JOIN summaries s ON s.id = summaries_fts.rowid",
+                condition="summaries_fts MATCH ? ORDER BY bm25(summaries_fts)",
+            ),
+            select.format(source="summaries s", condition="s.argument LIKE ? ORDER BY s.id DESC"),
+            query, limit
+        )
+
+    def search_comments(self, query, limit=50):
+        """
+        Full-text search over the comment texts (and authors).
+
+        Returns:
+            Rows with item_id, title, id, author and text, best match first
+        """
+        select = (
+            "SELECT c.item_id, t.title, c.id, c.author, c.text "
+            "FROM {source} LEFT JOIN threads t ON t.item_id = c.item_id WHERE {condition} LIMIT ?"
+        )
+        return self._search(
+            select.format(
+                source="comments_fts JOIN comments c ON c.id = comments_fts.rowid",
+                condition="comments_fts MATCH ? ORDER BY bm25(comments_fts)",
+            ),
+            select.format(source="comments c", condition="c.text LIKE ? ORDER BY c.id DESC"),
+            query, limit
+        )
+
+    def author_threads(self, author, limit=100):
+        """
+        Threads a user commented in, with their number of comments and summarized arguments.
+
+        Returns:
+            Rows with item_id, title, comments and arguments, most recent thread first
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT item_id, t.title, SUM(comments) AS comments, SUM(arguments) AS arguments FROM ("
+                "  SELECT item_id, COUNT(*) AS comments, 0 AS arguments FROM comments WHERE author = ? GROUP BY item_id"
+                "  UNION ALL"
+                "  SELECT item_id, 0, COUNT(*) FROM summaries WHERE participant = ? GROUP BY item_id"
+                ") LEFT JOIN threads t USING (item_id) GROUP BY item_id ORDER BY item_id DESC LIMIT ?",
+                (author, author, limit)
+            ).fetchall()
+
+
+class PendingSummary:
+    """
+    The rows of one summary of a thread, written to the store in one go.
+
+    Rows are collected per chunk while the thread is summarized and replace
+    the stored rows of the item and model in a single transaction at the
+    end. Readers never see a half-written summary, a run that fails keeps
+    the previous one, and jobs that summarize the same item with the same
+    model at the same time (server jobs with different topics) cannot
+    interleave their rows: the last one to finish wins.
+    """
+
+    def __init__(self, store, item_id, model, run_id):
+        """
+        Initialize the summary.
+
+        Args:
+            store: SQLiteStore to write to
+            item_id: The HN item ID
+            model: Model that produces the rows
+            run_id: Id of the run
+        """
+        self.store = store
+        self.item_id = item_id
+        self.model = model
+        self.run_id = run_id
+        self._records = []
+        self._lock = threading.Lock()
+
+    def add_chunk_result(self, chunk_index, response_data, fallback_text):
+        """Collect the rows of one summarized chunk (callback of LLMInteraction.send_to_llm)."""
+        if response_data:
+            entries = [summary.model_dump() for summary in response_data.summaries]
+        elif fallback_text:
+            entries = [{'text': fallback_text}]
+        else:
+            return
+        records = SQLiteStore._records(self.item_id, self.model, self.run_id, entries, chunk_index, time.time())
+        with self._lock:
+            self._records.extend(records)
+
+    def commit(self):
+        """Replace the stored rows of the item and model with the collected rows."""
+        with self._lock:
+            records = list(self._records)
+        self.store._write(self.item_id, self.model, records, replace=True)
@@ -0,0 +1,95 @@
+"""Incremental parser for streamed ThreadSummaryResponse JSON."""
+
+import json
+
+from pydantic import ValidationError
+
+from .models import CommentSummary
+
+
+class SummaryStreamParser:
+    """
+    Pick complete CommentSummary objects out of ThreadSummaryResponse JSON text.
+
+    The text is fed piece by piece, as it arrives from a streaming response.
+    Every object of the ``summaries`` array is returned as soon as its closing
+    brace has been seen, long before the whole document is complete. The
+    parser also works on truncated or slightly malformed output: objects that
+    are complete and valid are returned, everything else is ignored.
+    """
+
+    def __init__(self):
+        """Initialize an empty parser."""
+        self.buffer = ""
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+        self.items = []
+        self.invalid_items = 0
+
+    def feed(self, text):
+        """
+        Add text and return the summaries completed by it.
+
+        Args:
+            text: The next piece of the JSON output
+
+        Returns:
+            List of newly completed CommentSummary objects
+        """
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        for index in range(self.position, len(buffer)):
+            char = buffer[index]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.stack.append(char)
+                # An object directly inside the top-level object's array is one summary
+                if char == '{' and self.stack == ['{', '[', '{']:
+                    self.item_start = index
+            elif char in '}]':
+                if self.stack:
+                    self.stack.pop()
+                if char == '}' and self.item_start is not None and self.stack == ['{', '[']:
+                    summary = self._parse_item(buffer[self.item_start:index + 1])
+                    if summary is not None:
+                        completed.append(summary)
+                    self.item_start = None
+        self.position = len(buffer)
+        self.items.extend(completed)
+        return completed
+
+    def _parse_item(self, text):
+        try:
+            return CommentSummary(**json.loads(text))
+        except (ValueError, TypeError, ValidationError):
+            self.invalid_items += 1
+            return None
+
+    @classmethod
+    def parse_partial(cls, text):
+        """
+        Return all complete, valid summaries of a (possibly truncated) JSON text.
+
+        Args:
+            text: ThreadSummaryResponse JSON, complete or not
+
+        Returns:
+            List of CommentSummary objects
+        """
+        parser = cls()
+        parser.feed(text or "")
+        return parser.items
@@ -0,0 +1,314 @@
+"""Per-stage timing, token usage and cost of a run, written as a JSON report."""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# USD per 1M tokens: (input, cached input, output). Models are matched by
+# longest prefix, so dated snapshots ("gpt-4o-mini-2024-07-18") are covered.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "o4-mini": (1.10, 0.275, 4.40),
+}
+
+
+def model_prices(model):
+    """Return the (input, cached input, output) prices of a model, or None if unknown."""
+    matches = [name for name in MODEL_PRICES if model == name or model.startswith(name + "-")]
+    if not matches:
+        return None
+    return MODEL_PRICES[max(matches, key=len)]
+
+
+def usage_tokens(response):
+    """
+    Read input, cached and output tokens from ``response.usage``.
+
+    Returns:
+        dict with 'input_tokens', 'cached_tokens' and 'output_tokens' (0 if missing)
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        'input_tokens': getattr(usage, "input_tokens", None) or 0,
+        'cached_tokens': getattr(details, "cached_tokens", None) or 0,
+        'output_tokens': getattr(usage, "output_tokens", None) or 0,
+    }
+
+
+class RunTelemetry:
+    """
+    Collect wall time per stage and usage per LLM call, safe to use from many threads.
+
+    Stages (fetch, XML build, chunking, categorization, ...) are timed with
+    ``stage()`` or ``timed_iter()``; LLM calls are recorded with
+    ``record_call()``. The totals per stage and per model/kind, including
+    the estimated cost, are kept up to date as calls are recorded, so
+    ``report()`` does not have to go over every call again.
+
+    A resident process (``--serve``, ``--watch``) sets ``max_records``: only
+    the latest calls and chunks are kept as records, the totals still cover
+    the whole run.
+    """
+
+    def __init__(self, max_records=None):
+        """
+        Start the run clock.
+
+        Args:
+            max_records: Number of the latest call and chunk records kept (default: all)
+        """
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.calls = deque(maxlen=max_records)
+        self.chunks = deque(maxlen=max_records)
+        self.call_count = 0
+        self.models = {}
+        self.counts = {}
+        self.extra = {}
+        self._total_tokens = 0
+
+    def add_stage_time(self, name, seconds):
+        """Add the wall time of one occurrence of a stage."""
+        with self._lock:
+            stage = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += seconds
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one occurrence of stage ``name``."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.monotonic() - started)
+
+    def timed_iter(self, name, iterable):
+        """
+        Yield from ``iterable``, counting the time spent producing items as stage ``name``.
+
+        Used for lazy pipelines (e.g. chunk generators), where the work is
+        interleaved with the consumer.
+        """
+        iterator = iter(iterable)
+        seconds = 0.0
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    seconds += time.monotonic() - started
+                    return
+                seconds += time.monotonic() - started
+                yield item
+        finally:
+            self.add_stage_time(name, seconds)
+
+    def record_call(self, kind, model, seconds, response=None, cache_hit=False, fallback=False,
+                    failed=False, chunk_index=None, truncated=False, salvaged_rows=0, prompt_tokens=0,
+                    usage=None):
+        """
+        Record one LLM call.
+
+        Args:
+            kind: What the call was for, e.g. "summarize" or "categorize"
+            model: Model name
+            seconds: Wall time of the call
+            response: API response; its usage is recorded
+            cache_hit: The result came from the response cache (no API call)
+            fallback: The structured call failed and plain text was used
+            failed: No usable result
+            chunk_index: Chunk number for summarize calls
+            truncated: The response hit max_output_tokens
+            salvaged_rows: Summaries recovered from the output of a failed call
+            prompt_tokens: Input tokens of the instruction sent along with the chunk
+            usage: Token counts to record instead of those of ``response``
+                (dict as returned by usage_tokens(), e.g. counted locally when
+                a failed request left no response)
+        """
+        call = {
+            'kind': kind,
+            'model': model,
+            'seconds': round(seconds, 4),
+            'cache_hit': cache_hit,
+            'fallback': fallback,
+            'failed': failed,
+            'truncated': truncated,
+            'salvaged_rows': salvaged_rows,
+        }
+        if chunk_index is not None:
+            call['chunk_index'] = chunk_index
+        if prompt_tokens:
+            call['prompt_tokens'] = prompt_tokens
+        call.update(usage if usage is not None else usage_tokens(response))
+        cost = self.call_cost(call)
+        with self._lock:
+            self.calls.append(call)
+            self.call_count += 1
+            self._total_tokens += call['input_tokens'] + call['output_tokens']
+            model = self._model_totals(model)
+            kind = model['kinds'].setdefault(kind, {
+                'calls': 0, 'cache_hits': 0, 'fallbacks': 0, 'failures': 0, 'truncations': 0, 'salvaged_rows': 0,
+                'seconds': 0.0,
+                'input_tokens': 0, 'cached_tokens': 0, 'output_tokens': 0,
+            })
+            kind['calls'] += 1
+            kind['cache_hits'] += cache_hit
+            kind['fallbacks'] += fallback
+            kind['failures'] += failed
+            kind['truncations'] += truncated
+            kind['salvaged_rows'] += salvaged_rows
+            kind['seconds'] += call['seconds']
+            for field in ('input_tokens', 'cached_tokens', 'output_tokens'):
+                kind[field] += call[field]
+            if cost is None:
+                model['cost_usd'] = None
+            elif model['cost_usd'] is not None:
+                model['cost_usd'] += cost
+
+    def _model_totals(self, model):
+        """Return the totals of a model, creating them on first use (call with the lock held)."""
+        return self.models.setdefault(model, {'cost_usd': 0.0, 'kinds': {}})
+
+    def record_chunk(self, model, chunk_index, outcome, structured=True, lost=False):
+        """
+        Record how a chunk was summarized.
+
+        Args:
+            model: Model name
+            chunk_index: Chunk number
+            outcome: Counters of the chunk: 'failed_requests', 'salvaged_rows',
+                'remainder_requests', 'bisections' and 'fallbacks'
+            structured: The chunk ended up with structured rows
+            lost: The chunk produced no result at all
+        """
+        chunk = {'model': model, 'chunk_index': chunk_index, 'structured': structured, 'lost': lost, **outcome}
+        with self._lock:
+            self.chunks.append(chunk)
+            # Per model: how many chunks needed recovery, and how
+            totals = self._model_totals(model).setdefault('chunks', {
+                'chunks': 0, 'with_failures': 0, 'failed_requests': 0, 'salvaged_rows': 0, 'remainder_requests': 0,
+                'bisections': 0, 'fallbacks': 0, 'unstructured': 0, 'lost': 0,
+            })
+            totals['chunks'] += 1
+            totals['with_failures'] += chunk['failed_requests'] > 0
+            for field in ('failed_requests', 'salvaged_rows', 'remainder_requests', 'bisections', 'fallbacks'):
+                totals[field] += chunk[field]
+            totals['unstructured'] += not structured and not lost
+            totals['lost'] += lost
+
+    def add_counts(self, name, counts):
+        """Add a dict of counters (e.g. per-item filter stats) to the run totals under ``name``."""
+        with self._lock:
+            totals = self.counts.setdefault(name, {})
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+
+    def calls_since(self, start):
+        """
+        Return the calls recorded after the first ``start`` calls.
+
+        Calls that are no longer kept (see ``max_records``) are skipped.
+
+        Returns:
+            Tuple of (list of call records, number of calls recorded so far)
+        """
+        with self._lock:
+            dropped = self.call_count - len(self.calls)
+            calls = list(self.calls)[max(0, start - dropped):]
+            return calls, self.call_count
+
+    def total_tokens(self):
+        """Input plus output tokens of all calls recorded so far."""
+        with self._lock:
+            return self._total_tokens
+
+    @staticmethod
+    def call_cost(call):
+        """Estimated USD cost of a recorded call, or None if the model has no price."""
+        prices = model_prices(call['model'])
+        if prices is None:
+            return None
+        input_price, cached_price, output_price = prices
+        uncached = call['input_tokens'] - call['cached_tokens']
+        return (
+            uncached * input_price + call['cached_tokens'] * cached_price + call['output_tokens'] * output_price
+        ) / 1_000_000
+
+    def report(self, records=True):
+        """
+        Return the totals of the run.
+
+        Args:
+            records: Include the kept call and chunk records
+
+        Returns:
+            The run report as a JSON-serializable dict
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+            counts = {name: dict(totals) for name, totals in self.counts.items()}
+            models = {
+                name: {
+                    **model,
+                    'kinds': {kind: dict(totals) for kind, totals in model['kinds'].items()},
+                    **({'chunks': dict(model['chunks'])} if 'chunks' in model else {}),
+                }
+                for name, model in self.models.items()
+            }
+            calls = list(self.calls) if records else None
+            chunks = list(self.chunks) if records else None
+
+        for stage in stages.values():
+            stage['seconds'] = round(stage['seconds'], 4)
+            stage['max_seconds'] = round(stage['max_seconds'], 4)
+        for model in models.values():
+            if model['cost_usd'] is not None:
+                model['cost_usd'] = round(model['cost_usd'], 6)
+            for kind in model['kinds'].values():
+                kind['seconds'] = round(kind['seconds'], 4)
+
+        costs = [model['cost_usd'] for model in models.values()]
+        report = {
+            'started_at': self.started_at,
+            'wall_seconds': round(time.monotonic() - self._started, 4),
+            'stages': stages,
+            'models': models,
+            'total_cost_usd': round(sum(costs), 6) if costs and None not in costs else None,
+            'counts': counts,
+            **self.extra,
+        }
+        if records:
+            report['calls'] = calls
+            report['chunks'] = chunks
+        return report
+
+    def write(self, path):
+        """
+        Write the report as JSON.
+
+        Returns:
+            The report dict
+        """
+        report = self.report()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,202 @@
+"""Model-independent on-disk store for downloaded HN threads."""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+from .utilities import Utilities, THREAD_WRITERS
+
+
+class ThreadStore:
+    """
+    Keep downloaded HN threads on disk, keyed only by item id.
+
+    For every item the store keeps the raw Algolia JSON, the flattened comment
+    list derived from it (one JSON object per line), and a small metadata file with the download time and
+    HTTP validators (``fetched_at`` is the last check, ``downloaded_at`` the
+    last actual download). All models and topics share the same entry. An entry older
+    than ``ttl_seconds`` is refreshed with a conditional request, so an
+    unchanged thread is not downloaded again.
+
+    Layout::
+
+        data/threads/<item_id>/raw.json
+        data/threads/<item_id>/comments.jsonl
+        data/threads/<item_id>/meta.json
+    """
+
+    def __init__(self, directory="data/threads", ttl_seconds=86400):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Base directory of the store
+            ttl_seconds: Age after which an entry is refreshed
+        """
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _item_dir(self, item_id):
+        return os.path.join(self.directory, str(item_id))
+
+    def _item_lock(self, item_id):
+        with self._locks_guard:
+            return self._locks.setdefault(str(item_id), threading.Lock())
+
+    @staticmethod
+    def _write_json(path, payload):
+        """Write JSON atomically, so readers never see a half-written file."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load_meta(self, item_id):
+        """Return the metadata of a stored item, or None if it is not stored."""
+        if not os.path.isfile(os.path.join(self._item_dir(item_id), 'comments.jsonl')):
+            return None
+        try:
+            with open(os.path.join(self._item_dir(item_id), 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, item_id):
+        """Check whether a stored item is younger than the TTL."""
+        meta = self.load_meta(item_id)
+        return meta is not None and time.time() - meta.get('fetched_at', 0) < self.ttl_seconds
+
+    def refresh(self, item_id, force=False, revalidate=False):
+        """
+        Make sure the stored copy of an item is present and fresh.
+
+        Args:
+            item_id: The HN item ID
+            force: Download again even if the entry is still fresh
+            revalidate: Check a fresh entry with a conditional request instead
+                of trusting the TTL (e.g. to pick up new comments)
+
+        Returns:
+            The metadata dictionary of the stored item
+        """
+        with self._item_lock(item_id):
+            meta = self.load_meta(item_id)
+            if meta is not None and not (force or revalidate) and time.time() - meta.get('fetched_at', 0) < self.ttl_seconds:
+                print(f"Thread {item_id} is cached in the thread store, skipping download.", file=sys.stderr)
+                return meta
+
+            headers = {}
+            if meta is not None and not force:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            response = Utilities.fetch_hn_item(item_id, headers=headers, stream=True)
+            if response.status_code == 304 and meta is not None:
+                response.close()
+                print(f"Thread {item_id} has not changed since the last download.", file=sys.stderr)
+                meta['fetched_at'] = time.time()
+                self._write_json(os.path.join(self._item_dir(item_id), 'meta.json'), meta)
+                return meta
+
+            print(f"Downloading thread {item_id}...", file=sys.stderr)
+            item_dir = self._item_dir(item_id)
+            os.makedirs(item_dir, exist_ok=True)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            raw_path = os.path.join(item_dir, 'raw.json')
+            Utilities.save_response(response, raw_path)
+            title, num_comments = self._derive_comments(raw_path, os.path.join(item_dir, 'comments.jsonl'))
+
+            meta = {
+                'item_id': str(item_id),
+                'title': title,
+                'num_comments': num_comments,
+                'fetched_at': time.time(),
+                'downloaded_at': time.time(),
+                'etag': etag,
+                'last_modified': last_modified,
+            }
+            # meta.json is written last: it marks the entry as complete
+            self._write_json(os.path.join(item_dir, 'meta.json'), meta)
+            return meta
+
+    @staticmethod
+    def _derive_comments(raw_path, comments_path):
+        """
+        Stream the comments of a raw Algolia file into a JSON lines file.
+
+        Returns:
+            Tuple (thread title, number of comments)
+        """
+        title = None
+        num_comments = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(comments_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for node in Utilities.iter_thread_nodes_from_file(raw_path):
+                    if node['depth'] == 0:
+                        title = node.get('title')
+                    if Utilities.is_comment(node):
+                        f.write(json.dumps(Utilities.comment_record(node), ensure_ascii=False))
+                        f.write('\n')
+                        num_comments += 1
+            os.replace(tmp_path, comments_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return title, num_comments
+
+    def load_raw(self, item_id):
+        """Return the stored raw Algolia JSON of an item."""
+        with open(os.path.join(self._item_dir(item_id), 'raw.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def iter_comments(self, item_id):
+        """Yield the stored comments of an item in document order, one at a time."""
+        with open(os.path.join(self._item_dir(item_id), 'comments.jsonl'), 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def load_comments(self, item_id):
+        """Return the stored flattened comment list of an item."""
+        return list(self.iter_comments(item_id))
+
+    def intermediate_file(self, item_id, thread_format='xml'):
+        """
+        Return the path of the intermediate XML (or compact) file of an item.
+
+        The file is shared by all models and topics. It is rebuilt from the
+        stored comment list when missing or older than the stored thread.
+        The item is downloaded first if it is not in the store yet; call
+        refresh() before to apply the TTL.
+
+        Args:
+            item_id: The HN item ID
+            thread_format: "xml" or "compact" (see utilities.THREAD_WRITERS)
+
+        Returns:
+            Path to the file in output/
+        """
+        meta = self.load_meta(item_id) or self.refresh(item_id)
+        xml_file = os.path.join("output", f"hn-{item_id}{THREAD_WRITERS[thread_format].file_extension}")
+        with self._item_lock(item_id):
+            if not os.path.isfile(xml_file) or os.path.getmtime(xml_file) < meta['downloaded_at']:
+                Utilities.write_thread_xml(item_id, self.iter_comments(item_id), xml_file, thread_format)
+            else:
+                print(f"File {xml_file} is up to date, skipping XML build.", file=sys.stderr)
+        return xml_file
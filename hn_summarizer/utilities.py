@@ -4,16 +4,44 @@ import os
 import sys
 import re
 import html
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import json
+import tempfile
 from urllib.parse import urlparse
 
-import requests
+from .xml_writer import ThreadXMLWriter
+from .compact_writer import ThreadCompactWriter
+
+_NODE_FIELDS = ('id', 'parent_id', 'author', 'text', 'title')
+# Fields that must precede 'children' for a node to be emitted before its descendants
+# (plus 'title' for the story and 'parent_id' for comments)
+_ORDERED_FIELDS = ('id', 'author', 'text')
+# Serializations of the intermediate thread file, selected with --thread-format
+THREAD_WRITERS = {'xml': ThreadXMLWriter, 'compact': ThreadCompactWriter}
 
 
 class Utilities:
     """Utility class for file operations and HN API interactions."""
 
+    @staticmethod
+    def user_cache_dir(*parts):
+        """
+        Return (and create) a directory in the per-user cache.
+
+        The cache lives in $HN_SUMMARIZER_CACHE_DIR, or in hn-summarizer/
+        below $XDG_CACHE_HOME (default ~/.cache). It holds data that is
+        shared by all working directories, such as tokenizer files.
+
+        Args:
+            parts: Optional subdirectory path components
+        """
+        base = os.environ.get("HN_SUMMARIZER_CACHE_DIR") or os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+            "hn-summarizer"
+        )
+        directory = os.path.join(base, *parts)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
     @staticmethod
     def create_subdirectories():
         """Create required subdirectories for the application."""
@@ -38,6 +66,7 @@ class Utilities:
         """
         if hnitem.isdigit() and len(hnitem) > 5:
             hnitem = f"https://news.ycombinator.com/item?id={hnitem}"
+        if hnitem_id is None:
             hnitem_id = Utilities.get_item_id(hnitem)
         hnitem_dict = {'hnitem': hnitem, 'hnitem_id': hnitem_id}
         return hnitem_dict
@@ -70,6 +99,284 @@ class Utilities:
         text = re.sub(r'\s+', ' ', text).strip()
         return text
 
+    ALGOLIA_ITEMS_URL = "https://hn.algolia.com/api/v1/items/{hn_item_id}"
+
+    @staticmethod
+    def fetch_hn_item(hn_item_id, headers=None, stream=False):
+        """
+        Request a Hacker News item (with all its comments) from the Algolia API.
+
+        Args:
+            hn_item_id: The HN item ID to download
+            headers: Optional extra request headers, e.g. for conditional requests
+            stream: Do not read the response body up front (see save_response)
+
+        Returns:
+            The requests.Response object (status 200 or 304)
+        """
+        import requests  # imported here: it is slow to import and only needed for downloads
+
+        url = Utilities.ALGOLIA_ITEMS_URL.format(hn_item_id=hn_item_id)
+        # With stream=True the timeout bounds every wait for the next bytes, not the whole download
+        response = requests.get(url, headers=headers or {}, stream=stream, timeout=30)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    ALGOLIA_SEARCH_URL = "https://hn.algolia.com/api/v1/search"
+
+    @staticmethod
+    def fetch_front_page(num_stories=30):
+        """
+        Request the stories currently on the Hacker News front page from the Algolia search API.
+
+        Args:
+            num_stories: Maximum number of stories to return
+
+        Returns:
+            List of dicts with 'id', 'title', 'num_comments', 'points' and 'created_at' (epoch seconds)
+        """
+        import requests
+
+        response = requests.get(
+            Utilities.ALGOLIA_SEARCH_URL, params={'tags': 'front_page', 'hitsPerPage': num_stories}, timeout=30
+        )
+        response.raise_for_status()
+        return [
+            {
+                'id': str(hit['objectID']),
+                'title': hit.get('title') or "",
+                'num_comments': hit.get('num_comments') or 0,
+                'points': hit.get('points') or 0,
+                'created_at': hit.get('created_at_i') or 0,
+            }
+            for hit in response.json().get('hits', [])
+        ]
+
+    @staticmethod
+    def use_algolia_api(api_url):
+        """
+        Point all Algolia requests to another base URL, e.g. a local stand-in.
+
+        Args:
+            api_url: Base URL corresponding to https://hn.algolia.com/api/v1
+        """
+        api_url = api_url.rstrip('/')
+        Utilities.ALGOLIA_ITEMS_URL = api_url + "/items/{hn_item_id}"
+        Utilities.ALGOLIA_SEARCH_URL = api_url + "/search"
+
+    @staticmethod
+    def save_response(response, path):
+        """
+        Stream a response body to a file without holding it in memory.
+
+        The file is written to a temporary name first and then moved into place.
+
+        Args:
+            response: A requests.Response created with stream=True
+            path: Destination file
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in response.iter_content(chunk_size=65536):
+                    f.write(block)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            response.close()
+
+    @staticmethod
+    def iter_thread_nodes(data):
+        """
+        Walk an Algolia item tree in document order (pre-order), without recursion.
+
+        Args:
+            data: The Algolia item payload (a dict with nested 'children')
+
+        Yields:
+            Dicts with 'id', 'parent_id', 'author', 'text', 'title' and 'depth' keys
+        """
+        stack = [(data, 0)]
+        while stack:
+            node, depth = stack.pop()
+            record = {field: node.get(field) for field in _NODE_FIELDS}
+            record['depth'] = depth
+            yield record
+            children = node.get('children') or []
+            stack.extend((child, depth + 1) for child in reversed(children))
+
+    @staticmethod
+    def iter_thread_nodes_from_file(path):
+        """
+        Walk a stored Algolia JSON file in document order.
+
+        With ijson installed the file is parsed incrementally, so memory use
+        does not grow with the thread size. Without it, the file is loaded
+        with json.load().
+
+        Args:
+            path: Path to the raw Algolia JSON
+
+        Yields:
+            Same records as iter_thread_nodes()
+        """
+        try:
+            import ijson  # optional streaming JSON parser; imported here, as only reading threads needs it
+        except ImportError:
+            ijson = None
+        with open(path, 'rb') as f:
+            if ijson is None:
+                yield from Utilities.iter_thread_nodes(json.load(f))
+            else:
+                yield from Utilities._iter_nodes_from_events(ijson.basic_parse(f, use_float=True))
+
+    @staticmethod
+    def _iter_nodes_from_events(events):
+        """
+        Turn ijson basic_parse events into node records.
+
+        A node is emitted when its 'children' key is reached (the Algolia API
+        sends it after the node's own fields), or at the end of the node if it
+        has no 'children' key, which keeps document order. If 'children' comes
+        before the node's fields, the node and its descendants are held back
+        until the end of the node, so the record is complete and still comes
+        before its descendants.
+        """
+        # Stack entries: [kind, record, current_key, depth, emitted, seen_keys, held]
+        # kind is 'node', 'map', 'children' (a node's children array) or 'array';
+        # held collects the records of descendants of a node that is not emitted yet
+        stack = []
+        # Nodes whose 'children' came before their fields, innermost last
+        holding = []
+
+        def emit(records):
+            # Records go to the innermost node that is held back, if any
+            if holding:
+                holding[-1][6].extend(records)
+                return []
+            return records
+
+        for event, value in events:
+            top = stack[-1] if stack else None
+            if event == 'start_map':
+                if top is None or top[0] == 'children':
+                    depth = top[3] + 1 if top else 0
+                    record = {field: None for field in _NODE_FIELDS}
+                    record['depth'] = depth
+                    stack.append(['node', record, None, depth, False, set(), []])
+                else:
+                    stack.append(['map', None, None, top[3], False, None, None])
+            elif event == 'map_key':
+                top[2] = value
+                if top[0] == 'node':
+                    top[5].add(value)
+                    if value == 'children' and not top[4]:
+                        required = _ORDERED_FIELDS + (('title',) if top[3] == 0 else ('parent_id',))
+                        if top[5].issuperset(required):
+                            top[4] = True
+                            yield from emit([top[1]])
+                        else:
+                            holding.append(top)
+            elif event == 'start_array':
+                is_children = top is not None and top[0] == 'node' and top[2] == 'children'
+                stack.append(
+                    ['children' if is_children else 'array', None, None, top[3] if top else 0, False, None, None]
+                )
+            elif event in ('end_map', 'end_array'):
+                entry = stack.pop()
+                if entry[0] == 'node' and not entry[4]:
+                    if holding and holding[-1] is entry:
+                        holding.pop()
+                    yield from emit([entry[1]] + entry[6])
+            elif top is not None and top[0] == 'node' and top[2] in _NODE_FIELDS:
+                top[1][top[2]] = value
+
+    @staticmethod
+    def is_comment(node):
+        """Check whether a node record carries a comment worth summarizing."""
+        return bool(node.get('text') and node.get('author'))
+
+    @staticmethod
+    def comment_record(node):
+        """Reduce a node record to the fields kept for a comment."""
+        return {
+            'id': node.get('id'),
+            'parent_id': node.get('parent_id'),
+            'author': node['author'],
+            'text': node['text'],
+            'depth': node['depth'],
+        }
+
+    @staticmethod
+    def iter_comments(nodes):
+        """
+        Filter node records down to comments in document order.
+
+        Only nodes with both an author and a text are kept. The text is kept as
+        returned by the API (HTML); use comment_text() to clean it.
+
+        Args:
+            nodes: Iterable of node records, e.g. from iter_thread_nodes()
+
+        Yields:
+            Dicts with 'id', 'parent_id', 'author', 'text' and 'depth' keys
+        """
+        for node in nodes:
+            if Utilities.is_comment(node):
+                yield Utilities.comment_record(node)
+
+    @staticmethod
+    def extract_comments(data):
+        """
+        Flatten an Algolia item tree into a list of comments in document order.
+
+        Args:
+            data: The Algolia item payload (a dict with nested 'children')
+
+        Returns:
+            List of comments as yielded by iter_comments()
+        """
+        return list(Utilities.iter_comments(Utilities.iter_thread_nodes(data)))
+
+    @staticmethod
+    def comment_text(raw_text):
+        """Turn the HTML text of a comment into plain, XML-safe text."""
+        # Decode HTML entities in comment text, then sanitize for XML
+        comment_text = html.unescape(raw_text or '')
+        # Strip HTML tags but keep text content
+        comment_text = re.sub(r'<[^>]+>', ' ', comment_text)
+        return Utilities.sanitize_for_xml(comment_text)
+
+    @staticmethod
+    def write_thread_xml(hn_item_id, comments, intermediate_file, thread_format='xml'):
+        """
+        Write a flattened comment list as the intermediate file.
+
+        Entries are written one by one as the comments are consumed, so
+        ``comments`` can be a generator over a thread of any size.
+
+        Args:
+            hn_item_id: The HN item ID
+            comments: Iterable of comments as yielded by iter_comments()
+            intermediate_file: Path to save the output
+            thread_format: Key of THREAD_WRITERS ("xml" or "compact")
+
+        Returns:
+            Number of entries written
+        """
+        with open(intermediate_file, 'w', encoding='utf-8') as f:
+            with THREAD_WRITERS[thread_format](f, hn_item_id) as writer:
+                for comment in comments:
+                    writer.write_entry(
+                        Utilities.sanitize_for_xml(comment['author']),
+                        Utilities.comment_text(comment['text'])
+                    )
+        return writer.entries
+
     @staticmethod
     def download_hn_thread(hn_item_id, intermediate_file):
         """
@@ -79,46 +386,5 @@ class Utilities:
             hn_item_id: The HN item ID to download
             intermediate_file: Path to save the XML output
         """
-        url = f"https://hn.algolia.com/api/v1/items/{hn_item_id}"
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Create proper XML structure
-        root = ET.Element("thread")
-        root.set("hn_item_id", str(hn_item_id))
-        
-        # Add tableheader element
-        ET.SubElement(root, "tableheader")
-        
-        def extract_comments(comment, parent_element):
-            if comment.get('text') and comment.get('author'):
-                entry = ET.SubElement(parent_element, "entry")
-                author_elem = ET.SubElement(entry, "author")
-                author_elem.text = Utilities.sanitize_for_xml(comment['author'])
-                comment_elem = ET.SubElement(entry, "comment")
-                # Decode HTML entities in comment text, then sanitize for XML
-                comment_text = html.unescape(comment.get('text', ''))
-                # Strip HTML tags but keep text content
-                comment_text = re.sub(r'<[^>]+>', ' ', comment_text)
-                comment_elem.text = Utilities.sanitize_for_xml(comment_text)
-            for child in comment.get('children', []):
-                extract_comments(child, parent_element)
-        
-        extract_comments(data, root)
-        
-        # Create XML tree and write with proper formatting
-        tree = ET.ElementTree(root)
-        
-        # Use minidom for pretty printing
-        xml_str = ET.tostring(root, encoding='unicode', method='xml')
-        dom = minidom.parseString(xml_str)
-        pretty_xml = dom.toprettyxml(indent="  ", encoding=None)
-        
-        # Remove extra blank lines that minidom adds
-        lines = [line for line in pretty_xml.split('\n') if line.strip()]
-        pretty_xml = '\n'.join(lines)
-        
-        with open(intermediate_file, 'w', encoding='utf-8') as f:
-            f.write(pretty_xml)
+        data = Utilities.fetch_hn_item(hn_item_id).json()
+        Utilities.write_thread_xml(hn_item_id, Utilities.extract_comments(data), intermediate_file)
@@ -1,10 +1,12 @@
 """OpenAI version and feature detection utilities."""
 
+import os
 import re
-import openai as _openai_module
-from openai import OpenAI
+import json
+from importlib import metadata
 
 _REQUIRED_OPENAI_STRUCTURED_VERSION = (1, 40, 0)
+_MEMO_FILE = "version_check.json"
 
 
 def _parse_version_tuple(version_str: str) -> tuple[int, ...]:
@@ -15,20 +17,61 @@ def _parse_version_tuple(version_str: str) -> tuple[int, ...]:
 
 def _has_responses_feature() -> bool:
     """Check if the OpenAI client has the responses feature."""
+    from openai import OpenAI
+
     if getattr(OpenAI, "responses", None) is not None:
         return True
     beta = getattr(OpenAI, "beta", None)
     return getattr(beta, "responses", None) is not None
 
 
+def _installed_openai_version() -> str | None:
+    """Return the installed openai version from the package metadata, without importing it."""
+    try:
+        return metadata.version("openai")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _memo_path() -> str | None:
+    """Path of the memo file in the user cache, or None if the cache is not writable."""
+    from .utilities import Utilities
+
+    try:
+        return os.path.join(Utilities.user_cache_dir(), _MEMO_FILE)
+    except OSError:
+        return None
+
+
+def _memo_matches(path, version_str) -> bool:
+    """Return True if the memo records a successful check of this openai version."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get("openai_version") == version_str
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
 def ensure_structured_output_support() -> None:
     """
     Ensure the installed OpenAI package supports structured outputs.
-    
+
+    A successful check is remembered per openai version in the user cache
+    (see Utilities.user_cache_dir), so later runs neither repeat it nor
+    import openai just for the check.
+
     Raises:
         RuntimeError: If the OpenAI package version is too old or lacks required features.
     """
-    version_str = getattr(_openai_module, "__version__", None)
+    version_str = _installed_openai_version()
+    memo_path = _memo_path() if version_str else None
+    if memo_path and _memo_matches(memo_path, version_str):
+        return
+
+    if not version_str:
+        import openai as _openai_module
+
+        version_str = getattr(_openai_module, "__version__", None)
     if not version_str:
         raise RuntimeError(
             "Cannot determine the installed 'openai' version. "
@@ -45,3 +88,10 @@ def ensure_structured_output_support() -> None:
             "The installed OpenAI package lacks the Responses interface required for structured outputs. "
             "Please upgrade to openai>=1.40.0."
         )
+
+    if memo_path:
+        try:
+            with open(memo_path, 'w') as f:
+                json.dump({"openai_version": version_str}, f)
+        except OSError:
+            pass
@@ -0,0 +1,255 @@
+"""Watch the Hacker News front page and keep summaries of active threads fresh."""
+
+import os
+import sys
+import copy
+import json
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .utilities import Utilities
+
+# Rough cost of summarizing one comment: the comment as input plus its table row as output
+TOKENS_PER_COMMENT = 150
+# Observations kept per story for the growth rate
+MAX_OBSERVATIONS = 12
+# Stories off the front page for this long are dropped from the state
+STORY_RETENTION_SECONDS = 24 * 3600
+
+
+def growth_rate(observations, created_at, now):
+    """
+    Comments per hour a story is currently gaining.
+
+    Args:
+        observations: List of [timestamp, num_comments], oldest first
+        created_at: Epoch seconds the story was posted
+        now: Current epoch seconds
+
+    Returns:
+        Comments per hour; for a story seen only once, its average rate since it was posted
+    """
+    if len(observations) >= 2:
+        (first_at, first_count), (last_at, last_count) = observations[-2], observations[-1]
+        if last_at > first_at:
+            return max(0.0, (last_count - first_count) * 3600.0 / (last_at - first_at))
+    if not observations:
+        return 0.0
+    age = max(now - created_at, 60.0) if created_at else 3600.0
+    return observations[-1][1] * 3600.0 / age
+
+
+class FrontPageWatcher:
+    """
+    Poll the front page and re-summarize the threads that are growing.
+
+    Every poll records the comment count of each front page story. Stories
+    whose count changed since their last summary (and that have at least
+    ``min_comments``) are candidates, highest comment growth rate first. At
+    most ``workers`` summaries run at the same time, and new ones are only
+    started while the tokens used in the last hour plus the estimate of the
+    running and the new job stay within ``token_budget``. The state is kept
+    in ``data/watcher/state.json``, so a restarted watcher does not summarize
+    unchanged threads again; stories that have not been on the front page
+    for STORY_RETENTION_SECONDS are dropped from it.
+    """
+
+    def __init__(self, cli, llm_interaction, instruction, workers=1, token_budget=500000, num_stories=30,
+                 min_comments=20, state_file=os.path.join("data", "watcher", "state.json")):
+        """
+        Initialize the watcher.
+
+        Args:
+            cli: Configured HNSummarizerCLI (its config applies to every summary)
+            llm_interaction: Shared LLMInteraction instance
+            instruction: System instruction for the LLM
+            workers: Maximum number of summaries running at the same time
+            token_budget: Maximum tokens (input plus output) used per hour
+            num_stories: Front page stories requested per poll
+            min_comments: Stories with fewer comments are not summarized
+            state_file: JSON file with the observations and summaries per story
+        """
+        self.cli = cli
+        self.llm_interaction = llm_interaction
+        self.instruction = instruction
+        self.workers = workers
+        self.token_budget = token_budget
+        self.num_stories = num_stories
+        self.min_comments = min_comments
+        self.state_file = state_file
+        self.stories = self._load_state()
+        self.running = {}
+        self._spent = []
+        self._tokens_seen = cli.telemetry.total_tokens()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch")
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        """Write the state atomically."""
+        directory = os.path.dirname(self.state_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            payload = json.dumps(self.stories, indent=2)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.state_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def estimate_tokens(self, story):
+        """Estimated tokens of summarizing a story (only its new comments with --incremental)."""
+        comments = story['num_comments']
+        if self.cli.config['incremental']:
+            comments -= story.get('summarized_comments') or 0
+        return max(comments, 1) * TOKENS_PER_COMMENT
+
+    def tokens_used_last_hour(self, now):
+        """Tokens recorded by finished summaries in the last hour."""
+        with self._lock:
+            self._spent = [(at, tokens) for at, tokens in self._spent if now - at < 3600]
+            return sum(tokens for _, tokens in self._spent)
+
+    def llms(self):
+        """Return the LLMInteractions the summaries use (for the run report)."""
+        return [self.llm_interaction]
+
+    def observe(self, front_page, now):
+        """
+        Record the comment counts of a front page poll and forget stories that left it long ago.
+
+        Returns:
+            The candidate stories, highest growth rate first
+        """
+        candidates = []
+        with self._lock:
+            for hit in front_page:
+                story = self.stories.setdefault(hit['id'], {'observations': [], 'summarized_comments': None})
+                story.update(title=hit['title'], num_comments=hit['num_comments'], created_at=hit['created_at'],
+                             last_seen=now)
+                story['observations'] = (story['observations'] + [[now, hit['num_comments']]])[-MAX_OBSERVATIONS:]
+                story['growth_rate'] = round(growth_rate(story['observations'], hit['created_at'], now), 2)
+                if hit['id'] in self.running or hit['num_comments'] < self.min_comments:
+                    continue
+                if hit['num_comments'] == story['summarized_comments']:
+                    continue
+                candidates.append(dict(story, id=hit['id']))
+            for story_id, story in list(self.stories.items()):
+                # State files of older versions have no last_seen; the last observation is as good
+                last_seen = story.get('last_seen') or (story['observations'][-1][0] if story['observations'] else 0)
+                if now - last_seen > STORY_RETENTION_SECONDS and story_id not in self.running:
+                    del self.stories[story_id]
+        candidates.sort(key=lambda story: (-story['growth_rate'], -story['num_comments']))
+        return candidates
+
+    def schedule(self, candidates, now):
+        """
+        Start summaries of the candidates within the job and token budgets.
+
+        Returns:
+            List of the started story ids
+        """
+        started = []
+        with self._lock:
+            reserved = sum(self.running.values())
+        used = self.tokens_used_last_hour(now)
+        for story in candidates:
+            if len(self.running) >= self.workers:
+                break
+            estimate = self.estimate_tokens(story)
+            if used + reserved + estimate > self.token_budget:
+                print(
+                    f"Watch: token budget reached, {story['id']} ({estimate} tokens estimated) waits "
+                    f"({used} used in the last hour, {reserved} reserved)",
+                    file=sys.stderr
+                )
+                continue
+            reserved += estimate
+            with self._lock:
+                self.running[story['id']] = estimate
+            print(
+                f"Watch: summarizing {story['id']} \"{story['title']}\" ({story['num_comments']} comments, "
+                f"{story['growth_rate']:.0f}/h)",
+                file=sys.stderr
+            )
+            self._executor.submit(self._summarize, story)
+            started.append(story['id'])
+        return started
+
+    def _summarize(self, story):
+        job_cli = copy.copy(self.cli)
+        job_cli.config = {**self.cli.config, 'topic': story['title'] or self.cli.config['topic'], 'refresh': True}
+        try:
+            job_cli.summarize_item(story['id'], self.llm_interaction, self.instruction)
+            with self._lock:
+                self.stories[story['id']]['summarized_comments'] = story['num_comments']
+                self.stories[story['id']]['summarized_at'] = time.time()
+        except Exception as e:
+            print(f"Watch: error summarizing {story['id']}: {str(e)}", file=sys.stderr)
+        finally:
+            with self._lock:
+                del self.running[story['id']]
+                # Calls of jobs running at the same time mix, but the sum over all jobs is exact
+                tokens_seen = self.cli.telemetry.total_tokens()
+                self._spent.append((time.time(), tokens_seen - self._tokens_seen))
+                self._tokens_seen = tokens_seen
+            self.save_state()
+
+    def poll(self):
+        """
+        Fetch the front page once, record it and start the due summaries.
+
+        Returns:
+            List of the started story ids
+        """
+        now = time.time()
+        try:
+            front_page = Utilities.fetch_front_page(self.num_stories)
+        except Exception as e:
+            print(f"Watch: front page request failed: {str(e)}", file=sys.stderr)
+            return []
+        candidates = self.observe(front_page, now)
+        started = self.schedule(candidates, now)
+        self.save_state()
+        print(
+            f"Watch: {len(front_page)} stories, {len(candidates)} changed, {len(started)} started, "
+            f"{len(self.running)} running",
+            file=sys.stderr
+        )
+        return started
+
+    def watch(self, interval=300, max_polls=0):
+        """
+        Poll every ``interval`` seconds until interrupted (or ``max_polls`` polls are done).
+
+        Running summaries are finished before returning.
+
+        Returns:
+            The LLMInteractions the summaries used (see llms())
+        """
+        polls = 0
+        try:
+            while True:
+                self.poll()
+                polls += 1
+                if max_polls and polls >= max_polls:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Watch: stopping, waiting for running summaries...", file=sys.stderr)
+        finally:
+            self._executor.shutdown(wait=True)
+            self.save_state()
+        return self.llms()
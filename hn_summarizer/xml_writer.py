@@ -0,0 +1,103 @@
+"""Streaming writer for the intermediate thread XML file."""
+
+# Same escaping as minidom's toprettyxml(), which produced this file before.
+# (xml.sax.saxutils.escape does the same, but importing it pulls in urllib.request.)
+_ESCAPES = str.maketrans({'&': "&amp;", '<': "&lt;", '>': "&gt;", '"': "&quot;"})
+
+
+def escape(text):
+    """Escape text for element content and attribute values."""
+    return text.translate(_ESCAPES)
+
+
+class ThreadXMLWriter:
+    """
+    Write the ``<thread>/<entry>/<author>/<comment>`` file one entry at a time.
+
+    The output is identical to building the whole document with ElementTree
+    and pretty-printing it with minidom, but nothing except the current entry
+    is held in memory.
+
+    Usage::
+
+        with ThreadXMLWriter(f, hn_item_id) as writer:
+            for author, comment in entries:
+                writer.write_entry(author, comment)
+    """
+
+    file_extension = ".xml"
+
+    def __init__(self, file, hn_item_id, indent="  "):
+        """
+        Initialize the writer.
+
+        Args:
+            file: Text file object to write to
+            hn_item_id: The HN item ID, written as attribute of <thread>
+            indent: Indentation of one nesting level
+        """
+        self.file = file
+        self.hn_item_id = hn_item_id
+        self.indent = indent
+        self.entries = 0
+
+    def __enter__(self):
+        self.write_header()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.write_footer()
+        return False
+
+    def _element(self, name, text, level):
+        if text:
+            return f"{self.indent * level}<{name}>{escape(text)}</{name}>\n"
+        return f"{self.indent * level}<{name}/>\n"
+
+    def format_header(self):
+        """Return the XML declaration, the opening <thread> tag and <tableheader/>."""
+        return (
+            '<?xml version="1.0" ?>\n'
+            f'<thread hn_item_id="{escape(str(self.hn_item_id))}">\n'
+            f"{self.indent}<tableheader/>\n"
+        )
+
+    def format_entry(self, author, comment):
+        """
+        Return one <entry> element as text, ending with a newline.
+
+        Args:
+            author: Sanitized author name
+            comment: Sanitized comment text
+        """
+        return (
+            f"{self.indent}<entry>\n"
+            + self._element("author", author, 2)
+            + self._element("comment", comment, 2)
+            + f"{self.indent}</entry>\n"
+        )
+
+    @staticmethod
+    def format_footer():
+        """Return the closing </thread> tag."""
+        return "</thread>"
+
+    def write_header(self):
+        """Write the XML declaration, the opening <thread> tag and <tableheader/>."""
+        self.file.write(self.format_header())
+
+    def write_entry(self, author, comment):
+        """
+        Write one <entry> element.
+
+        Args:
+            author: Sanitized author name
+            comment: Sanitized comment text
+        """
+        self.file.write(self.format_entry(author, comment))
+        self.entries += 1
+
+    def write_footer(self):
+        """Write the closing </thread> tag."""
+        self.file.write(self.format_footer())
@@ -0,0 +1,33 @@
+"""Shared setup of the tests: import paths and an offline LLMInteraction."""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from hn_summarizer.llm_interaction import LLMInteraction  # noqa: E402
+from hn_summarizer.rate_limiter import RateLimitedResponses  # noqa: E402
+from fake_services import FakeResponses, fake_encoding  # noqa: E402
+
+
+def make_llm(fake=None, **config):
+    """LLMInteraction on the fake Responses API and the offline encoding."""
+    config = {'api_key': 'test', 'model': 'gpt-4o-mini', 'concurrency': 4, **config}
+    llm_interaction = LLMInteraction(config)
+    llm_interaction.encoding = fake_encoding()
+    fake = fake if fake is not None else FakeResponses(latency=0)
+    llm_interaction.responses_api = RateLimitedResponses(fake, llm_interaction.rate_limiter, llm_interaction.count_tokens)
+    return llm_interaction
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test in an empty working directory (the package writes below data/ and final_output/)."""
+    monkeypatch.chdir(tmp_path)
+    for directory in ('data', 'final_output', 'output'):
+        os.makedirs(directory)
+    return tmp_path
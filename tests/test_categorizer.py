@@ -0,0 +1,70 @@
+"""Behavior tests of the map-reduce categorization against the fake Responses API."""
+
+import time
+
+import pytest
+
+from hn_summarizer.categorizer import CATEGORIZATION_PROMPT, MERGE_PROMPT
+from fake_services import FakeResponses
+from conftest import make_llm
+
+TOPIC = "# HN Topic: [test](https://news.ycombinator.com/item?id=40000000), and discussion"
+
+
+class RecordingResponses(FakeResponses):
+    """FakeResponses that remembers the system prompt of every create call."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompts = []
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.prompts.append(kwargs['input'][0]['content'][0]['text'])
+        return super().create(**kwargs)
+
+
+def rows(count):
+    return [f"| user{i} | An argument about topic number {i} that takes a few tokens |" for i in range(count)]
+
+
+def test_small_table_needs_one_call():
+    fake = RecordingResponses(latency=0)
+    with make_llm(fake).make_categorizer(TOPIC) as categorizer:
+        categorizer.add_rows(rows(10))
+        categories = categorizer.finish()
+
+    assert categories.startswith("Here are proposed categories")
+    assert fake.prompts == [CATEGORIZATION_PROMPT]
+
+
+def test_large_table_is_mapped_in_batches_and_reduced():
+    fake = RecordingResponses(latency=0.01)
+    llm_interaction = make_llm(fake, categorize_token_budget=400)
+    with llm_interaction.make_categorizer(TOPIC) as categorizer:
+        for start in range(0, 200, 20):
+            categorizer.add_rows(rows(200)[start:start + 20])
+        categories = categorizer.finish()
+
+    map_calls = fake.prompts.count(CATEGORIZATION_PROMPT)
+    assert map_calls == len(categorizer.futures) > 1
+    assert fake.prompts.count(MERGE_PROMPT) >= 1
+    assert "Performance" in categories
+
+
+def test_leaving_the_block_on_error_cancels_pending_map_calls():
+    fake = RecordingResponses(latency=0.2)
+    llm_interaction = make_llm(fake, concurrency=1, categorize_token_budget=300)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        with llm_interaction.make_categorizer(TOPIC) as categorizer:
+            categorizer.add_rows(rows(200))
+            raise RuntimeError("summarizing failed")
+
+    assert time.monotonic() - started < 1
+    assert len(categorizer.futures) > 3
+    assert sum(future.cancelled() for future in categorizer.futures) >= len(categorizer.futures) - 1
+    with pytest.raises(RuntimeError):
+        categorizer.executor.submit(print)
+    time.sleep(0.3)
+    assert fake.calls <= 1
@@ -0,0 +1,56 @@
+"""Tests of resuming an interrupted summary from the chunk journal."""
+
+from hn_summarizer.checkpoint import ChunkJournal
+from fake_services import FakeResponses
+from conftest import make_llm
+
+TOPIC = "# HN Topic: [test](https://news.ycombinator.com/item?id=40000000), and discussion"
+INSTRUCTION = "Summarize every comment of the thread as one table row."
+
+
+def chunks(count, changed=None):
+    return [
+        f"<comment><author>{'changed' if n == changed else 'user'}{n}</author>Comment {n}</comment>"
+        for n in range(1, count + 1)
+    ]
+
+
+def summarize(workdir, fake, chunk_texts, journal):
+    outfile = workdir / "final_output" / "summary.md"
+    make_llm(fake).send_to_llm(TOPIC, chunk_texts, INSTRUCTION, str(outfile), 5000, journal=journal)
+    return outfile.read_text()
+
+
+def test_resumed_run_requests_only_the_missing_chunks(workdir):
+    journal = ChunkJournal(40000000, "gpt-4o-mini", "final_output/summary.md")
+    first = summarize(workdir, FakeResponses(latency=0), chunks(8), journal)
+    # An interrupted run: only the first five chunks made it to the journal
+    for chunk_index in range(6, 9):
+        (workdir / journal._path(chunk_index)).unlink()
+
+    fake = FakeResponses(latency=0)
+    resumed_journal = ChunkJournal(40000000, "gpt-4o-mini", "final_output/summary.md")
+    assert summarize(workdir, fake, chunks(8), resumed_journal) == first
+    assert fake.calls == 3
+    assert resumed_journal.resumed == 5
+    assert len(resumed_journal) == 8
+
+
+def test_changed_chunks_are_requested_again(workdir):
+    journal = ChunkJournal(40000000, "gpt-4o-mini", "final_output/summary.md")
+    summarize(workdir, FakeResponses(latency=0), chunks(8), journal)
+
+    fake = FakeResponses(latency=0)
+    resumed_journal = ChunkJournal(40000000, "gpt-4o-mini", "final_output/summary.md")
+    text = summarize(workdir, fake, chunks(8, changed=4), resumed_journal)
+    assert fake.calls == 1 and resumed_journal.resumed == 7
+    assert "| changed4 |" in text and "| user4 |" not in text
+
+
+def test_journals_are_per_output_and_share_a_lock():
+    journal = ChunkJournal(40000000, "gpt-4o-mini", "final_output/a.md")
+    assert journal.lock() is ChunkJournal(40000000, "gpt-4o-mini", "final_output/a.md").lock()
+
+    other = ChunkJournal(40000000, "gpt-4o-mini", "final_output/b.md")
+    assert other.directory != journal.directory
+    assert other.lock() is not journal.lock()
@@ -0,0 +1,131 @@
+"""Tests of the comment-aware chunker."""
+
+import pytest
+
+from hn_summarizer import chunker
+from hn_summarizer.chunker import CommentChunker
+from hn_summarizer.utilities import Utilities
+from synthetic import make_thread
+from fake_services import fake_encoding
+
+ENCODING = fake_encoding()
+
+
+def count_tokens(lines):
+    return [len(ENCODING.encode_ordinary(line)) for line in lines]
+
+
+def comment(comment_id, parent_id, author="user", words=10):
+    return {'id': comment_id, 'parent_id': parent_id, 'author': author, 'text': " ".join(["word"] * words)}
+
+
+@pytest.fixture(scope="module")
+def comments():
+    return Utilities.extract_comments(make_thread(num_comments=400, comment_words=30, item_id=123))
+
+
+def test_every_comment_lands_in_exactly_one_chunk_within_the_limit(comments):
+    chunks = CommentChunker(count_tokens, 123).chunk(comments, 3000)
+
+    ids = [comment_id for chunk in chunks for comment_id in chunk['comment_ids']]
+    assert sorted(ids) == sorted(c['id'] for c in comments)
+    assert all(chunk['token_count'] <= 3000 for chunk in chunks)
+    assert all(sum(count_tokens(chunk['text'].splitlines(keepends=True))) == chunk['token_count'] for chunk in chunks)
+    assert '<thread hn_item_id="123">' in chunks[0]['text'].split("<entry>")[0]
+    assert chunks[-1]['text'].rstrip().endswith("</thread>")
+
+
+def test_windowed_packing_is_about_as_tight_as_packing_the_whole_thread(comments, monkeypatch):
+    windowed = CommentChunker(count_tokens, 123).chunk(comments, 3000)
+    monkeypatch.setattr(chunker, 'PACK_WINDOW_CHUNKS', 10 ** 6)
+    whole = CommentChunker(count_tokens, 123).chunk(comments, 3000)
+
+    assert len(windowed) <= len(whole) + 1
+
+
+def test_reply_subtrees_that_fit_stay_in_one_chunk():
+    thread = [comment(1, 100), comment(2, 1), comment(3, 2), comment(4, 100), comment(5, 4), comment(6, 100)]
+    chunks = CommentChunker(count_tokens, 100).chunk(thread, 500)
+
+    assert len(chunks) == 2
+
+    chunk_of = {comment_id: n for n, chunk in enumerate(chunks) for comment_id in chunk['comment_ids']}
+    assert chunk_of[1] == chunk_of[2] == chunk_of[3]
+    assert chunk_of[4] == chunk_of[5]
+
+
+def test_oversized_entry_gets_a_chunk_of_its_own():
+    thread = [comment(1, 100, words=5), comment(2, 100, words=400), comment(3, 100, words=5)]
+    chunks = CommentChunker(count_tokens, 100).chunk(thread, 300)
+
+    assert [2] in [chunk['comment_ids'] for chunk in chunks]
+    assert sorted(i for chunk in chunks for i in chunk['comment_ids']) == [1, 2, 3]
+
+
+def test_comments_are_consumed_window_by_window(comments, monkeypatch):
+    monkeypatch.setattr(chunker, 'PACK_WINDOW_CHUNKS', 2)
+    consumed = []
+
+    def stream():
+        for c in comments:
+            consumed.append(c['id'])
+            yield c
+
+    chunks = CommentChunker(count_tokens, 123).iter_chunks(stream(), 3000)
+    next(chunks)
+    assert len(consumed) < len(comments)
+    rest = list(chunks)
+    assert len(consumed) == len(comments)
+    assert rest[-1]['text'].rstrip().endswith("</thread>")
+
+
+@pytest.mark.parametrize("thread_format", ['xml', 'compact'])
+def test_split_halves_keep_the_preamble_and_all_entries(thread_format):
+    thread = [comment(i, 100, author=f"user{i}") for i in range(1, 9)]
+    chunk = CommentChunker(count_tokens, 100, thread_format).chunk(thread, 10 ** 6)[0]
+    preamble = chunk['text'][:chunk['text'].index("user1") if thread_format == 'compact' else chunk['text'].index("<entry>")]
+
+    first, second = chunker.split_chunk(chunk, count_tokens)
+
+    assert first['text'].startswith(preamble) and second['text'].startswith(preamble)
+    assert first['comment_ids'] + second['comment_ids'] == list(range(1, 9))
+    assert 0 < len(first['comment_ids']) < 8
+    for half in (first, second):
+        assert half['token_count'] == sum(count_tokens(half['text'].splitlines(keepends=True)))
+        assert [a for _, a in chunker._entry_authors(half['text'].splitlines())] == [
+            f"user{i}" for i in half['comment_ids']
+        ]
+
+
+def test_single_entry_is_not_split():
+    chunk = CommentChunker(count_tokens, 100).chunk([comment(1, 100)], 1000)[0]
+    assert chunker.split_chunk(chunk, count_tokens) is None
+
+
+def test_remainder_starts_after_the_last_covered_entry():
+    thread = [comment(i, 100, author=f"user{i}") for i in range(1, 7)]
+    chunk = CommentChunker(count_tokens, 100).chunk(thread, 10 ** 6)[0]
+    preamble = chunk['text'][:chunk['text'].index("<entry>")]
+
+    # user2 wrote nothing worth a row; user9 is not an author of the chunk
+    covered, remainder = chunker.remainder_chunk(chunk, ["user1", "user3", "user9", "user4"], count_tokens)
+
+    assert covered == 4
+    assert remainder['text'].startswith(preamble)
+    assert remainder['comment_ids'] == [5, 6]
+    assert remainder['token_count'] == sum(count_tokens(remainder['text'].splitlines(keepends=True)))
+    assert chunker.remainder_chunk(chunk, [f"user{i}" for i in range(1, 7)], count_tokens) == (6, None)
+    assert chunker.remainder_chunk(chunk, ["nobody"], count_tokens) == (0, None)
+
+
+def test_entry_tail_of_a_line_chunk_is_not_repeated():
+    text = (
+        "    <comment>end of an entry of the previous chunk</comment>\n  </entry>\n"
+        "  <entry>\n    <author>a</author>\n    <comment>one</comment>\n  </entry>\n"
+        "  <entry>\n    <author>b</author>\n    <comment>two</comment>\n  </entry>\n"
+    )
+    first, second = chunker.split_chunk(text, count_tokens)
+    assert second['text'].startswith("  <entry>\n    <author>b</author>")
+
+    covered, remainder = chunker.remainder_chunk(text, ["a"], count_tokens)
+    assert covered == 1 and remainder['text'].startswith("  <entry>\n    <author>b</author>")
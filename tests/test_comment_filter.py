@@ -0,0 +1,55 @@
+"""Tests of the local comment pre-filter."""
+
+from hn_summarizer.comment_filter import CommentFilter, strip_quotes
+
+ARGUMENT = ("Rust's borrow checker catches a whole class of aliasing bugs at compile time, "
+            "which is why we moved the parser to it after two years of chasing crashes in C.")
+
+
+def comment(comment_id, text, parent_id=1):
+    return {'id': comment_id, 'parent_id': parent_id, 'author': f"user{comment_id}", 'text': text, 'depth': 1}
+
+
+def test_near_duplicates_are_collapsed_into_the_first():
+    other = "Garbage collection pauses were never the problem for us; allocation rate was."
+    comments = [
+        comment(2, ARGUMENT),
+        comment(3, ARGUMENT.replace("two years", "three years")),
+        comment(4, other),
+    ]
+    comment_filter = CommentFilter()
+    kept = list(comment_filter.filter(comments))
+
+    assert [c['id'] for c in kept] == [2, 4]
+    assert comment_filter.stats['duplicates'] == 1
+
+
+def test_short_and_boilerplate_comments_are_dropped_and_replies_reparented():
+    comments = [
+        comment(2, "Thanks for sharing!"),
+        comment(3, "Great article."),
+        comment(4, "+1"),
+        comment(5, ARGUMENT, parent_id=2),
+    ]
+    comment_filter = CommentFilter(count_tokens=len, min_chars=10)
+    kept = list(comment_filter.filter(comments))
+
+    assert [(c['id'], c['parent_id']) for c in kept] == [(5, 1)]
+    assert comment_filter.stats['boilerplate'] == 2 and comment_filter.stats['short'] == 1
+    assert comment_filter.stats['tokens_after'] < comment_filter.stats['tokens_before']
+
+
+def test_quoted_parent_text_is_stripped():
+    quoted = "<i>&gt; the borrow checker is too strict</i><p>It is strict, but it is also right most of the time."
+    assert strip_quotes(quoted) == "It is strict, but it is also right most of the time."
+    assert strip_quotes(ARGUMENT) == ARGUMENT
+
+    comment_filter = CommentFilter()
+    kept = list(comment_filter.filter([comment(2, quoted), comment(3, "<p>&gt; only a quote")]))
+    assert [c['text'] for c in kept] == ["It is strict, but it is also right most of the time."]
+    assert comment_filter.stats['quotes_stripped'] == 2 and comment_filter.stats['short'] == 1
+
+
+def test_filtering_is_deterministic():
+    comments = [comment(n, ARGUMENT.replace("two", str(n))) for n in range(2, 30)]
+    assert list(CommentFilter().filter(comments)) == list(CommentFilter().filter(comments))
@@ -0,0 +1,63 @@
+"""Tests of the concurrent, ordered dispatch of chunks to the fake Responses API."""
+
+import re
+import time
+
+from fake_services import FakeResponses
+from conftest import make_llm
+
+INSTRUCTION = "Summarize every comment of the thread as one table row."
+_CHUNK_NUMBER = re.compile(r"<author>user(\d+)</author>")
+
+
+class UnevenResponses(FakeResponses):
+    """FakeResponses whose earlier chunks take longer, recording how many calls run at once."""
+
+    def __init__(self, num_chunks):
+        super().__init__(latency=0)
+        self.num_chunks = num_chunks
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def parse(self, **kwargs):
+        number = int(_CHUNK_NUMBER.search(kwargs['input'][-1]['content'][0]['text']).group(1))
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01 * (self.num_chunks - number))
+            return super().parse(**kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def chunk(number):
+    return f"<comment><author>user{number}</author>Comment {number}</comment>"
+
+
+def test_results_keep_chunk_order_when_later_chunks_finish_first():
+    fake = UnevenResponses(num_chunks=12)
+    llm_interaction = make_llm(fake, concurrency=4)
+    results = list(llm_interaction.iter_chunk_results([chunk(n) for n in range(12)], INSTRUCTION))
+
+    assert [response.summaries[0].participant for response, _ in results] == [f"user{n}" for n in range(12)]
+    assert fake.max_in_flight == 4
+
+
+def test_chunks_are_consumed_lazily():
+    fake = UnevenResponses(num_chunks=10)
+    consumed = []
+
+    def chunk_source():
+        for n in range(10):
+            consumed.append(n)
+            yield chunk(n)
+
+    llm_interaction = make_llm(fake, concurrency=2)
+    results = llm_interaction.iter_chunk_results(chunk_source(), INSTRUCTION)
+    next(results)
+    # A window of twice the concurrency is in flight before the first result is taken
+    assert len(consumed) == 4
+    assert len(list(results)) == 9
+    assert len(consumed) == 10
@@ -0,0 +1,17 @@
+"""The CLI module must stay cheap to import: --help and argument errors load no heavy dependencies."""
+
+import subprocess
+import sys
+
+from conftest import ROOT
+
+HEAVY_MODULES = ('openai', 'tiktoken', 'pydantic', 'requests', 'ijson', 'sqlite3')
+
+
+def test_cli_import_loads_no_heavy_modules():
+    code = (
+        "import sys, hn_summarizer.cli; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
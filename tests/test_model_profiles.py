@@ -0,0 +1,48 @@
+"""Tests of chunk sizing per model: pinned sizes and observed output ratios."""
+
+import time
+
+from hn_summarizer import model_profiles
+from hn_summarizer.model_profiles import ModelProfiles, OUTPUT_FILL
+from hn_summarizer.telemetry import RunTelemetry
+from fake_services import _Response, _Usage
+
+
+def make_profiles(tmp_path):
+    return ModelProfiles(str(tmp_path / "profiles.json"), str(tmp_path / "pins.json"))
+
+
+def test_pinned_size_survives_a_new_ratio_until_unpinned(tmp_path):
+    profiles = make_profiles(tmp_path)
+    budget, pinned = profiles.limits("gpt-4o-mini", item_id=1)
+    profiles.observed["gpt-4o-mini"] = {'output_ratio': 0.1, 'samples': 1}
+
+    assert profiles.limits("gpt-4o-mini", item_id=1) == (budget, pinned)
+    profiles.unpin(1, "gpt-4o-mini")
+    assert profiles.pins == {}
+    assert profiles.limits("gpt-4o-mini", item_id=1) == (budget, int(OUTPUT_FILL * budget / 0.1))
+
+
+def test_unused_pins_are_pruned_on_save(tmp_path, monkeypatch):
+    profiles = make_profiles(tmp_path)
+    profiles.limits("gpt-4o-mini", item_id=1)
+    profiles.limits("gpt-4o", item_id=1)
+    profiles.limits("gpt-4o-mini", item_id=2)
+    profiles.pins["1"]["gpt-4o"]['used_at'] -= model_profiles.PIN_RETENTION_SECONDS + 1
+    profiles.pins["2"]["gpt-4o-mini"]['used_at'] = time.time() - model_profiles.PIN_RETENTION_SECONDS - 1
+    profiles.save()
+
+    assert make_profiles(tmp_path).pins.keys() == {"1"}
+    assert make_profiles(tmp_path).pins["1"].keys() == {"gpt-4o-mini"}
+
+
+def test_output_ratio_leaves_out_the_instruction(tmp_path):
+    telemetry = RunTelemetry()
+    telemetry.record_call('summarize', "gpt-4o-mini", 1.0, response=_Response(usage=_Usage(3000, 500)),
+                          prompt_tokens=1000)
+    telemetry.record_call('summarize', "gpt-4o-mini", 1.0, response=_Response(usage=_Usage(3000, 9000)),
+                          truncated=True, failed=True)
+    profiles = make_profiles(tmp_path)
+    profiles.observe(telemetry)
+
+    assert profiles.observed["gpt-4o-mini"] == {'output_ratio': 0.25, 'samples': 1}
@@ -0,0 +1,119 @@
+"""Tests of request pacing, retries and rate limit header learning."""
+
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from hn_summarizer.rate_limiter import RateLimiter, RateLimitedResponses, parse_duration
+from fake_services import FakeResponses, _FakeStream
+
+MESSAGES = [{'role': 'user', 'content': [{'type': 'input_text', 'text': "x" * 400}]}]
+
+
+def rate_limit_error(headers=None, code=None):
+    """A RateLimitError as the client raises it, without an HTTP response object."""
+    error = openai.RateLimitError.__new__(openai.RateLimitError)
+    error.response = SimpleNamespace(headers=headers or {})
+    error.code = code
+    return error
+
+
+def timeout_error():
+    return openai.APITimeoutError.__new__(openai.APITimeoutError)
+
+
+@pytest.mark.parametrize("value, seconds", [("1s", 1.0), ("6m0s", 360.0), ("120ms", 0.12), ("2.5", 2.5), ("soon", None)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_retry_after_header_pauses_all_callers():
+    limiter = RateLimiter(base_delay=0.01)
+    delay = limiter.retry_delay(rate_limit_error({'retry-after-ms': "200"}), 0)
+
+    assert 0.2 <= delay <= 0.21
+    assert limiter.paused_until > time.monotonic() + 0.1
+    assert limiter.retries == 1
+
+
+def test_backoff_grows_and_gives_up():
+    limiter = RateLimiter(max_retries=3, base_delay=1.0, max_delay=4.0)
+    error = timeout_error()
+
+    assert all(0 <= limiter.retry_delay(error, attempt) <= min(4.0, 2 ** attempt) for attempt in range(3))
+    assert limiter.retry_delay(error, 3) is None
+    assert limiter.retry_delay(rate_limit_error(code="insufficient_quota"), 0) is None
+    assert limiter.retry_delay(ValueError("bad request"), 0) is None
+
+
+def test_limits_are_learned_from_the_headers():
+    limiter = RateLimiter()
+    limiter.observe_headers({
+        'x-ratelimit-limit-requests': "500", 'x-ratelimit-remaining-requests': "499",
+        'x-ratelimit-limit-tokens': "60000", 'x-ratelimit-remaining-tokens': "1000",
+    })
+
+    assert limiter.requests.capacity == 500 and limiter.requests.level == 499
+    assert limiter.tokens.capacity == 60000 and limiter.tokens.level == 1000
+
+
+def test_acquire_waits_for_the_token_budget():
+    limiter = RateLimiter(tokens_per_minute=6000)
+    limiter.acquire(6000)
+    started = time.monotonic()
+    limiter.acquire(30)
+    assert 0.2 <= time.monotonic() - started < 1.0
+
+
+class FlakyResponses(FakeResponses):
+    """Times out on the first ``failures`` parse calls."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def parse(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise timeout_error()
+        return super().parse(**kwargs)
+
+
+def test_retryable_errors_are_retried_and_usage_is_reconciled():
+    limiter = RateLimiter(tokens_per_minute=60000, base_delay=0.01)
+    responses = RateLimitedResponses(FlakyResponses(2, latency=0), limiter, len)
+    response = responses.parse(model="m", input=MESSAGES, max_output_tokens=1000, estimated_tokens=400)
+
+    assert response.status == "completed" and limiter.retries == 2
+    # Three attempts took 1400 tokens each; the one that got through is corrected to its actual 300
+    # (plus what the bucket refilled during the backoff)
+    assert 60000 - 2 * 1400 - 300 <= limiter.tokens.level <= 60000 - 2 * 1400 - 300 + 100
+
+
+class _HeaderStream(_FakeStream):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._response = SimpleNamespace(headers={'x-ratelimit-limit-tokens': "90000"})
+
+
+class HeaderStreams(FakeResponses):
+    def stream(self, **kwargs):
+        output, response = self._summary_response(kwargs)
+        return _HeaderStream(output, response, self.delta_chars)
+
+
+def test_stream_learns_limits_and_reconciles_usage():
+    limiter = RateLimiter()
+    responses = RateLimitedResponses(HeaderStreams(latency=0), limiter, len)
+    with responses.stream(model="m", input=MESSAGES, max_output_tokens=5000, estimated_tokens=400) as stream:
+        list(stream)
+    assert limiter.tokens.capacity == 90000
+
+    with responses.stream(model="m", input=MESSAGES, max_output_tokens=5000, estimated_tokens=400) as stream:
+        assert limiter.tokens.level < 90000 - 5000
+        assert list(stream)[-1].type == "response.completed"
+
+    # The 5400 estimated tokens are corrected to the 300 the response used
+    assert 90000 - 300 <= limiter.tokens.level <= 90000 - 300 + 100
@@ -0,0 +1,104 @@
+"""Recovery from cut-off responses: bisection of chunks and salvage of complete rows."""
+
+from types import SimpleNamespace
+
+from hn_summarizer.utilities import Utilities
+from hn_summarizer.llm_interaction import TABLE_HEADER
+from synthetic import make_thread
+from fake_services import FakeResponses, _FakeStream
+from conftest import make_llm
+
+ITEM_ID = 40000001
+TOPIC = f"# HN Topic: [test](https://news.ycombinator.com/item?id={ITEM_ID}), and discussion"
+INSTRUCTION = "Summarize every comment of the thread as one table row."
+
+
+def participants(text):
+    header_lines = set(TABLE_HEADER.split('\n'))
+    return [
+        line.split('|')[1].strip()
+        for line in text.splitlines()
+        if line.startswith('|') and line not in header_lines
+    ]
+
+
+class RecordingResponses(FakeResponses):
+    """FakeResponses that remembers the chunk text of every summarize request."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.inputs = []
+
+    def _summary_response(self, kwargs):
+        with self._lock:
+            self.inputs.append(kwargs['input'][-1]['content'][0]['text'])
+        return super()._summary_response(kwargs)
+
+
+class _BrokenStream(_FakeStream):
+    """A stream whose connection drops after the deltas, before the final event."""
+
+    def __iter__(self):
+        yield SimpleNamespace(type="response.created", response=SimpleNamespace(usage=None))
+        for event in super().__iter__():
+            if event.type != "response.output_text.delta":
+                raise ConnectionError("stream broke off")
+            yield event
+
+
+class BreakingStreams(FakeResponses):
+    """FakeResponses whose streams for inputs with more than ``cut_off_above`` entries break off."""
+
+    def stream(self, **kwargs):
+        output, response = self._summary_response(kwargs)
+        if response.status == "incomplete":
+            return _BrokenStream(output, response, self.delta_chars)
+        return _FakeStream(output, response, self.delta_chars)
+
+
+def summarize(tmp_path, fake, num_comments=24, **config):
+    llm_interaction = make_llm(fake, **config)
+    comments = Utilities.extract_comments(make_thread(num_comments=num_comments, comment_words=20, item_id=ITEM_ID))
+    chunks = list(llm_interaction.chunk_comments(ITEM_ID, comments, 10 ** 6))
+    outfile = tmp_path / "summary.md"
+    llm_interaction.send_to_llm(TOPIC, chunks, INSTRUCTION, str(outfile), 5000)
+    chunk = llm_interaction.telemetry.report()['models']['gpt-4o-mini']['chunks']
+    return outfile.read_text(), [comment['author'] for comment in comments], chunk
+
+
+def test_cut_off_chunk_without_complete_rows_is_bisected(tmp_path):
+    # Too little output to hold a single row: the chunk is split until the parts fit
+    fake = FakeResponses(latency=0, cut_off_above=6, cut_off_at=0.01)
+    text, authors, chunks = summarize(tmp_path, fake)
+
+    assert participants(text) == authors
+    assert chunks['bisections'] >= 3 and chunks['salvaged_rows'] == 0
+    assert chunks['fallbacks'] == 0 and chunks['lost'] == 0
+
+
+def test_cut_off_chunk_keeps_its_complete_rows_and_requests_only_the_rest(tmp_path):
+    fake = RecordingResponses(latency=0, cut_off_above=6, cut_off_at=0.5)
+    text, authors, chunks = summarize(tmp_path, fake)
+
+    assert participants(text) == authors
+    assert chunks['salvaged_rows'] > 0 and chunks['remainder_requests'] > 0
+    assert chunks['bisections'] == 0 and chunks['fallbacks'] == 0
+    # Remainders start like the chunk they were cut from
+    assert len(fake.inputs) == chunks['remainder_requests'] + 1
+    preamble = fake.inputs[0][:fake.inputs[0].index("<entry>")]
+    assert preamble.startswith("<?xml")
+    assert all(request.startswith(preamble) for request in fake.inputs)
+
+
+def test_failed_requests_without_a_response_still_count_their_usage(tmp_path):
+    fake = BreakingStreams(latency=0, cut_off_above=6, cut_off_at=0.5)
+    llm_interaction = make_llm(fake, stream=True)
+    comments = Utilities.extract_comments(make_thread(num_comments=24, comment_words=20, item_id=ITEM_ID))
+    chunks = list(llm_interaction.chunk_comments(ITEM_ID, comments, 10 ** 6))
+    outfile = tmp_path / "summary.md"
+    llm_interaction.send_to_llm(TOPIC, chunks, INSTRUCTION, str(outfile), 5000)
+
+    assert participants(outfile.read_text()) == [comment['author'] for comment in comments]
+    failed = [call for call in llm_interaction.telemetry.report()['calls'] if call['failed']]
+    assert failed and all(call['salvaged_rows'] for call in failed)
+    assert all(call['input_tokens'] > 0 and call['output_tokens'] > 0 for call in failed)
@@ -0,0 +1,64 @@
+"""Tests of the on-disk response cache."""
+
+import os
+
+from hn_summarizer.response_cache import ResponseCache
+from fake_services import FakeResponses
+from conftest import make_llm
+
+PAYLOAD = {'parsed': {'summaries': []}, 'padding': "x" * 1000}
+
+
+def age(cache, key, seconds_ago):
+    path = cache._path(key)
+    mtime = os.path.getmtime(path) - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=3500)
+    keys = [cache.make_key('summarize', i) for i in range(3)]
+    for number, key in enumerate(keys):
+        cache.put(key, PAYLOAD)
+        age(cache, key, 100 - number)
+    # Reading the oldest entry makes it the most recently used one
+    assert cache.get(keys[0]) == PAYLOAD
+
+    cache.put(cache.make_key('summarize', 3), PAYLOAD)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == PAYLOAD and cache.get(keys[2]) == PAYLOAD
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 3500
+
+
+def test_replacing_an_entry_does_not_count_its_size_twice(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=2500)
+    key = cache.make_key('summarize', 0)
+    other = cache.make_key('summarize', 1)
+    cache.put(other, PAYLOAD)
+    for _ in range(5):
+        cache.put(key, PAYLOAD)
+    assert cache.get(other) == PAYLOAD
+
+
+class FailingParse(FakeResponses):
+    """Structured requests fail without output, so every chunk falls back to plain text."""
+
+    def parse(self, **kwargs):
+        self._call(kwargs)
+        raise RuntimeError("structured output unavailable")
+
+
+def test_fallback_text_is_not_cached(tmp_path):
+    chunks = ["  <entry>\n    <author>a</author>\n    <comment>one</comment>\n  </entry>\n"]
+    for run in range(2):
+        fake = FailingParse(latency=0)
+        llm_interaction = make_llm(fake)
+        llm_interaction.cache = ResponseCache(str(tmp_path / "cache"))
+        outfile = tmp_path / f"summary-{run}.md"
+        llm_interaction.send_to_llm("# topic", chunks, "instruction", str(outfile), 1000)
+
+        assert "Here are proposed categories" in outfile.read_text()
+        assert fake.calls == 2
+        assert llm_interaction.cache.hits == 0
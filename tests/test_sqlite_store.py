@@ -0,0 +1,83 @@
+"""Tests of the SQLite store: replacing summaries and keeping the full-text indexes in sync."""
+
+import threading
+
+import pytest
+
+from hn_summarizer.sqlite_store import SQLiteStore
+from hn_summarizer.models import CommentSummary, ThreadSummaryResponse
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "hn.sqlite3"))
+    if not store.fts:
+        pytest.skip("SQLite without FTS5")
+    yield store
+    store.close()
+
+
+def response(*arguments, participant="alice"):
+    return ThreadSummaryResponse(summaries=[
+        CommentSummary(participant=participant, argument=argument, urls="") for argument in arguments
+    ])
+
+
+def stored_arguments(store, item_id=1):
+    with store._lock:
+        rows = store.conn.execute("SELECT argument FROM summaries WHERE item_id = ? ORDER BY id", (item_id,))
+        return [row['argument'] for row in rows]
+
+
+def test_summary_replaces_the_rows_only_when_committed(store):
+    first = store.begin_summary(1, "gpt-4o-mini", "run-1")
+    first.add_chunk_result(1, response("rust is fast"), None)
+    first.add_chunk_result(2, None, "plain fallback text")
+    first.commit()
+    assert stored_arguments(store) == ["rust is fast", "plain fallback text"]
+
+    second = store.begin_summary(1, "gpt-4o-mini", "run-2")
+    second.add_chunk_result(1, response("go is simple"), None)
+    # Not committed yet: the previous summary is still complete
+    assert stored_arguments(store) == ["rust is fast", "plain fallback text"]
+    second.commit()
+    assert stored_arguments(store) == ["go is simple"]
+    assert [row['argument'] for row in store.search_arguments("rust")] == []
+
+
+def test_concurrent_summaries_of_an_item_do_not_interleave(store):
+    summaries = [store.begin_summary(1, "gpt-4o-mini", "run") for _ in range(4)]
+
+    def summarize(number, summary):
+        for chunk_index in range(1, 21):
+            summary.add_chunk_result(chunk_index, response(f"job {number} chunk {chunk_index}"), None)
+        summary.commit()
+
+    threads = [threading.Thread(target=summarize, args=item) for item in enumerate(summaries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    arguments = stored_arguments(store)
+    assert len(arguments) == 20
+    assert len({argument.split(" chunk")[0] for argument in arguments}) == 1
+
+
+def comment(comment_id, text, author="bob"):
+    return {'id': comment_id, 'parent_id': None, 'author': author, 'text': text, 'depth': 0}
+
+
+def test_storing_a_thread_again_keeps_the_comment_index_in_sync(store):
+    store.save_thread(1, {'title': "t", 'downloaded_at': 1.0}, [comment(10, "borrow checker"), comment(11, "gc")])
+    store.save_thread(1, {'title': "t", 'downloaded_at': 2.0}, [comment(10, "lifetimes"), comment(11, "gc")])
+    # The same comment id also shows up in another thread's download
+    store.save_thread(2, {'title': "u", 'downloaded_at': 3.0}, [comment(11, "arenas")])
+
+    assert store.search_comments("borrow") == []
+    assert [row['id'] for row in store.search_comments("lifetimes")] == [10]
+    assert store.search_comments("gc") == []
+    assert [(row['item_id'], row['id']) for row in store.search_comments("arenas")] == [(2, 11)]
+    with store._lock:
+        store.conn.execute("INSERT INTO comments_fts (comments_fts) VALUES ('integrity-check')")
+    assert store.save_thread(2, {'title': "u", 'downloaded_at': 3.0}, []) is False
@@ -0,0 +1,102 @@
+"""Behavior tests of --stream against the fake Responses API in benchmarks/fake_services.py."""
+
+import io
+
+import pytest
+
+from hn_summarizer.utilities import Utilities
+from hn_summarizer.llm_interaction import TABLE_HEADER, _OrderedTableWriter
+from hn_summarizer.models import CommentSummary, ThreadSummaryResponse
+from synthetic import make_thread
+from fake_services import FakeResponses
+from conftest import make_llm
+
+ITEM_ID = 40000000
+TOPIC = f"# HN Topic: [test](https://news.ycombinator.com/item?id={ITEM_ID}), and discussion"
+INSTRUCTION = "Summarize every comment of the thread as one table row."
+
+
+def table_participants(text):
+    header_lines = set(TABLE_HEADER.split('\n'))
+    return [
+        line.split('|')[1].strip()
+        for line in text.splitlines()
+        if line.startswith('|') and line not in header_lines
+    ]
+
+
+@pytest.fixture(scope="module")
+def thread(tmp_path_factory):
+    """Chunks of a synthetic thread and the authors of its comments, in order."""
+    llm_interaction = make_llm()
+    comments = Utilities.extract_comments(make_thread(num_comments=60, comment_words=30, item_id=ITEM_ID))
+    xml_file = tmp_path_factory.mktemp("thread") / "thread.xml"
+    Utilities.write_thread_xml(ITEM_ID, comments, str(xml_file))
+    chunks = llm_interaction.chunk_text(xml_file.read_text(encoding='utf-8'), 2000)
+    assert len(chunks) > 2
+    return chunks, [comment['author'] for comment in comments]
+
+
+def summarize(tmp_path, fake, chunks, stream):
+    outfile = tmp_path / f"summary-{'stream' if stream else 'plain'}.md"
+    make_llm(fake, stream=stream).send_to_llm(TOPIC, chunks, INSTRUCTION, str(outfile), 5000)
+    return outfile.read_text()
+
+
+def test_streamed_rows_are_written_in_chunk_order(tmp_path, thread):
+    chunks, authors = thread
+    plain = summarize(tmp_path, FakeResponses(latency=0.01), chunks, stream=False)
+    streamed = summarize(tmp_path, FakeResponses(latency=0.01, delta_chars=5), chunks, stream=True)
+
+    assert streamed == plain
+    assert streamed.count(TABLE_HEADER) == 1
+    assert table_participants(streamed) == authors
+
+
+def test_cut_off_stream_keeps_salvaged_rows_and_requests_the_rest(tmp_path, thread):
+    chunks, authors = thread
+    fake = FakeResponses(latency=0.01, cut_off_above=2, cut_off_at=0.7, delta_chars=7)
+    streamed = summarize(tmp_path, fake, chunks, stream=True)
+
+    assert fake.cut_offs > 0
+    assert "FALLBACK" not in streamed and "categories" not in streamed
+    assert streamed.count(TABLE_HEADER) == 1
+    assert table_participants(streamed) == authors
+
+
+def summary(participant):
+    return CommentSummary(participant=participant, argument=f"Point made by {participant}", urls="")
+
+
+def row(summary):
+    return f"| {summary.participant} | {summary.argument} |"
+
+
+def test_writer_holds_back_rows_of_later_chunks():
+    f = io.StringIO()
+    writer = _OrderedTableWriter(f, row)
+    writer.add_summary(2, summary("b"))
+    assert f.getvalue() == ""
+
+    writer.add_summary(1, summary("a"))
+    writer.complete(1, ThreadSummaryResponse(summaries=[summary("a")]), None)
+    assert table_participants(f.getvalue()) == ["a", "b"]
+
+    writer.complete(2, ThreadSummaryResponse(summaries=[summary("b"), summary("c")]), None)
+    assert table_participants(f.getvalue()) == ["a", "b", "c"]
+
+
+def test_writer_discard_rewinds_streamed_rows():
+    f = io.StringIO()
+    f.write("# header\n")
+    writer = _OrderedTableWriter(f, row)
+    writer.add_summary(1, summary("a"))
+    writer.add_summary(1, summary("b"))
+    writer.add_summary(2, summary("x"))
+    writer.discard(1)
+    writer.discard(2)
+    assert f.getvalue() == "# header\n"
+
+    writer.complete(1, None, "FALLBACK TEXT")
+    writer.complete(2, ThreadSummaryResponse(summaries=[summary("c")]), None)
+    assert f.getvalue() == f"# header\nFALLBACK TEXT\n{TABLE_HEADER}\n| c | Point made by c |\n"
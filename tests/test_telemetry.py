@@ -0,0 +1,49 @@
+"""Tests of the run totals kept by RunTelemetry."""
+
+from hn_summarizer.telemetry import RunTelemetry
+from fake_services import _Response, _Usage
+
+
+def record(telemetry, count, model="gpt-4o-mini", start=0):
+    for i in range(start, start + count):
+        telemetry.record_call('summarize', model, 0.5, response=_Response(usage=_Usage(1000, 100)), chunk_index=i)
+        telemetry.record_chunk(model, i, {
+            'failed_requests': i % 2, 'salvaged_rows': 0, 'remainder_requests': 0, 'bisections': 0, 'fallbacks': 0,
+        })
+
+
+def test_bounded_records_keep_whole_run_totals():
+    bounded = RunTelemetry(max_records=10)
+    unbounded = RunTelemetry()
+    record(bounded, 100)
+    record(unbounded, 100)
+
+    report = bounded.report()
+    assert len(report['calls']) == len(report['chunks']) == 10
+    assert [call['chunk_index'] for call in report['calls']] == list(range(90, 100))
+    assert report['models'] == unbounded.report()['models']
+    kinds = report['models']['gpt-4o-mini']['kinds']['summarize']
+    assert kinds['calls'] == 100 and kinds['input_tokens'] == 100000
+    assert report['models']['gpt-4o-mini']['chunks']['with_failures'] == 50
+    assert bounded.total_tokens() == 110000
+
+
+def test_report_without_records():
+    telemetry = RunTelemetry()
+    record(telemetry, 3)
+    report = telemetry.report(records=False)
+    assert 'calls' not in report and 'chunks' not in report
+    assert report['models']['gpt-4o-mini']['kinds']['summarize']['calls'] == 3
+
+
+def test_calls_since_skips_dropped_records():
+    telemetry = RunTelemetry(max_records=5)
+    record(telemetry, 3)
+    calls, seen = telemetry.calls_since(0)
+    assert len(calls) == 3 and seen == 3
+
+    record(telemetry, 20, start=3)
+    calls, seen = telemetry.calls_since(seen)
+    assert [call['chunk_index'] for call in calls] == list(range(18, 23))
+    assert seen == 23
+    assert telemetry.calls_since(seen) == ([], 23)
@@ -0,0 +1,57 @@
+"""Tests of the thread store's TTL and conditional refresh against the Algolia stand-in."""
+
+import pytest
+
+from hn_summarizer.thread_store import ThreadStore
+from hn_summarizer.utilities import Utilities
+from synthetic import make_thread
+from fake_services import AlgoliaStandIn
+
+ITEM_ID = 40000000
+
+
+@pytest.fixture
+def algolia(monkeypatch):
+    """Algolia stand-in serving one synthetic thread."""
+    with AlgoliaStandIn({ITEM_ID: make_thread(num_comments=30, item_id=ITEM_ID)}) as server:
+        monkeypatch.setattr(Utilities, 'ALGOLIA_ITEMS_URL', server.items_url)
+        yield server
+
+
+def test_fresh_entry_is_not_downloaded_again(tmp_path, algolia):
+    store = ThreadStore(str(tmp_path), ttl_seconds=3600)
+    meta = store.refresh(ITEM_ID)
+
+    assert meta['num_comments'] == 30 and meta['etag']
+    assert store.load_comments(ITEM_ID) == Utilities.extract_comments(make_thread(num_comments=30, item_id=ITEM_ID))
+    assert store.refresh(ITEM_ID) == meta
+    assert len(algolia.requests) == 1
+
+
+def test_stale_entry_is_revalidated_with_its_etag(tmp_path, algolia):
+    store = ThreadStore(str(tmp_path), ttl_seconds=0)
+    meta = store.refresh(ITEM_ID)
+
+    unchanged = store.refresh(ITEM_ID)
+    assert algolia.requests[-1][1] == meta['etag']
+    assert unchanged['downloaded_at'] == meta['downloaded_at']
+    assert unchanged['fetched_at'] >= meta['fetched_at']
+
+    algolia.set_item(ITEM_ID, make_thread(num_comments=40, item_id=ITEM_ID))
+    changed = store.refresh(ITEM_ID)
+    assert changed['num_comments'] == 40 and changed['etag'] != meta['etag']
+    assert len(store.load_comments(ITEM_ID)) == 40
+
+
+def test_revalidate_checks_a_fresh_entry_and_force_downloads_it(tmp_path, algolia):
+    store = ThreadStore(str(tmp_path), ttl_seconds=3600)
+    meta = store.refresh(ITEM_ID)
+
+    algolia.set_item(ITEM_ID, make_thread(num_comments=35, item_id=ITEM_ID))
+    assert store.refresh(ITEM_ID, revalidate=True)['num_comments'] == 35
+    assert algolia.requests[-1][1] == meta['etag']
+
+    forced = store.refresh(ITEM_ID, force=True)
+    assert algolia.requests[-1][1] is None
+    assert forced['num_comments'] == 35 and forced['downloaded_at'] > meta['downloaded_at']
+    assert len(algolia.requests) == 3
@@ -0,0 +1,92 @@
+"""Tests of the iterative thread walk and the incremental (ijson) walk of stored threads."""
+
+import sys
+import json
+
+import pytest
+
+from hn_summarizer.utilities import Utilities
+from synthetic import make_thread
+
+ITEM_ID = 40000000
+
+
+def chain(depth):
+    """A story with one reply chain ``depth`` comments deep."""
+    story = {'id': ITEM_ID, 'author': "op", 'title': "chain", 'text': None, 'parent_id': None, 'children': []}
+    node = story
+    for n in range(1, depth + 1):
+        child = {'id': ITEM_ID + n, 'author': f"user{n}", 'text': f"reply {n}", 'parent_id': node['id'], 'children': []}
+        node['children'].append(child)
+        node = child
+    return story
+
+
+def write_chain(path, depth):
+    """Write a chain as JSON text; json.dump() itself recurses and cannot write deep trees."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{{"id": {ITEM_ID}, "author": "op", "title": "chain", "text": null, "parent_id": null, "children": [')
+        for n in range(1, depth + 1):
+            f.write(f'{{"id": {ITEM_ID + n}, "author": "user{n}", "text": "reply {n}", '
+                    f'"parent_id": {ITEM_ID + n - 1}, "children": [')
+        f.write(']}' * (depth + 1))
+
+
+def children_first(node):
+    """Copy of a payload whose nodes send 'children' before their own fields."""
+    return {'children': [children_first(child) for child in node.get('children') or []],
+            **{key: value for key, value in node.items() if key != 'children'}}
+
+
+@pytest.fixture(params=['ijson', 'json'])
+def file_walk(request, monkeypatch):
+    """iter_thread_nodes_from_file with ijson, and with the json.load() fallback."""
+    if request.param == 'json':
+        monkeypatch.setitem(sys.modules, 'ijson', None)
+    return Utilities.iter_thread_nodes_from_file
+
+
+def test_walk_yields_nodes_in_document_order():
+    payload = make_thread(num_comments=200, item_id=ITEM_ID)
+    nodes = list(Utilities.iter_thread_nodes(payload))
+
+    assert len(nodes) == 201 and nodes[0]['title'] == payload['title']
+    # Pre-order: every comment comes after its parent
+    seen = {ITEM_ID}
+    for node in nodes[1:]:
+        assert node['parent_id'] in seen
+        seen.add(node['id'])
+    assert nodes[1]['id'] == payload['children'][0]['id']
+
+
+def test_deep_chain_does_not_recurse():
+    depth = sys.getrecursionlimit() * 3
+    nodes = list(Utilities.iter_thread_nodes(chain(depth)))
+
+    assert [node['depth'] for node in nodes] == list(range(depth + 1))
+
+
+def test_file_walk_matches_the_in_memory_walk(tmp_path, file_walk):
+    payload = make_thread(num_comments=200, item_id=ITEM_ID)
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(payload), encoding='utf-8')
+
+    assert list(file_walk(str(path))) == list(Utilities.iter_thread_nodes(payload))
+
+
+def test_file_walk_handles_children_before_fields(tmp_path, file_walk):
+    payload = make_thread(num_comments=50, item_id=ITEM_ID)
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(children_first(payload)), encoding='utf-8')
+
+    assert list(file_walk(str(path))) == list(Utilities.iter_thread_nodes(payload))
+
+
+def test_file_walk_of_a_deep_chain(tmp_path):
+    depth = sys.getrecursionlimit() * 3
+    path = tmp_path / "raw.json"
+    write_chain(str(path), depth)
+
+    nodes = list(Utilities.iter_thread_nodes_from_file(str(path)))
+    assert [node['depth'] for node in nodes] == list(range(depth + 1))
+    assert nodes[-1]['text'] == f"reply {depth}"
@@ -0,0 +1,53 @@
+"""Tests of the front page watcher's bookkeeping (no summaries are run)."""
+
+from types import SimpleNamespace
+
+from hn_summarizer import watcher as watcher_module
+from hn_summarizer.telemetry import RunTelemetry
+from hn_summarizer.watcher import FrontPageWatcher
+
+
+def make_watcher(tmp_path, **kwargs):
+    cli = SimpleNamespace(telemetry=RunTelemetry(), config={'incremental': False})
+    return FrontPageWatcher(cli, None, "instruction", state_file=str(tmp_path / "state.json"), **kwargs)
+
+
+def hit(story_id, num_comments, created_at=0):
+    return {'id': story_id, 'title': f"story {story_id}", 'num_comments': num_comments, 'created_at': created_at}
+
+
+def test_changed_stories_are_candidates_fastest_growing_first(tmp_path):
+    watcher = make_watcher(tmp_path, min_comments=20)
+    watcher.observe([hit("1", 50), hit("2", 50), hit("3", 5)], now=1000)
+    candidates = watcher.observe([hit("1", 60), hit("2", 150), hit("3", 10)], now=1600)
+
+    assert [story['id'] for story in candidates] == ["2", "1"]
+    assert candidates[0]['growth_rate'] == 600.0
+
+    watcher.stories["2"]['summarized_comments'] = 150
+    assert [story['id'] for story in watcher.observe([hit("1", 60), hit("2", 150)], now=1700)] == ["1"]
+
+
+def test_stories_off_the_front_page_are_dropped_after_the_retention(tmp_path):
+    watcher = make_watcher(tmp_path)
+    retention = watcher_module.STORY_RETENTION_SECONDS
+    watcher.observe([hit("1", 50), hit("2", 50), hit("3", 50)], now=1000)
+    watcher.running["3"] = 1000
+    watcher.observe([hit("1", 50)], now=1000 + retention)
+    assert watcher.stories.keys() == {"1", "2", "3"}
+
+    watcher.observe([hit("1", 50)], now=1001 + retention)
+    assert watcher.stories.keys() == {"1", "3"}
+
+    watcher.save_state()
+    assert make_watcher(tmp_path).stories.keys() == {"1", "3"}
+
+
+def test_token_budget_holds_back_summaries(tmp_path):
+    watcher = make_watcher(tmp_path, workers=4, token_budget=10 * watcher_module.TOKENS_PER_COMMENT,
+                           min_comments=0)
+    watcher._executor.submit = lambda *args: None
+    candidates = watcher.observe([hit("1", 8), hit("2", 5), hit("3", 1)], now=1000)
+
+    assert watcher.schedule(candidates, now=1000) == ["1", "3"]
+    assert watcher.running == {"1": 8 * watcher_module.TOKENS_PER_COMMENT, "3": watcher_module.TOKENS_PER_COMMENT}